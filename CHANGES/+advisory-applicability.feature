@@ -0,0 +1 @@
+Added the `rpm/applicability/` endpoint to find the advisories of a repository version which apply to the packages installed on hosts.
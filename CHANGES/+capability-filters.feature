@@ -0,0 +1 @@
+Added the `whatprovides`, `whatrequires` and `whatconflicts` filters to the package list, answered from a new index of package capabilities within a repository version.
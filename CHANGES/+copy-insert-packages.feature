@@ -0,0 +1 @@
+New packages and their content artifacts are now inserted with COPY during sync and import, which speeds up initial syncs and imports of large repositories.
@@ -0,0 +1 @@
+Added the `RPM_DEDUPLICATE_PACKAGE_METADATA` setting and the `rpm-deduplicate-package-metadata` management command to store package file lists and changelogs once for all packages sharing them, e.g. signed packages and their originals.
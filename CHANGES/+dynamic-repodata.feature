@@ -0,0 +1 @@
+Added the `dynamic_repodata` option to RPM distributions, serving the latest repository version with repodata generated on the first request instead of a publication.
@@ -0,0 +1 @@
+Modular metadata is parsed with the C YAML loader of PyYAML when available, and optionally in parallel worker processes, see the `RPM_MODULEMD_PARSE_WORKERS` setting.
@@ -0,0 +1 @@
+Added the `/pulp/api/v3/rpm/freshness_check/` API to check many repositories for updates in one task and sync only those that changed.
@@ -0,0 +1 @@
+Added a `latest_only` filter to the package list, backed by an index of the newest package of each name and arch that is built when a repository version is created.
@@ -0,0 +1 @@
+Distributions pointing at a repository now resolve the publication to serve through a new `RpmRepository.latest_publication` pointer, which is kept up to date when publications complete or are deleted, instead of searching all publications of the repository on every request.
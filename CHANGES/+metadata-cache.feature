@@ -0,0 +1 @@
+Added an in-memory cache of small published repodata files and generated `config.repo` files to the content app, configured with the `RPM_METADATA_CACHE_SIZE` and `RPM_METADATA_CACHE_MAX_FILE_SIZE` settings.
@@ -0,0 +1 @@
+Repodata files and `config.repo` served from the metadata cache now carry strong `ETag` and `Last-Modified` headers derived from the publication, and conditional requests for them are answered with `304 Not Modified`.
@@ -0,0 +1 @@
+The package list only loads the large columns (files, changelogs, dependencies, description) of the fields that are part of the response, and supports keyset pagination ordered by name and EVR with the `cursor` parameter.
@@ -0,0 +1 @@
+Added the `compression_threads` publication option and the `RPM_METADATA_COMPRESSION_THREADS` setting to compress large metadata files with several threads.
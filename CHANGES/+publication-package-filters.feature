@@ -0,0 +1 @@
+Added the `arches`, `exclude_debuginfo` and `exclude_source` options to publish only some of the packages of a repository version.
@@ -0,0 +1 @@
+Added the `RPM_PUBLISH_REUSE_METADATA` setting to reuse the metadata of publications of versions with the same content and publish settings.
@@ -0,0 +1 @@
+rpm-repository-storage-analysis now reports the bytes unique to each repository and shared with other repositories, computes the sizes of many repositories at once with optional parallel workers, and streams its JSON output.
@@ -0,0 +1 @@
+rpm-trim-changelogs now trims the changelogs in the database, in chunks processed by parallel workers, skips packages already within the limit, can resume an interrupted run with --state-file, trims shared changelogs and can remove duplicated files with --compact-files.
@@ -0,0 +1 @@
+Added the RPM_SYNC_REUSE_CONTENT setting, with which a sync reuses the content another repository already synced from the same upstream metadata instead of downloading and parsing it again.
@@ -0,0 +1 @@
+Added the `RPM_SYNC_STAGE_METRICS` setting, which records the busy and waiting times, throughput, queue depths and database queries of every sync stage in a task profile artifact.
@@ -0,0 +1 @@
+Added the RPM_TASK_PROFILING and RPM_TASK_PROFILING_TRACEMALLOC settings and the rpm-profile and rpm-tracemalloc task diagnostics, which attach a cProfile profile and per-phase memory snapshots of the sync, publish, copy and prune tasks to the task.
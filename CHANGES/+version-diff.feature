@@ -0,0 +1 @@
+Added a `diff/` endpoint to repository versions, streaming the packages added, removed, upgraded and downgraded and the advisories added, removed and updated since another version.
@@ -0,0 +1 @@
+Added the `zchunk_metadata` option to publish zchunk variants of the metadata, which clients can update by downloading only the changed chunks.
@@ -8,8 +8,10 @@ import createrepo_c as cr
 from django.conf import settings
 from django.db import (
     IntegrityError,
+    connection,
     transaction,
 )
+from django.db.models import F
 from django.utils.dateparse import parse_datetime
 
 from pulpcore.plugin.models import Content
@@ -68,9 +70,8 @@ def resolve_advisories(version, previous_version):
         )
         previous_advisory_ids = set(previous_advisories.values_list("id", flat=True))
 
-        # diff for querysets works fine but the result is not fully functional queryset,
-        # e.g. filtering doesn't work
-        added_advisories = current_advisories.difference(previous_advisories)
+        # compared by pk, EXCEPT would compare (and hash) every column of the advisories
+        added_advisories = current_advisories.exclude(pk__in=previous_advisories.values("pk"))
         added_advisories_by_id = defaultdict(list)
         for advisory in added_advisories:
             added_advisories_by_id[advisory.id].append(advisory)
@@ -127,21 +128,36 @@ def resolve_advisories(version, previous_version):
             tmp_adv.delete()
 
     # Incoming has a duplicate advisory-id to previous - resolve
-    for advisory_id in advisory_id_conflicts["added_vs_previous"]:
-        previous_advisory_qs = previous_advisories.filter(id=advisory_id)
+    conflicting_ids = advisory_id_conflicts["added_vs_previous"]
+    if conflicting_ids:
+        previous_advisories_by_id = defaultdict(list)
+        for advisory in previous_advisories.filter(id__in=conflicting_ids):
+            previous_advisories_by_id[advisory.id].append(advisory)
         # there can only be one added advisory at this point otherwise the AdvisoryConflict
         # would have been raised by now
+        conflicting_advisories = [added_advisories_by_id[adv_id][0] for adv_id in conflicting_ids]
+        UpdateRecord.objects.filter(pk__in=[adv.pk for adv in conflicting_advisories]).touch()
+        pkglists = get_pkglists(
+            conflicting_advisories
+            + [adv for advs in previous_advisories_by_id.values() if len(advs) == 1 for adv in advs]
+        )
+
+    for advisory_id in conflicting_ids:
+        previous_advisories_with_id = previous_advisories_by_id[advisory_id]
         added_advisory = added_advisories_by_id[advisory_id][0]
-        added_advisory.touch()
-        if previous_advisory_qs.count() > 1:
+        if len(previous_advisories_with_id) > 1:
             # due to an old bug there could be N advisories with the same id in a repo,
             # this is wrong and there may not be a good way to resolve those, so let's take the
             # new one.
             content_pks_to_add.update([added_advisory.pk])
-            content_pks_to_remove.update([adv.pk for adv in previous_advisory_qs])
+            content_pks_to_remove.update([adv.pk for adv in previous_advisories_with_id])
         else:
+            previous_advisory = previous_advisories_with_id[0]
             to_add, to_remove, to_exclude = resolve_advisory_conflict(
-                previous_advisory_qs.first(), added_advisory
+                previous_advisory,
+                added_advisory,
+                previous_pkglist=pkglists[previous_advisory.pk],
+                added_pkglist=pkglists[added_advisory.pk],
             )
             content_pks_to_add.update(to_add)
             content_pks_to_remove.update(to_remove)
@@ -157,7 +173,33 @@ def resolve_advisories(version, previous_version):
         version.remove_content(Content.objects.filter(pk__in=content_pks_to_exclude))
 
 
-def resolve_advisory_conflict(previous_advisory, added_advisory):
+def get_pkglists(advisories):
+    """
+    Return the NEVRAs of the packages of many advisories at once.
+
+    Args:
+        advisories(list): UpdateRecord instances
+
+    Returns:
+        pkglists(dict): lists of NEVRA tuples, like UpdateRecord.get_pkglist(), by advisory pk
+
+    """
+    pkglists = {advisory.pk: [] for advisory in advisories}
+    packages = (
+        UpdateCollectionPackage.objects.filter(update_collection__update_record__in=list(pkglists))
+        .order_by("sum")
+        .values_list(
+            "update_collection__update_record", "name", "epoch", "version", "release", "arch"
+        )
+    )
+    for advisory_pk, *nevra in packages.iterator():
+        pkglists[advisory_pk].append(tuple(nevra))
+    return pkglists
+
+
+def resolve_advisory_conflict(
+    previous_advisory, added_advisory, previous_pkglist=None, added_pkglist=None
+):
     """
     Decide which advisory to add to a repo version, create a new one if needed.
 
@@ -188,6 +230,8 @@ def resolve_advisory_conflict(previous_advisory, added_advisory):
        previous_advisory(pulp_rpm.app.models.UpdateRecord): Advisory which is in a previous repo
                                                             version
        added_advisory(pulp_rpm.app.models.UpdateRecord): Advisory which is being added
+       previous_pkglist(list): NEVRAs of the previous advisory, if already known
+       added_pkglist(list): NEVRAs of the added advisory, if already known
 
      Returns:
        to_add(list): UUIDs of advisories to add to a repo version, can be newly created ones
@@ -238,8 +282,12 @@ def resolve_advisory_conflict(previous_advisory, added_advisory):
     )
     previous_updated_version = previous_advisory.version
     added_updated_version = added_advisory.version
-    previous_pkglist = set(previous_advisory.get_pkglist())
-    added_pkglist = set(added_advisory.get_pkglist())
+    if previous_pkglist is None:
+        previous_pkglist = previous_advisory.get_pkglist()
+    if added_pkglist is None:
+        added_pkglist = added_advisory.get_pkglist()
+    previous_pkglist = set(previous_pkglist)
+    added_pkglist = set(added_pkglist)
 
     # Prepare results of conditions for easier use.
     same_dates = previous_updated_date == added_updated_date
@@ -476,3 +524,64 @@ def hash_update_record(update):
     uinfo = cr.UpdateInfo()
     uinfo.append(update)
     return hashlib.sha256(uinfo.xml_dump().encode("utf-8")).hexdigest()
+
+
+def find_applicable_advisories(version, hosts):
+    """
+    Find the advisories of a repository version which apply to the packages installed on hosts.
+
+    An advisory applies to a host if it lists a package with the name and arch of an installed
+    package, but a higher EVR than the highest installed one. The EVRs are compared in the
+    database using the indexed `evr` sort keys of the advisory packages, all hosts at once.
+
+    Args:
+        version (pulpcore.app.models.RepositoryVersion): The repository version with advisories
+        hosts (dict): Mapping of a host name to the NEVRA tuples of its installed packages
+
+    Returns:
+        dict: Mapping of every host name to a dict of applicable advisory pks to the set of NEVRA
+            tuples of the packages to upgrade to
+
+    """
+    columns = ([], [], [], [], [], [])
+    for host, nevras in hosts.items():
+        for nevra in nevras:
+            for column, value in zip(columns, (host, *nevra)):
+                column.append(value)
+
+    advisories = get_content_in_repoversion(version, pulp_type=UpdateRecord.get_pulp_type())
+    advisory_packages = (
+        UpdateCollectionPackage.objects.filter(update_collection__update_record__in=advisories)
+        .annotate(advisory_pk=F("update_collection__update_record_id"))
+        .values("advisory_pk", "name", "epoch", "version", "release", "arch", "evr")
+    )
+    advisory_packages_sql, advisory_packages_params = advisory_packages.query.sql_with_params()
+
+    applicable = {host: defaultdict(set) for host in hosts}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH installed AS (
+                SELECT DISTINCT ON (host, name, arch) host, name, arch, evr
+                FROM (
+                    SELECT host, name, arch,
+                           pulp_rpm_evr_sortkey(NULLIF(epoch, ''), version, release) AS evr
+                    FROM unnest(
+                        %s::text[], %s::text[], %s::text[], %s::text[], %s::text[], %s::text[]
+                    ) AS packages(host, name, epoch, version, release, arch)
+                ) AS packages
+                ORDER BY host, name, arch, evr DESC
+            ), advisory_packages AS ({advisory_packages_sql})
+            SELECT installed.host, advisory_packages.advisory_pk, advisory_packages.name,
+                   advisory_packages.epoch, advisory_packages.version, advisory_packages.release,
+                   advisory_packages.arch
+            FROM installed JOIN advisory_packages
+                ON advisory_packages.name = installed.name
+                AND advisory_packages.arch = installed.arch
+                AND advisory_packages.evr > installed.evr
+            """,
+            [*columns, *advisory_packages_params],
+        )
+        for host, advisory_pk, *nevra in cursor.fetchall():
+            applicable[host][advisory_pk].add(tuple(nevra))
+    return applicable
@@ -0,0 +1,133 @@
+"""
+Bulk insertion of new packages with PostgreSQL's COPY.
+
+Package is a multi-table model (core_content + rpm_package), which Django's ``bulk_create`` does
+not support, so pulpcore saves new content one row at a time. For an initial sync or import of
+a large repository that is hundreds of thousands of INSERTs of wide rows with big JSON columns.
+Instead, the rows are streamed into the database with COPY. Conflicts with packages that already
+exist, or that a concurrent task inserted meanwhile, are skipped like ``ignore_conflicts`` would:
+the rows are copied into a temporary table first and moved over with ``ON CONFLICT DO NOTHING``.
+
+COPY can be turned off with the ``RPM_BULK_INSERT_PACKAGES`` setting, new packages are then saved
+one at a time as before.
+"""
+
+from django.db import connection, transaction
+
+from pulpcore.plugin.models import Content, ContentArtifact
+
+from pulp_rpm.app.models import Package
+
+
+def _concrete_fields(model):
+    """Return the fields of the table of a model which are written on insert."""
+    # e.g. Package.evr is computed by a database trigger
+    readonly = getattr(getattr(model, "ReadonlyMeta", None), "readonly", ())
+    return [field for field in model._meta.local_concrete_fields if field.name not in readonly]
+
+
+def _columns(fields):
+    return ", ".join(connection.ops.quote_name(field.column) for field in fields)
+
+
+def _db_row(instance, fields):
+    """Return the database values of fields of a new instance, filling in auto_now values."""
+    return [
+        field.get_db_prep_save(field.pre_save(instance, add=True), connection) for field in fields
+    ]
+
+
+def _copy(cursor, table, fields, instances):
+    """Stream the values of fields of the instances into a table."""
+    table = connection.ops.quote_name(table)
+    with cursor.copy(f"COPY {table} ({_columns(fields)}) FROM STDIN") as copy:
+        for instance in instances:
+            copy.write_row(_db_row(instance, fields))
+
+
+def _copy_ignore_conflicts(cursor, model, instances):
+    """
+    COPY instances of a model into its table, skipping rows which violate a unique constraint.
+
+    Returns:
+        set: The primary keys of the rows that were inserted.
+
+    """
+    table = model._meta.db_table
+    staging_table = f"{table}_copy"
+    fields = _concrete_fields(model)
+    # In a savepoint, so that a failure rolls the staging table back with everything else
+    # instead of leaving the transaction aborted. The staging table lives until the end of the
+    # transaction and is only emptied when reused within it, e.g. by several batches.
+    with transaction.atomic():
+        # without the constraints of the table, which are only checked when moving the rows over
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {connection.ops.quote_name(staging_table)} "
+            f"ON COMMIT DROP AS SELECT {_columns(fields)} FROM {connection.ops.quote_name(table)} "
+            "WITH NO DATA"
+        )
+        cursor.execute(f"TRUNCATE {connection.ops.quote_name(staging_table)}")
+        _copy(cursor, staging_table, fields, instances)
+        cursor.execute(
+            f"INSERT INTO {connection.ops.quote_name(table)} ({_columns(fields)}) "
+            f"SELECT {_columns(fields)} FROM {connection.ops.quote_name(staging_table)} "
+            f"ON CONFLICT DO NOTHING RETURNING {connection.ops.quote_name(model._meta.pk.column)}"
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def copy_insert_packages(packages):
+    """
+    Insert new packages with COPY, skipping the ones which already exist.
+
+    Must be called in a transaction. The inserted packages are marked as saved. Packages that
+    conflict with existing ones are left unsaved, the caller should look the existing ones up.
+
+    Args:
+        packages (list): Unsaved Package instances
+
+    Returns:
+        list: The packages which were inserted
+
+    """
+    if not packages:
+        return []
+    for package in packages:
+        package.content_ptr_id = package.pulp_id
+
+    with connection.cursor() as cursor:
+        # The core_content rows have fresh primary keys and nothing else unique, so they can be
+        # copied in directly and removed again for the packages which turn out to exist already.
+        _copy(cursor, Content._meta.db_table, _concrete_fields(Content), packages)
+        inserted_pks = _copy_ignore_conflicts(cursor, Package, packages)
+        conflicting_pks = [package.pk for package in packages if package.pk not in inserted_pks]
+        if conflicting_pks:
+            cursor.execute(
+                f"DELETE FROM {connection.ops.quote_name(Content._meta.db_table)} "
+                "WHERE pulp_id = ANY(%s)",
+                [conflicting_pks],
+            )
+
+    inserted = []
+    for package in packages:
+        if package.pk in inserted_pks:
+            package._state.adding = False
+            package._state.db = connection.alias
+            inserted.append(package)
+        else:
+            package.content_ptr_id = None
+    return inserted
+
+
+def copy_insert_content_artifacts(content_artifacts):
+    """
+    Insert ContentArtifacts with COPY, skipping the ones which already exist.
+
+    Args:
+        content_artifacts (list): Unsaved ContentArtifact instances
+
+    """
+    if not content_artifacts:
+        return
+    with connection.cursor() as cursor:
+        _copy_ignore_conflicts(cursor, ContentArtifact, content_artifacts)
@@ -0,0 +1,85 @@
+"""
+Multi-threaded compression of repodata files.
+
+createrepo_c compresses metadata in the thread writing it. For very large repositories the
+compression of primary/filelists/other makes up a large share of the publish time, so
+``write_repo_metadata`` can instead write them uncompressed and compress them here afterwards.
+
+gzip files are compressed pigz-style: the input is split into blocks which are compressed by a
+pool of threads (zlib releases the GIL) and written out as consecutive gzip members, which every
+gzip reader, including createrepo_c and librepo, decompresses as a single stream. zstd files are
+compressed by the multi-threaded compressor of the ``zstandard`` package if it is installed, and
+by createrepo_c otherwise.
+"""
+
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import createrepo_c as cr
+
+from pulp_rpm.app.constants import COMPRESSION_TYPES
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Large enough that the per-member overhead and the lost back-references between blocks are
+# negligible, small enough to keep every thread busy on files of a few hundred MB.
+BLOCK_SIZE = 4 * 1024 * 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+def _gzip_member(block):
+    """Compress a block into a complete gzip member."""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(block) + compressor.flush()
+
+
+def parallel_gzip(src, dst, threads, block_size=BLOCK_SIZE):
+    """
+    Compress src into dst as consecutive gzip members, compressing blocks concurrently.
+
+    At most twice as many blocks as there are threads are held in memory at a time.
+    """
+    with (
+        open(src, "rb") as src_file,
+        open(dst, "wb") as dst_file,
+        ThreadPoolExecutor(max_workers=threads) as executor,
+    ):
+        pending = deque()
+        while block := src_file.read(block_size):
+            pending.append(executor.submit(_gzip_member, block))
+            if len(pending) >= 2 * threads:
+                dst_file.write(pending.popleft().result())
+        while pending:
+            dst_file.write(pending.popleft().result())
+
+
+def parallel_zstd(src, dst, threads):
+    """Compress src into dst with zstd, using several threads if zstandard is available."""
+    if zstandard is None:
+        cr.compress_file(src, dst, cr.ZSTD)
+        return
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=threads, write_checksum=True)
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        compressor.copy_stream(src_file, dst_file)
+
+
+def parallel_compress_file(src, dst, compression_type, threads):
+    """
+    Compress a file with several threads.
+
+    Args:
+        src (str): Path of the file to compress.
+        dst (str): Path of the compressed file to write.
+        compression_type (pulp_rpm.app.constants.COMPRESSION_TYPES): gz or zstd.
+        threads (int): The number of threads to compress with.
+
+    """
+    if compression_type == COMPRESSION_TYPES.ZSTD:
+        parallel_zstd(src, dst, threads)
+    else:
+        parallel_gzip(src, dst, threads)
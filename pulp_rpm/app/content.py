@@ -0,0 +1,53 @@
+"""
+Extensions of the pulpcore content app, imported by it when the content app starts.
+"""
+
+from aiohttp import web
+
+from pulpcore.content import app
+
+
+def is_not_modified(request, response):
+    """
+    Evaluate the conditional headers of request against the validators of response.
+
+    Follows RFC 9110: If-None-Match takes precedence over If-Modified-Since, and entity tags are
+    compared with the weak comparison function.
+    """
+    if request.method not in ("GET", "HEAD") or response.status != 200:
+        return False
+    if request.if_none_match is not None:
+        etag = response.etag
+        if etag is None:
+            return False
+        return any(candidate.value in ("*", etag.value) for candidate in request.if_none_match)
+    if request.if_modified_since is not None and response.last_modified is not None:
+        return response.last_modified <= request.if_modified_since
+    return False
+
+
+@web.middleware
+async def conditional_request_middleware(request, handler):
+    """
+    Answer conditional requests for in-memory responses with 304 Not Modified.
+
+    FileResponses evaluate conditional headers themselves, but the responses built by
+    RpmDistribution.content_handler (cached repodata files, config.repo) are plain Responses that
+    carry an ETag and Last-Modified derived from the publication.
+    """
+    response = await handler(request)
+    if (
+        type(response) is web.Response
+        and "ETag" in response.headers
+        and is_not_modified(request, response)
+    ):
+        headers = {
+            name: response.headers[name]
+            for name in ("ETag", "Last-Modified", "Cache-Control")
+            if name in response.headers
+        }
+        return web.Response(status=304, headers=headers)
+    return response
+
+
+app.middlewares.append(conditional_request_middleware)
@@ -25,6 +25,7 @@ RPM_FIELDS = [
     "provides",
     "requires",
     "files",
+    "filelist__entries",
 ]
 
 MODULE_FIELDS = [
@@ -131,7 +132,10 @@ def rpm_to_solvable(solv_repo, unit):
         """A specific, rpm-unit-type filelist attribute conversion."""
         repodata = solv_repo.first_repodata()
 
-        for file_repr in unit.get("files", []):
+        files = unit.get("files", [])
+        if unit.get("filelist__entries"):
+            files = models.PackageFilelist(entries=unit["filelist__entries"]).get_files()
+        for file_repr in files:
             # file_repr = e.g. (None, '/usr/bin/', 'bash')
             file_dir = file_repr[1]
             file_name = file_repr[2]
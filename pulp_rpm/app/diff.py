@@ -0,0 +1,151 @@
+"""
+RPM-aware differences between two repository versions.
+
+Packages are compared by name and arch in the database, using the EVR sort key, so that the
+changes between two versions of hundreds of thousands of packages can be streamed out without
+loading either version into memory.
+"""
+
+import json
+
+from django.db import connection
+
+from pulp_rpm.app.models import UpdateRecord
+from pulp_rpm.app.shared_utils import format_nevra
+from pulp_rpm.app.sql_utils import repoversion_content_ids
+
+# The packages of both versions are deduplicated by (name, arch, evr): the same EVR spelled
+# differently (e.g. "1.0" and "1.00"), or built with a different checksum, is not a change.
+# In each (name, arch), the newest removed package is paired with the newest added package as
+# an upgrade or downgrade; everything else is reported as added or removed.
+# The content of each version is formatted in as the subquery of repoversion_content_ids().
+PACKAGE_CHANGES_SQL = """
+WITH old AS (
+    SELECT DISTINCT ON (name, arch, evr_v2)
+        name, arch, evr_v2 AS evr, epoch, version, release
+    FROM rpm_package
+    WHERE content_ptr_id IN ({old_content_ids})
+), new AS (
+    SELECT DISTINCT ON (name, arch, evr_v2)
+        name, arch, evr_v2 AS evr, epoch, version, release
+    FROM rpm_package
+    WHERE content_ptr_id IN ({new_content_ids})
+), removed AS (
+    SELECT *, CASE WHEN row_number() OVER w = 1 THEN true END AS newest
+    FROM old
+    WHERE NOT EXISTS (
+        SELECT 1 FROM new WHERE (new.name, new.arch, new.evr) = (old.name, old.arch, old.evr)
+    )
+    WINDOW w AS (PARTITION BY name, arch ORDER BY evr DESC)
+), added AS (
+    SELECT *, CASE WHEN row_number() OVER w = 1 THEN true END AS newest
+    FROM new
+    WHERE NOT EXISTS (
+        SELECT 1 FROM old WHERE (new.name, new.arch, new.evr) = (old.name, old.arch, old.evr)
+    )
+    WINDOW w AS (PARTITION BY name, arch ORDER BY evr DESC)
+)
+SELECT
+    CASE
+        WHEN removed.name IS NULL THEN 'added'
+        WHEN added.name IS NULL THEN 'removed'
+        WHEN added.evr > removed.evr THEN 'upgraded'
+        ELSE 'downgraded'
+    END,
+    coalesce(removed.name, added.name) AS name,
+    coalesce(removed.arch, added.arch) AS arch,
+    removed.epoch, removed.version, removed.release,
+    added.epoch, added.version, added.release
+FROM removed
+FULL JOIN added
+    ON (removed.name, removed.arch, removed.newest) = (added.name, added.arch, added.newest)
+ORDER BY name, arch, coalesce(removed.evr, added.evr)
+"""
+
+
+def diff_packages(old_version, new_version):
+    """
+    Yield the package changes between two repository versions.
+
+    Args:
+        old_version (pulpcore.app.models.RepositoryVersion): The version to compare from.
+        new_version (pulpcore.app.models.RepositoryVersion): The version to compare to.
+
+    Yields:
+        dict: One change, with "change" being one of "added", "removed", "upgraded" or
+            "downgraded", the "name" and "arch" of the packages and the "old" and "new" NEVRA
+            (None for added and removed packages respectively).
+
+    """
+    with connection.chunked_cursor() as cursor:
+        old_sql, old_params = repoversion_content_ids(old_version).query.sql_with_params()
+        new_sql, new_params = repoversion_content_ids(new_version).query.sql_with_params()
+        sql = PACKAGE_CHANGES_SQL.format(old_content_ids=old_sql, new_content_ids=new_sql)
+        cursor.execute(sql, [*old_params, *new_params])
+        for change, name, arch, *evrs in cursor:
+            old_evr, new_evr = evrs[:3], evrs[3:]
+            yield {
+                "change": change,
+                "name": name,
+                "arch": arch,
+                "old": format_nevra(name, *old_evr, arch) if old_evr[1] is not None else None,
+                "new": format_nevra(name, *new_evr, arch) if new_evr[1] is not None else None,
+            }
+
+
+def diff_advisories(old_version, new_version):
+    """
+    Yield the advisory changes between two repository versions.
+
+    Args:
+        old_version (pulpcore.app.models.RepositoryVersion): The version to compare from.
+        new_version (pulpcore.app.models.RepositoryVersion): The version to compare to.
+
+    Yields:
+        dict: One change, with "change" being one of "added", "removed" or "updated" (a
+            different advisory with the same id), and the "id", "type" and "severity" of the
+            advisory of the new version, or of the old one if it was removed.
+
+    """
+    fields = ("pk", "id", "type", "severity")
+    old = {
+        advisory["id"]: advisory
+        for advisory in old_version.get_content(UpdateRecord.objects).values(*fields).iterator()
+    }
+    new = new_version.get_content(UpdateRecord.objects).order_by("id").values(*fields)
+    for advisory in new.iterator():
+        old_advisory = old.pop(advisory["id"], None)
+        if old_advisory is None:
+            change = "added"
+        elif old_advisory["pk"] != advisory["pk"]:
+            change = "updated"
+        else:
+            continue
+        yield {"change": change, **{field: advisory[field] for field in fields[1:]}}
+    for advisory_id in sorted(old):
+        yield {"change": "removed", **{field: old[advisory_id][field] for field in fields[1:]}}
+
+
+def _json_list_items(items, batch_size=1000):
+    """Yield the items of a JSON list, one per line, a batch of items at a time."""
+    separator, lines = "\n", []
+    for item in items:
+        lines.append(json.dumps(item))
+        if len(lines) >= batch_size:
+            yield separator + ",\n".join(lines)
+            separator, lines = ",\n", []
+    if lines:
+        yield separator + ",\n".join(lines)
+
+
+def stream_diff(old_version, new_version):
+    """
+    Yield the changes between two repository versions as a JSON document, piece by piece.
+
+    The document has a "packages" and an "advisories" list, with one change per line.
+    """
+    yield '{"packages": ['
+    yield from _json_list_items(diff_packages(old_version, new_version))
+    yield '],\n"advisories": ['
+    yield from _json_list_items(diff_advisories(old_version, new_version))
+    yield "]}\n"
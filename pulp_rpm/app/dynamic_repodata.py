@@ -0,0 +1,274 @@
+"""
+Repodata generated on demand by the content app for distributions without a publication.
+
+Distributions with ``dynamic_repodata`` enabled serve the latest version of their repository
+directly. The first request for a version starts writing its repodata into a directory shared by
+all the content app processes of a host, keyed by the repository version and the publish settings
+of the repository. The repodata is written by a thread of the process, so that requests for other
+versions are not held up, and requests are answered with 503 until it is complete. Later requests,
+from any process, are served from that directory.
+"""
+
+import errno
+import fcntl
+import functools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from gettext import gettext as _
+from hashlib import sha256
+from logging import getLogger
+from typing import NamedTuple
+
+import createrepo_c as cr
+from django.conf import settings
+
+from pulpcore.plugin.models import RepositoryVersion
+
+from pulp_rpm.app.constants import COMPRESSION_TYPES, LAYOUT_TYPES
+from pulp_rpm.app.shared_utils import submit_with_connection
+
+log = getLogger(__name__)
+
+DYNAMIC_REPODATA_DIRECTORY = "rpm-dynamic-repodata"
+INDEX_FILE = "index.json"
+# Seconds clients are asked to wait for repodata being generated
+RETRY_AFTER = 5
+WORKING_DIRECTORY_PREFIX = "tmp"
+# Working directories older than this were left behind by processes killed while generating.
+STALE_WORKING_DIRECTORY_AGE = 24 * 60 * 60
+
+# The repodata being generated by this process, by cache key
+_generating = {}
+_generating_lock = threading.RLock()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rpm-dynamic-repodata")
+
+
+class DynamicRepodata(NamedTuple):
+    """
+    Repodata generated for a repository version.
+
+    Attributes:
+        path (str): Directory containing the "repodata" directory.
+        metadata (frozenset): Relative paths of the generated repodata files.
+        artifacts (dict): Mapping of relative path to the ContentArtifact pk served there.
+
+    """
+
+    path: str
+    metadata: frozenset
+    artifacts: dict
+
+
+def get_cache_directory():
+    """Return the directory repodata is generated into, creating it if needed."""
+    directory = settings.RPM_DYNAMIC_REPODATA_DIR or os.path.join(
+        settings.WORKING_DIRECTORY, DYNAMIC_REPODATA_DIRECTORY
+    )
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def publish_settings(repository):
+    """Return the settings a publication of repository would be created with."""
+    from pulp_rpm.app.tasks.publishing import get_checksum_type
+
+    return {
+        "checksum_type": get_checksum_type({"general": repository.checksum_type}),
+        "compression_type": repository.compression_type or COMPRESSION_TYPES.GZ,
+        "layout": repository.layout or LAYOUT_TYPES.NESTED_ALPHABETICALLY,
+        "zchunk_metadata": repository.zchunk_metadata,
+        "arches": sorted(set(repository.arches)) if repository.arches is not None else None,
+        "exclude_debuginfo": repository.exclude_debuginfo,
+        "exclude_source": repository.exclude_source,
+    }
+
+
+def cache_key(repository_version, publish_settings):
+    """Return the name of the directory holding the repodata of a repository version."""
+    digest = sha256(json.dumps(publish_settings, sort_keys=True).encode()).hexdigest()
+    return f"{repository_version.pk}-{digest[:16]}"
+
+
+def get_dynamic_repodata(repository_version, publish_settings):
+    """
+    Return the repodata of a repository version, or start generating it if it does not exist yet.
+
+    Args:
+        repository_version (pulpcore.plugin.models.RepositoryVersion): The version to serve.
+        publish_settings (dict): The settings returned by `publish_settings()`.
+
+    Returns:
+        DynamicRepodata: The generated repodata, or None while it is being generated.
+
+    """
+    key = cache_key(repository_version, publish_settings)
+    path = os.path.join(get_cache_directory(), key)
+    if os.path.exists(os.path.join(path, INDEX_FILE)):
+        return load(path)
+    with _generating_lock:
+        if key not in _generating:
+            future = submit_with_connection(
+                _executor, generate_dynamic_repodata, repository_version, publish_settings
+            )
+            _generating[key] = future
+            future.add_done_callback(functools.partial(_generation_done, key))
+    return None
+
+
+def _generation_done(key, future):
+    with _generating_lock:
+        _generating.pop(key, None)
+    if future.exception() is not None:
+        # the next request for the version tries again
+        log.error(
+            _("Generating repodata {key} failed: {error}").format(key=key, error=future.exception())
+        )
+
+
+def generate_dynamic_repodata(repository_version, publish_settings):
+    """
+    Generate the repodata of a repository version, unless another process already did.
+
+    Generation is serialized with a lock file, so that concurrent requests from several
+    processes generate the repodata only once. The lock file is kept, so that every process
+    locks the same file.
+
+    Returns:
+        DynamicRepodata: The generated repodata.
+
+    """
+    cache_directory = get_cache_directory()
+    key = cache_key(repository_version, publish_settings)
+    path = os.path.join(cache_directory, key)
+    if not os.path.exists(os.path.join(path, INDEX_FILE)):
+        with open(os.path.join(cache_directory, f".{key}.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not os.path.exists(os.path.join(path, INDEX_FILE)):
+                prune_cache(cache_directory)
+                generate(repository_version, publish_settings, path)
+    return load(path)
+
+
+@functools.lru_cache(maxsize=16)
+def load(path):
+    """Load the index of generated repodata; entries never change once written."""
+    with open(os.path.join(path, INDEX_FILE)) as index:
+        data = json.load(index)
+    return DynamicRepodata(
+        path=path, metadata=frozenset(data["metadata"]), artifacts=data["artifacts"]
+    )
+
+
+def generate(repository_version, publish_settings, path):
+    """
+    Write the repodata of a repository version and the index of the paths it references.
+
+    The files are written to a temporary directory first and moved into place at once, so that
+    readers never see partially generated repodata.
+    """
+    from pulp_rpm.app.models import RpmPublication
+    from pulp_rpm.app.tasks.publishing import PublicationData, write_repo_metadata
+
+    log.info(_("Generating repodata for repository version {pk}").format(pk=repository_version.pk))
+    checksum_types = {"general": publish_settings["checksum_type"]}
+    # The publication is never saved, it only carries the settings PublicationData lays out
+    # the artifacts with.
+    publication = RpmPublication(
+        repository_version=repository_version,
+        checksum_type=publish_settings["checksum_type"],
+        compression_type=publish_settings["compression_type"],
+        layout=publish_settings["layout"],
+        arches=publish_settings["arches"],
+        exclude_debuginfo=publish_settings["exclude_debuginfo"],
+        exclude_source=publish_settings["exclude_source"],
+    )
+    zchunk_metadata = publish_settings["zchunk_metadata"]
+    if zchunk_metadata and not cr.HAS_ZCK:
+        log.warning(_("createrepo_c was built without zchunk support, no zchunk metadata added"))
+        zchunk_metadata = False
+    publication_data = PublicationData(publication, checksum_types)
+    content = repository_version.content
+
+    working_directory = tempfile.mkdtemp(prefix=WORKING_DIRECTORY_PREFIX, dir=os.path.dirname(path))
+    try:
+        extra_repomdrecords = publication_data.prepare_metadata_files(
+            content, folder=working_directory
+        )
+        packages, artifacts = publication_data.layout_artifacts(content)
+        repomd = write_repo_metadata(
+            content,
+            repository_version,
+            publish_settings["checksum_type"],
+            extra_repomdrecords,
+            working_directory,
+            compression_type=publish_settings["compression_type"],
+            retained_packages=packages,
+            zchunk_metadata=zchunk_metadata,
+        )
+        metadata = [os.path.join("repodata", "repomd.xml")] + [
+            os.path.join("repodata", os.path.basename(record.location_href))
+            for record in repomd.records
+        ]
+        with open(os.path.join(working_directory, INDEX_FILE), "w") as index:
+            json.dump(
+                {
+                    "metadata": metadata,
+                    "artifacts": {relative_path: str(caid) for relative_path, caid in artifacts},
+                },
+                index,
+            )
+        try:
+            os.rename(working_directory, path)
+        except OSError as error:
+            # generated meanwhile by a process not holding the lock
+            if error.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                raise
+            shutil.rmtree(working_directory, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(working_directory, ignore_errors=True)
+        raise
+
+
+def prune_cache(cache_directory):
+    """
+    Remove the repodata of repository versions that do not exist anymore.
+
+    Working directories older than a day, left behind by interrupted generations, are removed as
+    well.
+    """
+    entries = {}
+    for name in os.listdir(cache_directory):
+        if name.startswith(WORKING_DIRECTORY_PREFIX):
+            path = os.path.join(cache_directory, name)
+            with suppress(FileNotFoundError):
+                if time.time() - os.path.getmtime(path) > STALE_WORKING_DIRECTORY_AGE:
+                    shutil.rmtree(path, ignore_errors=True)
+            continue
+        # the lock files are named after the directories, e.g. ".<pk>-<digest>.lock"
+        version_pk = name.removeprefix(".").removesuffix(".lock").rpartition("-")[0]
+        with suppress(ValueError):
+            entries.setdefault(str(uuid.UUID(version_pk)), []).append(name)
+    if not entries:
+        return
+    existing = {
+        str(pk)
+        for pk in RepositoryVersion.objects.filter(pk__in=entries.keys()).values_list(
+            "pk", flat=True
+        )
+    }
+    for version_pk, names in entries.items():
+        if version_pk not in existing:
+            for name in names:
+                path = os.path.join(cache_directory, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    with suppress(FileNotFoundError):
+                        os.remove(path)
@@ -211,3 +211,16 @@ class UnsupportedChecksumTypeError(PulpException):
         return f"[{self.error_code}] " + _('"{sum_type}" is not supported.').format(
             sum_type=self.sum_type
         )
+
+
+class ZchunkUnsupportedError(PulpException):
+    """
+    Raised when zchunk metadata is requested but createrepo_c was built without zchunk support.
+    """
+
+    error_code = "RPM0019"
+
+    def __str__(self):
+        return f"[{self.error_code}] " + _(
+            "zchunk metadata cannot be published, createrepo_c was built without zchunk support."
+        )
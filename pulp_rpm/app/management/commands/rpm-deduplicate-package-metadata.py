@@ -0,0 +1,82 @@
+import sys
+from gettext import gettext as _
+
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+
+from pulp_rpm.app.models import (  # noqa
+    Package,
+    PackageChangelog,
+    PackageFileDirectory,
+    PackageFilelist,
+)
+
+REMOVE_UNUSED_DIRECTORIES = """
+DELETE FROM rpm_packagefiledirectory
+WHERE id NOT IN (
+    SELECT (entry->>1)::bigint
+    FROM rpm_packagefilelist, jsonb_array_elements(entries) AS entry
+)
+"""
+
+
+class Command(BaseCommand):
+    """
+    Django management command for moving the files and changelogs of packages to shared storage.
+
+    With the RPM_DEDUPLICATE_PACKAGE_METADATA setting enabled, the list of files and the
+    changelogs of new packages are stored once for every distinct list, with the directory paths
+    of files replaced by references into a dictionary of directories shared by all packages. This
+    command does the same for packages that are already in the database, and removes the shared
+    file lists, directories and changelogs no package uses anymore.
+    """
+
+    help = _(__doc__)
+
+    def add_arguments(self, parser):
+        """Set up arguments."""
+        parser.add_argument(
+            "--batch-size",
+            default=500,
+            type=int,
+            required=False,
+            help=_("The number of packages converted in one transaction."),
+        )
+
+    def handle(self, *args, **options):
+        """Implement the command."""
+        batch_size = options["batch_size"]
+        converted_packages = 0
+
+        def update_total(total):
+            sys.stdout.write("\rDeduplicated files and changelogs of {} packages".format(total))
+            sys.stdout.flush()
+
+        packages = Package.objects.filter(
+            Q(filelist__isnull=True) & ~Q(files=[]) | Q(changelog__isnull=True) & ~Q(changelogs=[])
+        ).only("files", "filelist", "changelogs", "changelog")
+        while batch := list(packages[:batch_size]):
+            with transaction.atomic():
+                Package.deduplicate_metadata(batch)
+                Package.objects.bulk_update(
+                    batch, fields=["files", "filelist", "changelogs", "changelog"]
+                )
+            converted_packages += len(batch)
+            update_total(converted_packages)
+        print()
+
+        for model, field in ((PackageFilelist, "filelist"), (PackageChangelog, "changelog")):
+            in_use = Package.objects.filter(**{field: OuterRef("pk")})
+            deleted, _details = model.objects.exclude(Exists(in_use)).delete()
+            print(_("Removed {} unused {}").format(deleted, model._meta.verbose_name_plural))
+
+        # filelists refer to directories in JSON, so they are not removed along with filelists
+        with connection.cursor() as cursor:
+            cursor.execute(REMOVE_UNUSED_DIRECTORIES)
+            deleted = cursor.rowcount
+        print(
+            _("Removed {} unused {}").format(
+                deleted, PackageFileDirectory._meta.verbose_name_plural
+            )
+        )
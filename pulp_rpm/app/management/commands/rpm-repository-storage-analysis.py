@@ -1,47 +1,56 @@
 import json
 import re
-import sys
+import textwrap
 from argparse import RawDescriptionHelpFormatter
 from gettext import gettext as _
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
 
 from pulpcore.plugin.util import extract_pk, get_url
 
 from pulp_rpm.app.models import RpmRepository
+from pulp_rpm.app.storage_analysis import iter_repository_sizes
 
 
 def gather_repository_sizes(
-    repositories, include_on_demand=False, include_published_metadata=False
+    repositories,
+    include_on_demand=False,
+    include_published_metadata=False,
+    batch_size=100,
+    workers=1,
 ):
     """
-    Creates a list containing the size report for given repositories.
+    Yields the size report for given repositories.
 
-    Each entry in the list will contain a dict with following minimal fields:
+    Each entry will contain a dict with following minimal fields:
         - name: name of the repository
         - href: href of the repository
         - disk-size: size in bytes of all artifacts stored on disk in the repository
+        - unique-disk-size: size in bytes of the artifacts no other repository references, which
+          removing the repository would free up
+        - shared-disk-size: size in bytes of the artifacts other repositories reference as well
 
     Each entry can additionally have the optional fields if specified:
         - on-demand-size: approximate size in bytes of all on-demand artifacts in the repository
         - published-metadata-size: size in bytes of all published metadata for the repository
 
-    **Note**: This does not account for the fact that the same artifact can appear in multiple
-    repositories without incurring additional disk storage use. User interpretation of these numbers
-    for individual repositories should consider totals across multiple repositories in the context
-    that artifacts may be shared.
+    The content of the sub-repos of a distribution tree counts towards the repositories
+    containing the tree, the sub-repos report it as shared. The sizes are computed for
+    `batch_size` repositories at once, with `workers` batches computed in parallel.
     """
-    full_report = []
-    for repo in repositories.order_by("name").iterator():
-        report = {"name": repo.name, "href": get_url(repo), "disk-size": repo.disk_size}
-        if include_on_demand:
-            report["on-demand-size"] = repo.on_demand_size
-        if include_published_metadata:
-            report["published-metadata-size"] = repo.published_metadata_size
-        full_report.append(report)
-
-    return full_report
+    repositories = list(repositories.order_by("name").only("pk", "name", "pulp_domain"))
+    repositories_by_pk = {repo.pk: repo for repo in repositories}
+    sizes = iter_repository_sizes(
+        list(repositories_by_pk),
+        batch_size=batch_size,
+        workers=workers,
+        include_on_demand=include_on_demand,
+        include_published_metadata=include_published_metadata,
+    )
+    for repo_pk, repo_sizes in sizes:
+        repo = repositories_by_pk[repo_pk]
+        yield {"name": repo.name, "href": get_url(repo), **repo_sizes}
 
 
 def href_list_handler(value):
@@ -76,6 +85,21 @@ class Command(BaseCommand):
             action="store_true",
             help=_("Include the size for the published metadata"),
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help=_("The number of repositories to compute the sizes of at once"),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help=_(
+                "The number of batches to compute in parallel, each with a database connection"
+                " of its own"
+            ),
+        )
 
         parser.formatter_class = RawDescriptionHelpFormatter
 
@@ -88,10 +112,20 @@ class Command(BaseCommand):
             repos_ids = [extract_pk(r) for r in repository_hrefs]
             repositories = repositories.filter(pk__in=repos_ids)
 
+        if options["batch_size"] < 1 or options["workers"] < 1:
+            raise CommandError(_("--batch-size and --workers must be positive integers"))
+
         report = gather_repository_sizes(
             repositories,
             include_on_demand=options["include_on_demand"],
             include_published_metadata=options["include_published_metadata"],
+            batch_size=options["batch_size"],
+            workers=options["workers"],
         )
-        json.dump({"repositories": report}, sys.stdout, indent=4)
-        print()
+        # the report is written out as the repositories are analyzed
+        self.stdout.write('{\n    "repositories": [', ending="")
+        for n, entry in enumerate(report):
+            self.stdout.write(",\n" if n else "\n", ending="")
+            self.stdout.write(textwrap.indent(json.dumps(entry, indent=4), " " * 8), ending="")
+            self.stdout.flush()
+        self.stdout.write("\n    ]\n}")
@@ -4,7 +4,11 @@ from gettext import gettext as _
 from django.conf import settings
 from django.core.management import BaseCommand, CommandError
 
-from pulp_rpm.app.models import Package  # noqa
+from pulp_rpm.app.package_maintenance import (
+    compact_shared_filelists,
+    process_packages,
+    trim_shared_changelogs,
+)
 
 
 class Command(BaseCommand):
@@ -21,6 +25,11 @@ class Command(BaseCommand):
     retroactively applied to packages that are already synced. This command will do so and can
     save a significant amount of disk space if Pulp is being used to sync RPM content from RHEL
     or Oracle Linux.
+
+    The changelogs are trimmed by the database, in chunks of packages which can be processed by
+    several workers in parallel. Packages which already have few enough changelogs are not
+    rewritten. With --state-file, an interrupted run can be resumed where it stopped. Files
+    listed more than once by a package can be removed with --compact-files.
     """
 
     help = _(__doc__)
@@ -38,33 +47,69 @@ class Command(BaseCommand):
                 "settings will be used."
             ),
         )
+        parser.add_argument(
+            "--compact-files",
+            action="store_true",
+            help=_(
+                "Also remove the files listed more than once by a package, including the shared "
+                "filelists of packages stored with RPM_DEDUPLICATE_PACKAGE_METADATA."
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            default=1,
+            type=int,
+            help=_(
+                "The number of partitions of the packages processed in parallel, each with a "
+                "database connection of its own."
+            ),
+        )
+        parser.add_argument(
+            "--chunk-size",
+            default=1000,
+            type=int,
+            help=_("The number of packages updated in one transaction."),
+        )
+        parser.add_argument(
+            "--state-file",
+            required=False,
+            help=_(
+                "Save the progress to this file, and resume from it if an earlier run with the "
+                "same options was interrupted. The file is removed when the run completes."
+            ),
+        )
 
     def handle(self, *args, **options):
         """Implement the command."""
         changelog_limit = options["changelog_limit"]
         if changelog_limit <= 0:
             raise CommandError("--changelog-limit must be a non-zero positive integer")
-        trimmed_packages = 0
-        batch = []
+        if options["workers"] <= 0 or options["chunk_size"] <= 0:
+            raise CommandError("--workers and --chunk-size must be non-zero positive integers")
+        trimmed_packages = compacted_packages = 0
 
-        def update_total(total):
-            sys.stdout.write("\rTrimmed changelogs for {} packages".format(total))
+        def update_total(trimmed, compacted):
+            nonlocal trimmed_packages, compacted_packages
+            trimmed_packages += trimmed
+            compacted_packages += compacted
+            sys.stdout.write("\rTrimmed changelogs for {} packages".format(trimmed_packages))
+            if options["compact_files"]:
+                sys.stdout.write(", compacted files for {} packages".format(compacted_packages))
             sys.stdout.flush()
 
-        for package in Package.objects.all().only("changelogs").iterator():
-            # make sure the changelogs are ascending sorted by date
-            package.changelogs.sort(key=lambda t: t[1])
-            # take the last N changelogs
-            package.changelogs = package.changelogs[-changelog_limit:]
-            batch.append(package)
-            if len(batch) > 500:
-                Package.objects.bulk_update(batch, fields=["changelogs"])
-                trimmed_packages += len(batch)
-                batch.clear()
-                update_total(trimmed_packages)
-
-        Package.objects.bulk_update(batch, fields=["changelogs"])
-        trimmed_packages += len(batch)
-        batch.clear()
-        update_total(trimmed_packages)
+        update_total(0, 0)
+        process_packages(
+            changelog_limit=changelog_limit,
+            compact_files=options["compact_files"],
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            state_path=options["state_file"],
+            progress=update_total,
+        )
         print()
+
+        trimmed_changelogs = trim_shared_changelogs(changelog_limit, options["chunk_size"])
+        print(_("Trimmed {} shared changelogs").format(trimmed_changelogs))
+        if options["compact_files"]:
+            compacted_filelists = compact_shared_filelists(options["chunk_size"])
+            print(_("Compacted {} shared filelists").format(compacted_filelists))
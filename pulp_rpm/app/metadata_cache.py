@@ -0,0 +1,150 @@
+"""
+A process-local cache of small published metadata files, used by the content app.
+
+Clients poll ``repodata/repomd.xml`` (and friends) far more often than publications change, so
+every content app process keeps a bounded LRU cache of the bytes it served for each
+distribution. Entries carry a "token" describing what they were generated from (at least the
+publication pk) and are discarded as soon as the distribution resolves to something else.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import NamedTuple
+
+from django.conf import settings
+from django.utils.http import http_date
+
+# Subset of pulpcore's mime-type map covering what is published under repodata/
+METADATA_CONTENT_TYPES = {
+    ".bz2": "application/x-bzip2",
+    ".gz": "application/gzip",
+    ".xml": "text/xml",
+    ".xz": "application/x-xz",
+    ".zst": "application/zstd",
+}
+
+
+class CachedMetadata(NamedTuple):
+    """
+    A cached response body.
+
+    Attributes:
+        token (Hashable): What the entry was generated from, e.g. the publication pk.
+        body (bytes): The file content, or None if the file must not be served from the cache.
+        headers (dict): Response headers to serve the body with.
+
+    """
+
+    token: Hashable
+    body: bytes | None
+    headers: dict
+
+
+class MetadataCache:
+    """
+    A thread-safe LRU cache bounded by the total size of the cached bodies.
+
+    Args:
+        max_size (int): Total number of bytes the cache may hold. 0 disables the cache.
+        max_entry_size (int): Bodies larger than this are never cached.
+
+    """
+
+    def __init__(self, max_size, max_entry_size):
+        self.max_size = max_size
+        self.max_entry_size = max_entry_size
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def get(self, key, token):
+        """
+        Return the entry stored for key, or None if it is missing or stale.
+
+        An entry is stale when it was stored with a different token, which happens when the
+        distribution starts serving another publication. Stale entries are dropped.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.token != token:
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, token, body, headers=None):
+        """
+        Store body for key, evicting the least recently used entries to stay within bounds.
+
+        Bodies larger than ``max_entry_size`` are recorded without content, so that callers can
+        remember not to look them up again for the same token.
+        """
+        if body is not None and len(body) > self.max_entry_size:
+            body = None
+        entry = CachedMetadata(token=token, body=body, headers=dict(headers or {}))
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = entry
+            self._size += len(body or b"")
+            while self._size > self.max_size and self._entries:
+                self._pop(next(iter(self._entries)))
+        return entry
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry.body or b"")
+
+
+def is_metadata_path(path):
+    """Whether path points to a file directly inside a (possibly sub-repo) repodata directory."""
+    directory, filename = os.path.split(path)
+    return bool(filename) and os.path.basename(directory) == "repodata"
+
+
+def metadata_content_type(path):
+    """Return the Content-Type pulpcore would use for a repodata file."""
+    _, ext = os.path.splitext(path)
+    return METADATA_CONTENT_TYPES.get(ext.lower())
+
+
+def validator_headers(checksum, last_modified):
+    """
+    Return the ETag and Last-Modified headers of a published file.
+
+    Args:
+        checksum (str): Checksum of the file content, used as a strong entity tag.
+        last_modified (datetime.datetime): When the file was published.
+    """
+    return {"ETag": f'"{checksum}"', "Last-Modified": http_date(last_modified.timestamp())}
+
+
+_cache = None
+
+
+def get_metadata_cache():
+    """Return the cache of this process, creating it from the settings on first use."""
+    global _cache
+    if _cache is None:
+        _cache = MetadataCache(
+            max_size=settings.RPM_METADATA_CACHE_SIZE,
+            max_entry_size=settings.RPM_METADATA_CACHE_MAX_FILE_SIZE,
+        )
+    return _cache
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_latest_publication(apps, schema_editor):
+    Publication = apps.get_model("core", "Publication")
+    RpmRepository = apps.get_model("rpm", "RpmRepository")
+
+    latest_publications = (
+        Publication.objects.filter(
+            complete=True, repository_version__repository__pulp_type="rpm.rpm"
+        )
+        .order_by(
+            "repository_version__repository_id",
+            "-repository_version__number",
+            "-pulp_created",
+        )
+        .distinct("repository_version__repository_id")
+        .values_list("repository_version__repository_id", "pk")
+    )
+    for repository_pk, publication_pk in latest_publications.iterator():
+        RpmRepository.objects.filter(pk=repository_pk).update(latest_publication=publication_pk)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rpm", "0074_alter_rpmrepository_metadata_signing_service_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rpmrepository",
+            name="latest_publication",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="rpm.rpmpublication",
+            ),
+        ),
+        migrations.RunPython(
+            populate_latest_publication, migrations.RunPython.noop, elidable=True
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rpm", "0075_rpmrepository_latest_publication"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rpmdistribution",
+            name="dynamic_repodata",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:48
+
+import uuid
+
+import django.db.models.deletion
+import django_lifecycle.mixins
+import pulpcore.app.models.base
+from django.db import migrations, models, transaction
+
+# Indexes a batch of packages and returns the last one, the batches are walked in primary key order
+INDEX_PACKAGES_BATCH = """
+WITH batch AS (
+    SELECT content_ptr_id FROM rpm_package
+    WHERE content_ptr_id > %s
+    ORDER BY content_ptr_id
+    LIMIT %s
+), indexed AS (
+    INSERT INTO rpm_packagecapability
+        (pulp_id, pulp_created, pulp_last_updated, package_id, kind, name, flags, epoch, version,
+         release, pre)
+    SELECT gen_random_uuid(), now(), now(), p.content_ptr_id, k.kind, c->>0, c->>1, c->>2, c->>3,
+        c->>4, COALESCE((c->>5)::boolean, false)
+    FROM batch
+    JOIN rpm_package p USING (content_ptr_id)
+    CROSS JOIN LATERAL (VALUES
+        ('provides', p.provides),
+        ('requires', p.requires),
+        ('conflicts', p.conflicts),
+        ('obsoletes', p.obsoletes),
+        ('suggests', p.suggests),
+        ('enhances', p.enhances),
+        ('recommends', p.recommends),
+        ('supplements', p.supplements)
+    ) AS k(kind, capabilities)
+    CROSS JOIN LATERAL jsonb_array_elements(k.capabilities) AS c
+    WHERE NOT EXISTS (
+        SELECT 1 FROM rpm_packagecapability pc WHERE pc.package_id = p.content_ptr_id
+    )
+)
+SELECT content_ptr_id FROM batch ORDER BY content_ptr_id DESC LIMIT 1
+"""
+BATCH_SIZE = 10000
+
+
+def index_existing_packages(apps, schema_editor):
+    """Index the capabilities of the existing packages, one batch of packages per transaction."""
+    last_pk = uuid.UUID(int=0)
+    while True:
+        with transaction.atomic(), schema_editor.connection.cursor() as cursor:
+            cursor.execute(INDEX_PACKAGES_BATCH, [last_pk, BATCH_SIZE])
+            row = cursor.fetchone()
+        if row is None:
+            break
+        last_pk = row[0]
+
+
+class Migration(migrations.Migration):
+    # the existing packages are indexed in batches, each in a transaction of its own
+    atomic = False
+
+    dependencies = [
+        ("rpm", "0076_rpmdistribution_dynamic_repodata"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PackageCapability",
+            fields=[
+                (
+                    "pulp_id",
+                    models.UUIDField(
+                        default=pulpcore.app.models.base.pulp_uuid,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("pulp_created", models.DateTimeField(auto_now_add=True)),
+                ("pulp_last_updated", models.DateTimeField(auto_now=True, null=True)),
+                (
+                    "kind",
+                    models.TextField(
+                        choices=[
+                            ("provides", "provides"),
+                            ("requires", "requires"),
+                            ("conflicts", "conflicts"),
+                            ("obsoletes", "obsoletes"),
+                            ("suggests", "suggests"),
+                            ("enhances", "enhances"),
+                            ("recommends", "recommends"),
+                            ("supplements", "supplements"),
+                        ]
+                    ),
+                ),
+                ("name", models.TextField()),
+                ("flags", models.TextField(null=True)),
+                ("epoch", models.TextField(null=True)),
+                ("version", models.TextField(null=True)),
+                ("release", models.TextField(null=True)),
+                ("pre", models.BooleanField(default=False)),
+                (
+                    "package",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="capabilities",
+                        to="rpm.package",
+                    ),
+                ),
+            ],
+            options={
+                "default_related_name": "%(app_label)s_%(model_name)s",
+                "indexes": [
+                    models.Index(fields=["kind", "name"], name="rpm_package_kind_0fbd40_idx")
+                ],
+            },
+            bases=(django_lifecycle.mixins.LifecycleModelMixin, models.Model),
+        ),
+        migrations.RunPython(
+            index_existing_packages,
+            reverse_code=migrations.RunPython.noop,
+            elidable=True,
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rpm", "0077_packagecapability"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PackageFileDirectory",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("path", models.TextField(unique=True)),
+            ],
+            options={
+                "default_related_name": "%(app_label)s_%(model_name)s",
+            },
+        ),
+        migrations.CreateModel(
+            name="PackageFilelist",
+            fields=[
+                ("digest", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ("entries", models.JSONField()),
+            ],
+            options={
+                "default_related_name": "%(app_label)s_%(model_name)s",
+            },
+        ),
+        migrations.AddField(
+            model_name="package",
+            name="filelist",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="packages",
+                to="rpm.packagefilelist",
+            ),
+        ),
+    ]
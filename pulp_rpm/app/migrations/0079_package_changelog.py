@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rpm", "0078_package_filelist"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PackageChangelog",
+            fields=[
+                ("digest", models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ("entries", models.JSONField()),
+            ],
+            options={
+                "default_related_name": "%(app_label)s_%(model_name)s",
+            },
+        ),
+        migrations.AddField(
+            model_name="package",
+            name="changelog",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="packages",
+                to="rpm.packagechangelog",
+            ),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# This Migration was _not_ automatically generated.
+# When regenerating the migrations ever, this one _must_ be preserved.
+#
+# Adds an 'evr' sort key column to rpm_updatecollectionpackage, maintained by a trigger the same
+# way as rpm_package.evr_v2, so that advisory packages can be compared with installed packages by
+# EVR in the database (e.g. for errata applicability).
+
+from django.db import migrations, models
+
+from pulp_rpm.app.models.package import RpmVersionField
+
+add_column_sql = """
+ALTER TABLE rpm_updatecollectionpackage ADD COLUMN evr bytea;
+
+UPDATE rpm_updatecollectionpackage
+    SET evr = pulp_rpm_evr_sortkey(NULLIF(epoch, ''), version, release);
+
+ALTER TABLE rpm_updatecollectionpackage ALTER COLUMN evr SET NOT NULL;
+"""
+
+trigger_sql = """
+CREATE OR REPLACE FUNCTION pulp_updatecollectionpackage_evr_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.evr = pulp_rpm_evr_sortkey(NULLIF(NEW.epoch, ''), NEW.version, NEW.release);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pulp_updatecollectionpackage_evr_insert_trigger
+    BEFORE INSERT
+    ON rpm_updatecollectionpackage
+    FOR EACH ROW
+    EXECUTE PROCEDURE pulp_updatecollectionpackage_evr_trigger();
+
+CREATE TRIGGER pulp_updatecollectionpackage_evr_update_trigger
+    BEFORE UPDATE OF epoch, version, release
+    ON rpm_updatecollectionpackage
+    FOR EACH ROW
+    WHEN (
+        OLD.epoch IS DISTINCT FROM NEW.epoch OR
+        OLD.version IS DISTINCT FROM NEW.version OR
+        OLD.release IS DISTINCT FROM NEW.release
+    )
+    EXECUTE PROCEDURE pulp_updatecollectionpackage_evr_trigger();
+"""
+
+reverse_sql = """
+DROP TRIGGER IF EXISTS pulp_updatecollectionpackage_evr_insert_trigger
+    ON rpm_updatecollectionpackage;
+DROP TRIGGER IF EXISTS pulp_updatecollectionpackage_evr_update_trigger
+    ON rpm_updatecollectionpackage;
+DROP FUNCTION IF EXISTS pulp_updatecollectionpackage_evr_trigger();
+ALTER TABLE rpm_updatecollectionpackage DROP COLUMN evr;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpm', '0079_package_changelog'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(add_column_sql + trigger_sql, reverse_sql=reverse_sql),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='updatecollectionpackage',
+                    name='evr',
+                    field=RpmVersionField(),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='updatecollectionpackage',
+            index=models.Index(
+                fields=['name', 'arch', 'evr'], name='rpm_updatec_name_18b539_idx'
+            ),
+        ),
+    ]
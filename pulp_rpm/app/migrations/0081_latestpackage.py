@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0161_upstreampulp_remote_policy"),
+        ("rpm", "0080_updatecollectionpackage_evr"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LatestPackage",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "package",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="rpm.package"
+                    ),
+                ),
+                (
+                    "repository_version",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.repositoryversion"
+                    ),
+                ),
+            ],
+            options={
+                "default_related_name": "%(app_label)s_%(model_name)s",
+                "unique_together": {("repository_version", "package")},
+            },
+        ),
+    ]
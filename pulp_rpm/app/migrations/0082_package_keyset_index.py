@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0161_upstreampulp_remote_policy"),
+        ("rpm", "0081_latestpackage"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="package",
+            index=models.Index(
+                fields=["name", "evr", "content_ptr"], name="rpm_package_name_07112d_idx"
+            ),
+        ),
+    ]
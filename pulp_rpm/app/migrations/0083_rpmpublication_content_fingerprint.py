@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0161_upstreampulp_remote_policy"),
+        ("rpm", "0082_package_keyset_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rpmpublication",
+            name="content_fingerprint",
+            field=models.TextField(db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="rpmpublication",
+            name="metadata_signing_service",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="core.asciiarmoreddetachedsigningservice",
+            ),
+        ),
+    ]
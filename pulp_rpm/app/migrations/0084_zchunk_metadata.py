@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rpm", "0083_rpmpublication_content_fingerprint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rpmpublication",
+            name="zchunk_metadata",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="rpmrepository",
+            name="zchunk_metadata",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:19
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rpm", "0084_zchunk_metadata"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="rpmpublication",
+            name="arches",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.TextField(), null=True, size=None
+            ),
+        ),
+        migrations.AddField(
+            model_name="rpmpublication",
+            name="exclude_debuginfo",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="rpmpublication",
+            name="exclude_source",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="rpmrepository",
+            name="arches",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.TextField(), null=True, size=None
+            ),
+        ),
+        migrations.AddField(
+            model_name="rpmrepository",
+            name="exclude_debuginfo",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="rpmrepository",
+            name="exclude_source",
+            field=models.BooleanField(default=False),
+        ),
+    ]
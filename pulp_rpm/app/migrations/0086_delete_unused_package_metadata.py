@@ -0,0 +1,53 @@
+# This Migration was _not_ automatically generated.
+# When regenerating the migrations ever, this one _must_ be preserved.
+#
+# Adds a trigger deleting the shared filelists and changelogs no package uses anymore when packages are deleted,
+# e.g. by orphan cleanup. Packages referencing them are created with the rows locked, see
+# Package.deduplicate_metadata(), which makes the trigger wait for them.
+
+from django.db import migrations
+
+trigger_sql = """
+CREATE OR REPLACE FUNCTION pulp_rpm_delete_unused_package_metadata() RETURNS trigger AS $$
+BEGIN
+    PERFORM 1 FROM rpm_packagefilelist
+        WHERE digest IN (SELECT filelist_id FROM deleted_packages)
+        ORDER BY digest
+        FOR UPDATE;
+    DELETE FROM rpm_packagefilelist f
+        WHERE f.digest IN (SELECT filelist_id FROM deleted_packages)
+        AND NOT EXISTS (SELECT 1 FROM rpm_package p WHERE p.filelist_id = f.digest);
+    PERFORM 1 FROM rpm_packagechangelog
+        WHERE digest IN (SELECT changelog_id FROM deleted_packages)
+        ORDER BY digest
+        FOR UPDATE;
+    DELETE FROM rpm_packagechangelog c
+        WHERE c.digest IN (SELECT changelog_id FROM deleted_packages)
+        AND NOT EXISTS (SELECT 1 FROM rpm_package p WHERE p.changelog_id = c.digest);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pulp_rpm_delete_unused_package_metadata_trigger
+    AFTER DELETE
+    ON rpm_package
+    REFERENCING OLD TABLE AS deleted_packages
+    FOR EACH STATEMENT
+    EXECUTE PROCEDURE pulp_rpm_delete_unused_package_metadata();
+"""
+
+reverse_sql = """
+DROP TRIGGER IF EXISTS pulp_rpm_delete_unused_package_metadata_trigger ON rpm_package;
+DROP FUNCTION IF EXISTS pulp_rpm_delete_unused_package_metadata();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpm', '0085_publication_package_filters'),
+    ]
+
+    operations = [
+        migrations.RunSQL(trigger_sql, reverse_sql=reverse_sql),
+    ]
@@ -1,5 +1,8 @@
+from gettext import gettext as _
 from itertools import chain
 
+from django.conf import settings
+from django.db import IntegrityError
 from import_export import fields
 from import_export.widgets import ForeignKeyWidget, ManyToManyWidget
 
@@ -8,6 +11,7 @@ from pulpcore.plugin.modelresources import RepositoryResource
 from pulpcore.plugin.models import Content
 from pulpcore.plugin.util import get_domain
 
+from pulp_rpm.app.bulk_insert import copy_insert_packages
 from pulp_rpm.app.models import (
     Addon,
     Checksum,
@@ -120,9 +124,64 @@ class PackageResource(RpmContentResource):
     Resource for import/export of rpm_package entities.
     """
 
+    def __init__(self, *args, **kwargs):
+        """
+        Initialize the PackageResource.
+        """
+        super().__init__(*args, **kwargs)
+        # QueryModelResource does not initialize the lists of instances to import in bulk
+        self.create_instances = []
+        self.update_instances = []
+        self.delete_instances = []
+
+    def dehydrate_changelogs(self, package):
+        # export deduplicated changelogs inline, shared changelogs are not exported
+        return self.fields["changelogs"].widget.render(package.get_changelogs())
+
+    def dehydrate_files(self, package):
+        # export deduplicated files inline, filelists are not exported
+        return self.fields["files"].widget.render(package.get_files())
+
+    def before_save_instance(self, instance, row, **kwargs):
+        # new packages are only inserted at the end of the batch, but the import result needs
+        # their primary key right away
+        if instance._state.adding:
+            instance.content_ptr_id = instance.pulp_id
+
+    def bulk_create(self, using_transactions, dry_run, raise_errors, batch_size=None, result=None):
+        """
+        Insert the new packages of a batch with COPY.
+
+        Packages created by a concurrent import in the meantime fail the batch, like saving them
+        one by one would, so that the importer retries it. With ``RPM_BULK_INSERT_PACKAGES``
+        disabled, the packages are saved one by one.
+        """
+        if not self.create_instances or (dry_run and not using_transactions):
+            return
+        try:
+            if settings.RPM_DEDUPLICATE_PACKAGE_METADATA:
+                Package.deduplicate_metadata(self.create_instances)
+            if not settings.RPM_BULK_INSERT_PACKAGES:
+                for package in self.create_instances:
+                    package.save()
+                return
+            inserted = copy_insert_packages(self.create_instances)
+            if len(inserted) < len(self.create_instances):
+                raise IntegrityError(
+                    _("{} packages of the batch were created concurrently").format(
+                        len(self.create_instances) - len(inserted)
+                    )
+                )
+        except Exception as e:
+            self.handle_import_error(result, e, raise_errors)
+        finally:
+            self.create_instances.clear()
+
     class Meta:
         model = Package
         import_id_fields = model.natural_key_fields()
+        use_bulk = True
+        exclude = BaseContentResource.Meta.exclude + ("changelog", "filelist")
 
 
 class PackageCategoryResource(RpmContentResource):
@@ -9,7 +9,17 @@ from .content import RpmPackageSigningService  # noqa
 from .custom_metadata import RepoMetadataFile  # noqa
 from .distribution import Addon, Checksum, DistributionTree, Image, Variant  # noqa
 from .modulemd import Modulemd, ModulemdDefaults, ModulemdObsolete  # noqa
-from .package import Package, format_nevra, format_nevra_short, format_nvra  # noqa
+from .package import (  # noqa
+    LatestPackage,
+    Package,
+    PackageCapability,
+    PackageFileDirectory,
+    PackageChangelog,
+    PackageFilelist,
+    format_nevra,
+    format_nevra_short,
+    format_nvra,
+)
 from .repository import RpmDistribution, RpmPublication, RpmRemote, UlnRemote, RpmRepository  # noqa
 
 # at the end to avoid circular import as ACS needs import RpmRemote
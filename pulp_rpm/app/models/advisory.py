@@ -22,11 +22,23 @@ from pulp_rpm.app.constants import (
     PULP_UPDATE_RECORD_ATTRS,
     PULP_UPDATE_REFERENCE_ATTRS,
 )
+from pulp_rpm.app.models.package import RpmVersionField
 from pulp_rpm.app.shared_utils import parse_time
 
 log = getLogger(__name__)
 
 
+def _related(instance, name, *ordering):
+    """
+    Return the objects related to `instance` by `name`, in order.
+
+    Prefetched objects are returned as they are, so that the prefetch queryset has to order them.
+    """
+    if name in getattr(instance, "_prefetched_objects_cache", {}):
+        return getattr(instance, name).all()
+    return getattr(instance, name).all().order_by(*ordering)
+
+
 class UpdateRecord(Content):
     """
     The "UpdateRecord" content type, formerly "Errata" model in Pulp 2 now "Advisory".
@@ -179,12 +191,12 @@ class UpdateRecord(Content):
         rec.pushcount = self.pushcount
 
         if not collections:
-            collections = self.collections.all().order_by("name", "pulp_id")
+            collections = _related(self, "collections", "name", "pulp_id")
 
         for collection in collections:
             rec.append_collection(collection.to_createrepo_c())
 
-        for reference in self.references.all().order_by("href"):
+        for reference in _related(self, "references", "href"):
             rec.append_reference(reference.to_createrepo_c())
 
         return rec
@@ -317,7 +329,7 @@ class UpdateCollection(BaseModel):
             module.arch = self.module["arch"]
             col.module = module
 
-        for package in self.packages.all().order_by("sum"):
+        for package in _related(self, "packages", "sum"):
             col.append(package.to_createrepo_c())
 
         return col
@@ -336,6 +348,8 @@ class UpdateCollectionPackage(BaseModel):
             Arch
         epoch (Text):
             Epoch
+        evr (RpmVersionField):
+            Sort key of epoch, version and release, maintained by a database trigger
         filename (Text):
             Filename
         name (Text):
@@ -378,11 +392,20 @@ class UpdateCollectionPackage(BaseModel):
         choices=[(sum_type, sum_type) for sum_type in ADVISORY_SUM_TYPE_TO_NAME.keys()],
     )
     version = models.TextField()
+    evr = RpmVersionField()
 
     update_collection = models.ForeignKey(
         UpdateCollection, related_name="packages", on_delete=models.CASCADE
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["name", "arch", "evr"]),
+        ]
+
+    class ReadonlyMeta:
+        readonly = ["evr"]
+
     @classmethod
     def createrepo_to_dict(cls, package):
         """
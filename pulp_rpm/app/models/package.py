@@ -1,11 +1,14 @@
+import json
+import threading
+from hashlib import sha256
 from logging import getLogger
 
 import createrepo_c as cr
 from django.conf import settings
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
+from django.db import connection, models, transaction
 
-from pulpcore.plugin.models import Content
+from pulpcore.plugin.models import BaseModel, Content, RepositoryVersion
 from pulpcore.plugin.util import get_domain_pk
 
 from pulp_rpm.app.constants import (
@@ -15,6 +18,7 @@ from pulp_rpm.app.constants import (
     PULP_PACKAGE_ATTRS,
 )
 from pulp_rpm.app.shared_utils import format_nevra, format_nevra_short, format_nvra
+from pulp_rpm.app.sql_utils import annotate_with_age
 
 # avoid calling into dynaconf many times
 ALLOWED_CONTENT_CHECKSUMS = settings.ALLOWED_CONTENT_CHECKSUMS
@@ -89,6 +93,11 @@ class Package(Content):
         supplements (JSON):
             Capabilities the package supplements - see comments below
 
+        changelog (ForeignKey):
+            The deduplicated changelogs of the package, if they are not stored in `changelogs`
+        filelist (ForeignKey):
+            The deduplicated list of files of the package, if it is not stored in `files`
+
         location_base (Text):
             Base location of this package
         location_href (Text):
@@ -158,7 +167,13 @@ class Package(Content):
     #   date (int):     date of changelog - seconds since epoch
     #   author (str):   author of the changelog
     #   changelog (str: changelog text
+    #
+    # With RPM_DEDUPLICATE_PACKAGE_METADATA enabled, new packages keep this list empty and point at
+    # a PackageChangelog shared by every package with the same changelogs. Use get_changelogs().
     changelogs = models.JSONField(default=list)
+    changelog = models.ForeignKey(
+        "PackageChangelog", null=True, on_delete=models.PROTECT, related_name="packages"
+    )
 
     # A JSON-encoded list of tuples / arrays, each of which represents a single file.
     # Each file tuple contains the following fields:
@@ -166,7 +181,13 @@ class Package(Content):
     #   type (str):     one of "" (regular file), "dir", "ghost"
     #   path (str):     path to file
     #   name (str):     filename
+    #
+    # With RPM_DEDUPLICATE_PACKAGE_METADATA enabled, new packages keep this list empty and point at
+    # a PackageFilelist shared by every package with the same files. Use get_files().
     files = models.JSONField(default=list)
+    filelist = models.ForeignKey(
+        "PackageFilelist", null=True, on_delete=models.PROTECT, related_name="packages"
+    )
 
     # Each of these is a JSON-encoded list of dictionaries, each of which represents a dependency.
     # Each dependency dict contains the following fields:
@@ -261,6 +282,68 @@ class Package(Content):
             arch=self.arch,
         )
 
+    def get_files(self):
+        """Return the list of files of the package, wherever it is stored."""
+        if self.filelist_id:
+            return self.filelist.get_files()
+        return self.files
+
+    def get_changelogs(self):
+        """Return the changelogs of the package, wherever they are stored."""
+        if self.changelog_id:
+            return self.changelog.entries
+        return self.changelogs
+
+    def save(self, *args, **kwargs):
+        """Move the files and changelogs of a new package to shared storage if enabled."""
+        if (
+            self._state.adding
+            and (self.files or self.changelogs)
+            and settings.RPM_DEDUPLICATE_PACKAGE_METADATA
+        ):
+            # the shared rows stay locked until the package references them
+            with transaction.atomic():
+                self.deduplicate_metadata([self])
+                super().save(*args, **kwargs)
+            return
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def deduplicate_metadata(packages):
+        """
+        Store the files and changelogs of packages in shared rows and empty the inline fields.
+
+        Packages with identical files or changelogs, e.g. a package and its signed copy, end up
+        referencing the same rows. The packages themselves are not saved, they should be saved in
+        the same transaction: the shared rows are locked until its end, so that deleting other
+        packages does not remove them as unused in the meantime.
+
+        Args:
+            packages (list): Package instances, all directories, filelists and changelogs are
+                created at once
+
+        """
+        with_files = [package for package in packages if package.files]
+        directory_ids = PackageFileDirectory.get_ids(
+            {file_entry[1] for package in with_files for file_entry in package.files}
+        )
+        filelists = {}
+        for package in with_files:
+            filelist = PackageFilelist.from_files(package.files, directory_ids)
+            filelists[filelist.digest] = filelist
+            package.filelist_id = filelist.digest
+            package.files = []
+        _save_shared_metadata(PackageFilelist, filelists)
+
+        changelogs = {}
+        for package in packages:
+            if package.changelogs:
+                changelog = PackageChangelog.from_changelogs(package.changelogs)
+                changelogs[changelog.digest] = changelog
+                package.changelog_id = changelog.digest
+                package.changelogs = []
+        _save_shared_metadata(PackageChangelog, changelogs)
+
     class Meta:
         default_related_name = "%(app_label)s_%(model_name)s"
         unique_together = (
@@ -275,6 +358,8 @@ class Package(Content):
         )
         indexes = [
             models.Index(fields=["name", "arch", "evr"]),
+            # keyset pagination of the package list
+            models.Index(fields=["name", "evr", "content_ptr"]),
         ]
         permissions = [
             ("upload_rpm_packages", "Can upload RPM packages using synchronous API."),
@@ -434,7 +519,7 @@ class Package(Content):
 
         package = cr.Package()
         package.arch = getattr(self, PULP_PACKAGE_ATTRS.ARCH)
-        package.changelogs = list_to_createrepo_c(getattr(self, PULP_PACKAGE_ATTRS.CHANGELOGS))
+        package.changelogs = list_to_createrepo_c(self.get_changelogs())
         package.checksum_type = getattr(
             CHECKSUM_TYPES, getattr(self, PULP_PACKAGE_ATTRS.CHECKSUM_TYPE).upper()
         )
@@ -442,7 +527,7 @@ class Package(Content):
         package.description = getattr(self, PULP_PACKAGE_ATTRS.DESCRIPTION)
         package.enhances = list_to_createrepo_c(getattr(self, PULP_PACKAGE_ATTRS.ENHANCES))
         package.epoch = getattr(self, PULP_PACKAGE_ATTRS.EPOCH)
-        package.files = list_to_createrepo_c(getattr(self, PULP_PACKAGE_ATTRS.FILES))
+        package.files = list_to_createrepo_c(self.get_files())
         package.location_base = ""  # TODO: delete this entirely
         package.location_href = getattr(self, PULP_PACKAGE_ATTRS.LOCATION_HREF)
         package.name = getattr(self, PULP_PACKAGE_ATTRS.NAME)
@@ -471,3 +556,309 @@ class Package(Content):
         package.url = getattr(self, PULP_PACKAGE_ATTRS.URL)
         package.version = getattr(self, PULP_PACKAGE_ATTRS.VERSION)
         return package
+
+
+def _save_shared_metadata(model, instances):
+    """
+    Create the missing rows of shared package metadata and lock all of them.
+
+    Rows no package references anymore are deleted by a trigger when packages are deleted. The
+    rows are locked until the end of the transaction, which makes the trigger wait until the new
+    packages referencing them are saved, and the ones it deleted meanwhile are created again.
+
+    Args:
+        model (Model): PackageFilelist or PackageChangelog
+        instances (dict): Unsaved instances by digest
+
+    """
+    digests = sorted(instances)
+    with transaction.atomic():
+        while digests:
+            model.objects.bulk_create(
+                [instances[digest] for digest in digests], ignore_conflicts=True
+            )
+            locked = set(
+                model.objects.filter(digest__in=digests)
+                .order_by("digest")
+                .select_for_update(no_key=True)
+                .values_list("digest", flat=True)
+            )
+            digests = [digest for digest in digests if digest not in locked]
+
+
+class PackageFileDirectory(models.Model):
+    """
+    A directory the files of packages are in, shared by all the packages.
+
+    Filelists refer to directories by their integer id, which is much shorter than the paths
+    repeated by every package. Directories are never changed and their ids never reused, so their
+    paths are cached by every process once looked up. Directories no filelist uses anymore are
+    only removed by the rpm-deduplicate-package-metadata command, as filelists refer to them in
+    JSON, not with a foreign key.
+
+    Fields:
+
+        path (Text):
+            The directory path, e.g. "/usr/share/doc/"
+    """
+
+    # Bounds the cache of directory paths, which are never invalidated
+    CACHE_SIZE = 500000
+    _paths = {}
+    _paths_lock = threading.Lock()
+
+    id = models.BigAutoField(primary_key=True)
+    path = models.TextField(unique=True)
+
+    class Meta:
+        default_related_name = "%(app_label)s_%(model_name)s"
+
+    @classmethod
+    def get_ids(cls, paths):
+        """Return a dict of path to id for the given paths, creating the missing directories."""
+        paths = set(paths)
+        ids = dict(cls.objects.filter(path__in=paths).values_list("path", "id"))
+        missing = paths.difference(ids)
+        if missing:
+            cls.objects.bulk_create([cls(path=path) for path in missing], ignore_conflicts=True)
+            ids.update(cls.objects.filter(path__in=missing).values_list("path", "id"))
+        return ids
+
+    @classmethod
+    def get_paths(cls, ids):
+        """Return a dict of id to path for the given directory ids."""
+        ids = set(ids)
+        with cls._paths_lock:
+            paths = {id: cls._paths[id] for id in ids if id in cls._paths}
+        missing = ids.difference(paths)
+        if missing:
+            paths.update(cls.objects.filter(id__in=missing).values_list("id", "path"))
+            with cls._paths_lock:
+                if len(cls._paths) + len(paths) > cls.CACHE_SIZE:
+                    cls._paths.clear()
+                cls._paths.update(paths)
+        return paths
+
+
+class PackageFilelist(models.Model):
+    """
+    A list of files shared by every package containing exactly these files.
+
+    Fields:
+
+        digest (Text):
+            sha256 of the JSON encoded list of files, as stored in Package.files
+        entries (JSON):
+            The files as (type, directory id, name) tuples, in the original order
+    """
+
+    digest = models.CharField(max_length=64, primary_key=True)
+    entries = models.JSONField()
+
+    class Meta:
+        default_related_name = "%(app_label)s_%(model_name)s"
+
+    @classmethod
+    def from_files(cls, files, directory_ids):
+        """
+        Build the (unsaved) filelist of a list of (type, path, name) file tuples.
+
+        Args:
+            files (list): The files, as returned by Package.createrepo_to_dict()
+            directory_ids (dict): Mapping of directory path to PackageFileDirectory id
+
+        """
+        digest = sha256(json.dumps(files, separators=(",", ":")).encode()).hexdigest()
+        entries = [[typ, directory_ids[path], name] for typ, path, name in files]
+        return cls(digest=digest, entries=entries)
+
+    def get_files(self):
+        """Return the files as (type, path, name) lists, like they are stored in Package.files."""
+        paths = PackageFileDirectory.get_paths({entry[1] for entry in self.entries})
+        return [[typ, paths[directory_id], name] for typ, directory_id, name in self.entries]
+
+
+class PackageChangelog(models.Model):
+    """
+    The changelogs shared by every package containing exactly these changelog entries.
+
+    Fields:
+
+        digest (Text):
+            sha256 of the JSON encoded changelogs
+        entries (JSON):
+            The changelogs, as stored in Package.changelogs
+    """
+
+    digest = models.CharField(max_length=64, primary_key=True)
+    entries = models.JSONField()
+
+    class Meta:
+        default_related_name = "%(app_label)s_%(model_name)s"
+
+    @classmethod
+    def from_changelogs(cls, changelogs):
+        """Build the (unsaved) shared changelog of a list of (author, date, text) entries."""
+        digest = sha256(json.dumps(changelogs, separators=(",", ":")).encode()).hexdigest()
+        return cls(digest=digest, entries=changelogs)
+
+
+class PackageCapability(BaseModel):
+    """
+    A single capability a Package provides, requires, conflicts with, etc.
+
+    Rows are derived from the JSON dependency lists of the package, so that "which packages
+    provide X" can be answered with an index lookup instead of decoding every package.
+
+    Fields:
+
+        kind (Text):
+            The Package field the capability comes from, e.g. "provides" or "requires"
+        name (Text):
+            Name of the capability
+        flags (Text):
+            Comparison flags, e.g. "GE", or null for unversioned capabilities
+        epoch (Text):
+            Epoch of the capability version
+        version (Text):
+            Version of the capability version
+        release (Text):
+            Release of the capability version
+        pre (Boolean):
+            Whether it is a preinstall requirement
+
+    Relations:
+
+        package (models.ForeignKey): The package the capability belongs to
+    """
+
+    KINDS = (
+        PULP_PACKAGE_ATTRS.PROVIDES,
+        PULP_PACKAGE_ATTRS.REQUIRES,
+        PULP_PACKAGE_ATTRS.CONFLICTS,
+        PULP_PACKAGE_ATTRS.OBSOLETES,
+        PULP_PACKAGE_ATTRS.SUGGESTS,
+        PULP_PACKAGE_ATTRS.ENHANCES,
+        PULP_PACKAGE_ATTRS.RECOMMENDS,
+        PULP_PACKAGE_ATTRS.SUPPLEMENTS,
+    )
+
+    kind = models.TextField(choices=[(kind, kind) for kind in KINDS])
+    name = models.TextField()
+    flags = models.TextField(null=True)
+    epoch = models.TextField(null=True)
+    version = models.TextField(null=True)
+    release = models.TextField(null=True)
+    pre = models.BooleanField(default=False)
+
+    package = models.ForeignKey(Package, related_name="capabilities", on_delete=models.CASCADE)
+
+    class Meta:
+        default_related_name = "%(app_label)s_%(model_name)s"
+        indexes = [
+            models.Index(fields=["kind", "name"]),
+        ]
+
+    @classmethod
+    def index_packages(cls, packages, batch_size=1000):
+        """
+        Create the capabilities of the given packages that are not indexed yet.
+
+        Args:
+            packages (django.db.models.QuerySet): The packages to index.
+            batch_size (int): How many packages to index at once.
+
+        """
+        packages = packages.exclude(
+            models.Exists(cls.objects.filter(package_id=models.OuterRef("pk")))
+        )
+        capabilities = []
+        for package_pk, *dependency_lists in packages.values_list("pk", *cls.KINDS).iterator(
+            chunk_size=batch_size
+        ):
+            for kind, dependencies in zip(cls.KINDS, dependency_lists):
+                for name, flags, epoch, version, release, *pre in dependencies:
+                    capabilities.append(
+                        cls(
+                            package_id=package_pk,
+                            kind=kind,
+                            name=name,
+                            flags=flags,
+                            epoch=epoch,
+                            version=version,
+                            release=release,
+                            pre=bool(pre and pre[0]),
+                        )
+                    )
+            if len(capabilities) >= batch_size:
+                cls.objects.bulk_create(capabilities)
+                capabilities = []
+        cls.objects.bulk_create(capabilities)
+
+
+class LatestPackage(models.Model):
+    """
+    The newest Package of each name and arch in a repository version.
+
+    Rows are computed once when the version is finalized, so that "the latest packages of a
+    version" is a join instead of a window function over every package of the version.
+
+    Relations:
+
+        repository_version (models.ForeignKey): The repository version
+        package (models.ForeignKey): The newest package of its name and arch in the version
+    """
+
+    # one row per name and arch of every version adds up quickly
+    id = models.BigAutoField(primary_key=True)
+    repository_version = models.ForeignKey(RepositoryVersion, on_delete=models.CASCADE)
+    package = models.ForeignKey(Package, on_delete=models.CASCADE)
+
+    class Meta:
+        default_related_name = "%(app_label)s_%(model_name)s"
+        unique_together = ("repository_version", "package")
+
+    @classmethod
+    def index_version(cls, version):
+        """
+        Compute the latest packages of a repository version that is being finalized.
+
+        Args:
+            version (pulpcore.app.models.RepositoryVersion): The repository version to index.
+
+        """
+        cls.objects.filter(repository_version=version).delete()
+        latest = (
+            Package.objects.filter(pk__in=version.content.filter(pulp_type=Package.get_pulp_type()))
+            .order_by("name", "arch", "-evr")
+            .distinct("name", "arch")
+            .values_list("pk")
+        )
+        sql, params = latest.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {cls._meta.db_table} (repository_version_id, package_id) "
+                f"SELECT %s, latest.* FROM ({sql}) AS latest",
+                [version.pk, *params],
+            )
+
+    @classmethod
+    def get_packages(cls, version):
+        """
+        Return the newest Package of each name and arch in a repository version.
+
+        Versions which were created before the index existed fall back to computing the age
+        of every package of the version.
+
+        Args:
+            version (pulpcore.app.models.RepositoryVersion): The repository version.
+
+        Returns:
+            django.db.models.QuerySet: The latest packages of the version.
+
+        """
+        indexed = cls.objects.filter(repository_version=version)
+        if indexed.exists():
+            return Package.objects.filter(pk__in=indexed.values("package_id"))
+        packages = annotate_with_age(version.get_content(Package.objects)).filter(age=1)
+        return Package.objects.filter(pk__in=packages.values("pk"))
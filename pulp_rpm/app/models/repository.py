@@ -2,12 +2,16 @@ import os
 import re
 import textwrap
 from gettext import gettext as _
+from hashlib import sha256
 from logging import getLogger
 
+from aiohttp.web_fileresponse import FileResponse
 from aiohttp.web_response import Response
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
 
 from pulpcore.plugin.download import DownloaderFactory
 from pulpcore.plugin.models import (
@@ -37,13 +41,22 @@ from pulp_rpm.app.constants import (
     LAYOUT_CHOICES,
 )
 from pulp_rpm.app.downloaders import RpmDownloader, RpmFileDownloader, UlnDownloader
+from pulp_rpm.app.dynamic_repodata import RETRY_AFTER, get_dynamic_repodata, publish_settings
 from pulp_rpm.app.exceptions import DistributionTreeConflict
+from pulp_rpm.app.metadata_cache import (
+    get_metadata_cache,
+    is_metadata_path,
+    metadata_content_type,
+    validator_headers,
+)
 from pulp_rpm.app.models import (
     DistributionTree,
+    LatestPackage,
     Modulemd,
     ModulemdDefaults,
     ModulemdObsolete,
     Package,
+    PackageCapability,
     PackageCategory,
     PackageEnvironment,
     PackageGroup,
@@ -218,6 +231,14 @@ class RpmRepository(Repository, AutoAddObjPermsMixin):
             Compression type to use for metadata files.
         layout(pulp_rpm.app.constants.LAYOUT_TYPES):
             How to layout the package files within the publication (flat, nested, etc.)
+        zchunk_metadata (Boolean): Whether to publish zchunk variants of the metadata as well.
+        arches (Array): The architectures of the packages to publish, all of them if null. noarch
+            packages are always published.
+        exclude_debuginfo (Boolean): Whether to leave the debuginfo packages out of publications.
+        exclude_source (Boolean): Whether to leave the source packages out of publications.
+        latest_publication (RpmPublication):
+            The publication served by distributions pointing at this repository, i.e. the latest
+            complete publication of the latest published version. Maintained by signal handlers.
     """
 
     TYPE = "rpm"
@@ -250,6 +271,10 @@ class RpmRepository(Repository, AutoAddObjPermsMixin):
     checksum_type = models.TextField(null=True, choices=CHECKSUM_CHOICES)
     compression_type = models.TextField(null=True, choices=COMPRESSION_CHOICES)
     layout = models.TextField(null=True, choices=LAYOUT_CHOICES)
+    zchunk_metadata = models.BooleanField(default=False)
+    arches = ArrayField(models.TextField(), null=True)
+    exclude_debuginfo = models.BooleanField(default=False)
+    exclude_source = models.BooleanField(default=False)
     metadata_checksum_type = models.TextField(
         null=True, choices=CHECKSUM_CHOICES
     )  # DEPRECATED, remove in 3.31+
@@ -257,6 +282,9 @@ class RpmRepository(Repository, AutoAddObjPermsMixin):
         null=True, choices=CHECKSUM_CHOICES
     )  # DEPRECATED, remove in 3.31+
     repo_config = models.JSONField(default=dict)
+    latest_publication = models.ForeignKey(
+        "RpmPublication", null=True, on_delete=models.SET_NULL, related_name="+"
+    )
 
     def on_new_version(self, version):
         """
@@ -278,6 +306,10 @@ class RpmRepository(Repository, AutoAddObjPermsMixin):
                 repo_config=self.repo_config,
                 compression_type=self.compression_type,
                 layout=self.layout,
+                zchunk_metadata=self.zchunk_metadata,
+                arches=self.arches,
+                exclude_debuginfo=self.exclude_debuginfo,
+                exclude_source=self.exclude_source,
             )
 
     def check_content_overwrite(self, version, add_content_pks, remove_content_pks=None):
@@ -301,6 +333,46 @@ class RpmRepository(Repository, AutoAddObjPermsMixin):
             version, add_content_pks, remove_content_pks=remove_content_pks
         )
 
+    @classmethod
+    def refresh_latest_publication(cls, repository_pk, deleted_publication_pk=None):
+        """
+        Recompute the latest_publication of a repository.
+
+        This runs the query the content app would otherwise run on every request for a
+        distribution pointing at the repository. The repository row is locked, so that of two
+        publications completing concurrently the refresh running last sees both of them.
+
+        Args:
+            repository_pk (uuid.UUID): The pk of the repository to update.
+            deleted_publication_pk (uuid.UUID): A publication being deleted, whose rows may still
+                exist while the deletion cascades.
+        """
+        with transaction.atomic():
+            repository = cls.objects.select_for_update().filter(pk=repository_pk)
+            if not repository.exists():
+                return
+            latest_publication = (
+                Publication.objects.filter(
+                    repository_version__repository_id=repository_pk, complete=True
+                )
+                .exclude(pk=deleted_publication_pk)
+                .order_by("-repository_version__number", "-pulp_created")
+                .values_list("pk", flat=True)
+                .first()
+            )
+            repository.update(latest_publication=latest_publication)
+
+    def get_latest_publication(self):
+        """Return the RpmPublication served by distributions pointing at this repository."""
+        if self.latest_publication_id is None:
+            return None
+        return (
+            RpmPublication.objects.select_related("repository_version")
+            .defer("repository_version__content_ids")
+            .filter(pk=self.latest_publication_id)
+            .first()
+        )
+
     @property
     def published_metadata_size(self):
         versions = self.versions.all()
@@ -411,6 +483,8 @@ class RpmRepository(Repository, AutoAddObjPermsMixin):
         Ensure that modulemd is added with all its RPMs.
         Ensure that modulemd is removed with all its RPMs.
         Resolve advisory conflicts when there is more than one advisory with the same id.
+        Index the capabilities of added packages.
+        Index the latest package of each name and arch.
 
         Args:
             new_version (pulpcore.app.models.RepositoryVersion): The incomplete RepositoryVersion
@@ -437,6 +511,9 @@ class RpmRepository(Repository, AutoAddObjPermsMixin):
 
         resolve_advisories(new_version, previous_version)
 
+        PackageCapability.index_packages(Package.objects.filter(pk__in=new_version.added()))
+        LatestPackage.index_version(new_version)
+
         #
         # Some repositories are odd. A given NEVRA with different checksums can appear at
         # different locations in the repo, or a single Artifact can be referenced by more than one
@@ -523,6 +600,18 @@ class RpmRepository(Repository, AutoAddObjPermsMixin):
 class RpmPublication(Publication, AutoAddObjPermsMixin):
     """
     Publication for "rpm" content.
+
+    Fields:
+
+        zchunk_metadata (Boolean): Whether zchunk variants of the metadata are published as well.
+        arches (Array): The architectures of the published packages, all of them if null. noarch
+            packages are always published.
+        exclude_debuginfo (Boolean): Whether the debuginfo and debugsource packages are left out.
+        exclude_source (Boolean): Whether the source packages are left out.
+        content_fingerprint (Text): The fingerprint of the content of the repository version,
+            if its metadata can be reused by publications of other versions with the same content.
+        metadata_signing_service (AsciiArmoredDetachedSigningService): The service which signed
+            the metadata.
     """
 
     TYPE = "rpm"
@@ -532,6 +621,14 @@ class RpmPublication(Publication, AutoAddObjPermsMixin):
     package_checksum_type = models.TextField(null=True, choices=CHECKSUM_CHOICES)
     layout = models.TextField(null=True, choices=LAYOUT_CHOICES)
     repo_config = models.JSONField(default=dict)
+    zchunk_metadata = models.BooleanField(default=False)
+    arches = ArrayField(models.TextField(), null=True)
+    exclude_debuginfo = models.BooleanField(default=False)
+    exclude_source = models.BooleanField(default=False)
+    content_fingerprint = models.TextField(null=True, db_index=True)
+    metadata_signing_service = models.ForeignKey(
+        AsciiArmoredDetachedSigningService, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
 
     class Meta:
         default_related_name = "%(app_label)s_%(model_name)s"
@@ -543,6 +640,12 @@ class RpmPublication(Publication, AutoAddObjPermsMixin):
 class RpmDistribution(Distribution, AutoAddObjPermsMixin):
     """
     Distribution for "rpm" content.
+
+    Fields:
+
+        generate_repo_config (Boolean): Whether to serve a generated config.repo file.
+        dynamic_repodata (Boolean): Whether a distribution of a repository serves the latest
+            repository version with repodata generated on demand instead of a publication.
     """
 
     TYPE = "rpm"
@@ -551,77 +654,181 @@ class RpmDistribution(Distribution, AutoAddObjPermsMixin):
     INVALID_REPO_ID_CHARS = r"[^\w\-_.:]"
 
     generate_repo_config = models.BooleanField(default=False)
+    dynamic_repodata = models.BooleanField(default=False)
+
+    @property
+    def serves_dynamic_repodata(self):
+        """Whether this distribution serves repodata generated on demand."""
+        return self.dynamic_repodata and self.repository_id and not self.publication_id
 
     def content_handler(self, path):
-        """Serve config.repo and repomd.xml.key."""
+        """Serve config.repo and repomd.xml.key, and small repodata files from memory."""
+        if self.serves_dynamic_repodata:
+            return self._dynamic_repodata_response(path)
         if self.generate_repo_config and path == self.repository_config_file_name:
-            repository, publication = self.get_repository_and_publication()
-            if not publication:
-                return
+            return self._config_repo_response()
+        if not self.checkpoint and is_metadata_path(path):
+            return self._cached_metadata_response(path)
+
+    def _config_repo_response(self):
+        """Build config.repo, or serve it from the metadata cache if it is still current."""
+        repository, publication = self.get_repository_and_publication()
+        if not publication:
+            return
 
-            # "Where content will be retrieved from" comes first from CONTENT_ORIGIN.
-            # If that's not set, use a specified baseurl.
-            # If *that* isn't set - fail, we can't build a config.repo because we
-            # don't have enough information to set the baseurl correctly.
-            origin = (
-                settings.CONTENT_ORIGIN
-                if settings.CONTENT_ORIGIN
-                else publication.repo_config.get("baseurl")
+        cache = get_metadata_cache()
+        key = (self.pk, self.repository_config_file_name)
+        token = (
+            publication.pk,
+            self.name,
+            self.base_path,
+            repository.metadata_signing_service_id,
+        )
+        if cache.enabled and (entry := cache.get(key, token)) is not None:
+            return Response(body=entry.body, headers=entry.headers)
+
+        # "Where content will be retrieved from" comes first from CONTENT_ORIGIN.
+        # If that's not set, use a specified baseurl.
+        # If *that* isn't set - fail, we can't build a config.repo because we
+        # don't have enough information to set the baseurl correctly.
+        origin = (
+            settings.CONTENT_ORIGIN
+            if settings.CONTENT_ORIGIN
+            else publication.repo_config.get("baseurl")
+        )
+        if not origin:
+            return Response(
+                status=404,
+                reason=_(
+                    "Cannot auto-generate config.repo when CONTENT_ORIGIN is not set and "
+                    "no baseurl specified."
+                ),
             )
-            if not origin:
-                return Response(
-                    status=404,
-                    reason=_(
-                        "Cannot auto-generate config.repo when CONTENT_ORIGIN is not set and "
-                        "no baseurl specified."
-                    ),
-                )
-            if settings.DOMAIN_ENABLED:
-                base_url = "{}/".format(
-                    urlpath_sanitize(
-                        origin,
-                        settings.CONTENT_PATH_PREFIX,
-                        self.pulp_domain.name,
-                        self.base_path,
-                    )
+        if settings.DOMAIN_ENABLED:
+            base_url = "{}/".format(
+                urlpath_sanitize(
+                    origin,
+                    settings.CONTENT_PATH_PREFIX,
+                    self.pulp_domain.name,
+                    self.base_path,
                 )
-            else:
-                base_url = "{}/".format(
-                    urlpath_sanitize(
-                        origin,
-                        settings.CONTENT_PATH_PREFIX,
-                        self.base_path,
-                    )
+            )
+        else:
+            base_url = "{}/".format(
+                urlpath_sanitize(
+                    origin,
+                    settings.CONTENT_PATH_PREFIX,
+                    self.base_path,
                 )
-            repo_config = publication.repo_config
-            repo_config.pop("name", None)
-            repo_config.pop("baseurl", None)
-            val = textwrap.dedent(f"""\
-                [{re.sub(self.INVALID_REPO_ID_CHARS, "", self.name)}]
-                name={self.name}
-                baseurl={base_url}
-                """)
-            for k, v in repo_config.items():
-                val += f"{k}={v}\n"
-
-            if "repo_gpgcheck" not in repo_config:
-                val += "repo_gpgcheck=0\n"
-
-            if "gpgcheck" not in repo_config:
-                val += "gpgcheck=0\n"
-
-            if "enabled" not in repo_config:
-                val += "enabled=1\n"
-
-            signing_service = repository.metadata_signing_service
-            if signing_service:
-                gpgkey_path = urlpath_sanitize(
-                    base_url,
-                    "/repodata/repomd.xml.key",
+            )
+        repo_config = publication.repo_config
+        repo_config.pop("name", None)
+        repo_config.pop("baseurl", None)
+        val = textwrap.dedent(f"""\
+            [{re.sub(self.INVALID_REPO_ID_CHARS, "", self.name)}]
+            name={self.name}
+            baseurl={base_url}
+            """)
+        for k, v in repo_config.items():
+            val += f"{k}={v}\n"
+
+        if "repo_gpgcheck" not in repo_config:
+            val += "repo_gpgcheck=0\n"
+
+        if "gpgcheck" not in repo_config:
+            val += "gpgcheck=0\n"
+
+        if "enabled" not in repo_config:
+            val += "enabled=1\n"
+
+        signing_service = repository.metadata_signing_service
+        if signing_service:
+            gpgkey_path = urlpath_sanitize(
+                base_url,
+                "/repodata/repomd.xml.key",
+            )
+            val += f"gpgkey={gpgkey_path}\n"
+
+        body = val.encode()
+        headers = {"Content-Type": "text/plain; charset=utf-8"}
+        headers.update(validator_headers(sha256(body).hexdigest(), publication.pulp_created))
+        if cache.enabled:
+            cache.set(key, token, body, headers)
+        return Response(body=body, headers=headers)
+
+    def _cached_metadata_response(self, path):
+        """
+        Serve a published repodata file from the metadata cache.
+
+        Returns None, so that pulpcore serves the file as usual, when the cache is disabled, the
+        file is not part of the publication or it is too large to be kept in memory.
+        """
+        cache = get_metadata_cache()
+        if not cache.enabled:
+            return
+        _, publication = self.get_repository_and_publication()
+        if not publication:
+            return
+
+        key = (self.pk, path)
+        entry = cache.get(key, publication.pk)
+        if entry is None:
+            body = None
+            published_artifact = (
+                publication.published_artifact.select_related(
+                    "content_artifact__artifact__pulp_domain"
                 )
-                val += f"gpgkey={gpgkey_path}\n"
+                .filter(relative_path=path)
+                .first()
+            )
+            artifact = published_artifact and published_artifact.content_artifact.artifact
+            if artifact and artifact.size <= cache.max_entry_size:
+                artifact_file = artifact.pulp_domain.get_storage().open(artifact.file.name)
+                try:
+                    body = artifact_file.read()
+                finally:
+                    artifact_file.close()
+            headers = {}
+            if content_type := metadata_content_type(path):
+                headers["Content-Type"] = content_type
+            headers.update(self.content_headers_for(path))
+            if artifact:
+                # Publications are immutable, so the checksum of the file is a strong validator
+                headers.update(validator_headers(artifact.sha256, publication.pulp_created))
+            entry = cache.set(key, publication.pk, body, headers)
+
+        if entry.body is not None:
+            return Response(body=entry.body, headers=entry.headers)
+
+    def _dynamic_repodata_response(self, path):
+        """
+        Serve the latest repository version, generating its repodata on the first request.
 
-            return Response(body=val)
+        Repodata files are served from the directory they were generated into, and the other
+        paths are resolved to the ContentArtifacts a publication would have published there.
+        While the repodata is being generated, requests are answered with 503.
+        """
+        repository = self.repository.cast()
+        repository_version = repository.latest_version()
+        if repository_version is None:
+            return
+        repodata = get_dynamic_repodata(repository_version, publish_settings(repository))
+        if repodata is None:
+            return Response(
+                status=503,
+                text=_("The repodata is being generated, try again later."),
+                headers={"Retry-After": str(RETRY_AFTER)},
+            )
+        if path in repodata.metadata:
+            headers = {}
+            if content_type := metadata_content_type(path):
+                headers["Content-Type"] = content_type
+            headers.update(self.content_headers_for(path))
+            return FileResponse(os.path.join(repodata.path, path), headers=headers)
+        if content_artifact_pk := repodata.artifacts.get(path):
+            return ContentArtifact.objects.select_related("artifact", "artifact__pulp_domain").get(
+                pk=content_artifact_pk
+            )
 
     def content_headers_for(self, path):
         """Return per-file http-headers."""
@@ -646,22 +853,57 @@ class RpmDistribution(Distribution, AutoAddObjPermsMixin):
             repository = publication.repository.cast()
         elif self.repository:
             repository = self.repository.cast()
-            versions = repository.versions.all()
-            publications = Publication.objects.filter(
-                repository_version__in=versions, complete=True
-            )
-            try:
-                publication = (
-                    publications.select_related("repository_version")
-                    .latest("repository_version", "pulp_created")
-                    .cast()
-                )
-            except ObjectDoesNotExist:
-                pass
+            publication = repository.get_latest_publication()
         return repository, publication
 
+    def get_repository_publication_and_version(self):
+        """
+        Resolve the repository, repository version, and publication to serve.
+
+        For distributions pointing at a repository, the publication is looked up through
+        RpmRepository.latest_publication instead of searching all publications of the repository.
+        Distributions serving dynamic repodata never serve a publication.
+        """
+        if self.publication or self.repository_version or not self.repository:
+            return super().get_repository_publication_and_version()
+        repository = self.repository.cast()
+        if self.dynamic_repodata:
+            return repository, repository.latest_version(), None
+        publication = repository.get_latest_publication()
+        if publication:
+            repo_version = publication.repository_version
+        else:
+            repo_version = repository.latest_version()
+        return repository, repo_version, publication
+
     class Meta:
         default_related_name = "%(app_label)s_%(model_name)s"
         permissions = [
             ("manage_roles_rpmdistribution", "Can manage roles on an RPM distribution"),
         ]
+
+
+@receiver(post_save, sender=RpmPublication)
+def publication_saved(sender, instance, **kwargs):
+    """Point the repository at a publication once it is complete."""
+    if instance.complete:
+        RpmRepository.refresh_latest_publication(instance.repository_version.repository_id)
+
+
+@receiver(pre_delete, sender=RpmPublication)
+def publication_pre_delete(sender, instance, **kwargs):
+    """Remember the repository of a publication, the repository version may be deleted too."""
+    instance._repository_pk = (
+        RepositoryVersion.objects.filter(pk=instance.repository_version_id)
+        .values_list("repository_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_delete, sender=RpmPublication)
+def publication_deleted(sender, instance, **kwargs):
+    """Point the repository at its next latest publication."""
+    if getattr(instance, "_repository_pk", None) and instance.complete:
+        RpmRepository.refresh_latest_publication(
+            instance._repository_pk, deleted_publication_pk=instance.pk
+        )
@@ -1,26 +1,15 @@
-import hashlib
 import logging
-import os
-import tempfile
-from contextlib import contextmanager
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from gettext import gettext as _  # noqa:F401
 
-import createrepo_c as cr
-import yaml
+from django.conf import settings
 from django.db.models import Prefetch
-from jsonschema import Draft7Validator
 
 from pulpcore.plugin.models import Content
 
-from pulp_rpm.app.constants import (
-    PULP_MODULE_ATTR,
-    PULP_MODULEDEFAULTS_ATTR,
-    PULP_MODULEOBSOLETES_ATTR,
-    YAML_MODULEMD_DEFAULTS_REQUIRED_ATTR,
-    YAML_MODULEMD_OBSOLETES_REQUIRED_ATTR,
-)
 from pulp_rpm.app.models import Modulemd, Package
-from pulp_rpm.app.schema import MODULEMD_SCHEMA
+from pulp_rpm.app.modulemd_parser import parse_modulemd_document, split_modulemd_file
 from pulp_rpm.app.sql_utils import get_content_in_repoversion, safe_in
 
 log = logging.getLogger(__name__)
@@ -72,184 +61,38 @@ def resolve_module_packages(version, previous_version):
     version.add_content(Package.objects.filter(pk__in=packages_to_add))
 
 
-def split_modulemd_file(file: str):
-    """
-    Helper method to preserve original formatting of modulemd.
-
-    Args:
-        file: Absolute path to file
-    """
-    with tempfile.TemporaryDirectory(dir=".") as tf:
-        decompressed_path = os.path.join(tf, "modulemd.yaml")
-        cr.decompress_file(file, decompressed_path, cr.AUTO_DETECT_COMPRESSION)
-        with open(decompressed_path) as modulemd_file:
-            for doc in modulemd_file.read().split("---"):
-                # strip any spaces or newlines from either side, strip the document end marking,
-                # then strip again so we have only the document text w/o newlines
-                stripped = doc.strip().rstrip("...").rstrip()
-                if stripped:
-                    # add the document begin/end markers backs
-                    normalized = "---\n{}\n...".format(stripped)
-                    yield normalized
-
-
-def check_mandatory_module_fields(module, required_fields):
-    """
-    Check mandatory fields on module dict.
-    """
-    data = module["data"]
-    for field in required_fields:
-        if field not in data.keys():
-            raise ValueError(
-                _("Mandatory field {} is missing in {}.").format(field, module["document"])
-            )
-
-
-def create_modulemd(modulemd, snippet):
-    """
-    Create dict with modulemd data to be saved to DB.
-    """
-    new_module = dict()
-    new_module[PULP_MODULE_ATTR.NAME] = modulemd["data"].get("name")
-    new_module[PULP_MODULE_ATTR.STREAM] = str(modulemd["data"].get("stream"))
-    new_module[PULP_MODULE_ATTR.VERSION] = str(modulemd["data"].get("version"))
-    new_module[PULP_MODULE_ATTR.STATIC_CONTEXT] = modulemd["data"].get("static_context")
-    new_module[PULP_MODULE_ATTR.CONTEXT] = modulemd["data"].get("context")
-    new_module[PULP_MODULE_ATTR.ARCH] = modulemd["data"].get("arch")
-    new_module[PULP_MODULE_ATTR.ARTIFACTS] = modulemd["data"].get("artifacts", {}).get("rpms", [])
-    new_module[PULP_MODULE_ATTR.DESCRIPTION] = modulemd["data"].get("description")
-    new_module[PULP_MODULE_ATTR.DEPENDENCIES] = modulemd["data"].get("dependencies", [])
-
-    # keep data formatted the same as it was with previous parsing implementation
-    unprocessed_profiles = modulemd["data"].get("profiles", {})
-    profiles = {}
-    if unprocessed_profiles:
-        for name, data in unprocessed_profiles.items():
-            rpms = data.get("rpms")
-            if not rpms:
-                msg = (
-                    "Got unexpected data for module {}-{}-{}-{}-{}: "
-                    "profiles failed to parse properly"
-                ).format(
-                    new_module[PULP_MODULE_ATTR.NAME],
-                    new_module[PULP_MODULE_ATTR.STREAM],
-                    new_module[PULP_MODULE_ATTR.VERSION],
-                    new_module[PULP_MODULE_ATTR.CONTEXT],
-                    new_module[PULP_MODULE_ATTR.ARCH],
-                )
-                log.warning(msg)
-            else:
-                profiles[name] = rpms
-
-    new_module[PULP_MODULE_ATTR.PROFILES] = profiles
-    new_module["snippet"] = snippet
-    new_module["digest"] = hashlib.sha256(snippet.encode()).hexdigest()
-
-    return new_module
-
-
-def create_modulemd_defaults(default, snippet):
-    """
-    Create dict with modulemd-defaults data to can be saved to DB.
-    """
-    new_default = dict()
-    new_default[PULP_MODULEDEFAULTS_ATTR.MODULE] = default["data"].get("module")
-    new_default[PULP_MODULEDEFAULTS_ATTR.STREAM] = str(default["data"].get("stream", ""))
-    new_default[PULP_MODULEDEFAULTS_ATTR.PROFILES] = default["data"].get("profiles")
-    new_default["snippet"] = snippet
-    new_default[PULP_MODULEDEFAULTS_ATTR.DIGEST] = hashlib.sha256(snippet.encode()).hexdigest()
-
-    return new_default
-
-
-def create_modulemd_obsoletes(obsolete, snippet):
-    """
-    Create dict with modulemd-obsoletes data to can be saved to DB.
-    """
-    new_obsolete = dict()
-
-    new_obsolete[PULP_MODULEOBSOLETES_ATTR.MODIFIED] = obsolete["data"].get("modified")
-    new_obsolete[PULP_MODULEOBSOLETES_ATTR.MODULE] = obsolete["data"].get("module")
-    new_obsolete[PULP_MODULEOBSOLETES_ATTR.STREAM] = str(obsolete["data"].get("stream"))
-    new_obsolete[PULP_MODULEOBSOLETES_ATTR.MESSAGE] = obsolete["data"].get("message")
-    new_obsolete[PULP_MODULEOBSOLETES_ATTR.RESET] = obsolete["data"].get("reset")
-    new_obsolete[PULP_MODULEOBSOLETES_ATTR.CONTEXT] = obsolete["data"].get("context")
-
-    if obsolete["data"].get("eol_date"):
-        new_obsolete[PULP_MODULEOBSOLETES_ATTR.EOL] = obsolete["data"].get("eol_date")
-    if obsolete["data"].get("obsoleted_by"):
-        new_obsolete[PULP_MODULEOBSOLETES_ATTR.OBSOLETE_BY_MODULE] = obsolete["data"][
-            "obsoleted_by"
-        ].get("module")
-        new_obsolete[PULP_MODULEOBSOLETES_ATTR.OBSOLETE_BY_STREAM] = obsolete["data"][
-            "obsoleted_by"
-        ].get("stream")
-    new_obsolete["snippet"] = snippet
-
-    return new_obsolete
-
-
-def parse_modular(file: str):
+def parse_modular(file: str, workers=None):
     """
     Parse all modular metadata.
 
     Args:
         file: Absolute path to file
+        workers: The number of processes to parse the documents with, defaults to the
+            RPM_MODULEMD_PARSE_WORKERS setting.
     """
     modulemd_all = []
     modulemd_defaults_all = []
     modulemd_obsoletes_all = []
+    parsed = {
+        "modulemd": modulemd_all,
+        "modulemd-defaults": modulemd_defaults_all,
+        "modulemd-obsoletes": modulemd_obsoletes_all,
+    }
+
+    workers = workers or settings.RPM_MODULEMD_PARSE_WORKERS
+    documents = split_modulemd_file(file)
+    if workers > 1:
+        # spawned, not forked, the parser does not need any of the state of the task
+        executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        with executor:
+            results = list(executor.map(parse_modulemd_document, documents, chunksize=64))
+    else:
+        results = map(parse_modulemd_document, documents)
 
-    for module in split_modulemd_file(file):
-        with disable_pyyaml_magic_casting():
-            parsed_data = yaml.load(module, Loader=yaml.SafeLoader)
-        # here we check the modulemd document as we don't store all info, so serializers
-        # are not enough then we only need to take required data from dict which is
-        # parsed by pyyaml library
-        if parsed_data["document"] == "modulemd":
-            # the validator currently accepts formatting slightly different to the
-            # spec due to the misconfiguration of some Rocky Linux 9 repositories
-            # https://bugs.rockylinux.org/view.php?id=2575
-            # further discussion on this issue can be found here:
-            # https://github.com/pulp/pulp_rpm/issues/2998
-            validator = Draft7Validator(MODULEMD_SCHEMA)
-            err = []
-            for error in sorted(validator.iter_errors(parsed_data["data"]), key=str):
-                err.append(error.message)
-            if err:
-                raise ValueError(_("Provided modular data is invalid:'{}'").format(err))
-            modulemd_all.append(create_modulemd(parsed_data, module))
-        elif parsed_data["document"] == "modulemd-defaults":
-            check_mandatory_module_fields(parsed_data, YAML_MODULEMD_DEFAULTS_REQUIRED_ATTR)
-            modulemd_defaults_all.append(create_modulemd_defaults(parsed_data, module))
-        elif parsed_data["document"] == "modulemd-obsoletes":
-            check_mandatory_module_fields(parsed_data, YAML_MODULEMD_OBSOLETES_REQUIRED_ATTR)
-            modulemd_obsoletes_all.append(create_modulemd_obsoletes(parsed_data, module))
+    for document, data in results:
+        if document in parsed:
+            parsed[document].append(data)
         else:
-            logging.warning(f"Unknown modular document type found: {parsed_data.get('document')}")
+            logging.warning(f"Unknown modular document type found: {document}")
 
     return modulemd_all, modulemd_defaults_all, modulemd_obsoletes_all
-
-
-@contextmanager
-def disable_pyyaml_magic_casting():
-    """Temporarily disable SafeLoader from casting some unquoted values.
-
-    See issue: <https://github.com/pulp/pulp_rpm/issues/3285>
-    """
-    # It's implemented in a context manager to avoid surprise side-effects if
-    # by any chance the loader is called in other context where the default
-    # pyyaml behavior is expected.
-    FLOAT_TAG = "tag:yaml.org,2002:float"
-    INT_TAG = "tag:yaml.org,2002:int"
-    float_old_constructor = yaml.SafeLoader.yaml_constructors[FLOAT_TAG]
-    int_old_constructor = yaml.SafeLoader.yaml_constructors[INT_TAG]
-
-    def string_constructor(self, node):
-        return node.value
-
-    yaml.SafeLoader.yaml_constructors[FLOAT_TAG] = string_constructor
-    yaml.SafeLoader.yaml_constructors[INT_TAG] = string_constructor
-    yield
-    yaml.SafeLoader.yaml_constructors[FLOAT_TAG] = float_old_constructor
-    yaml.SafeLoader.yaml_constructors[INT_TAG] = int_old_constructor
@@ -0,0 +1,203 @@
+"""
+Parsing of modules.yaml documents.
+
+Nothing in here uses the database or the settings, so that documents can be parsed in worker
+processes which did not set up the Pulp application. Importing it still loads pulpcore.plugin,
+through the pulp_rpm.app package, which each worker pays for once when it starts.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from gettext import gettext as _
+
+import createrepo_c as cr
+import yaml
+from jsonschema import Draft7Validator
+
+from pulp_rpm.app.constants import (
+    PULP_MODULE_ATTR,
+    PULP_MODULEDEFAULTS_ATTR,
+    PULP_MODULEOBSOLETES_ATTR,
+    YAML_MODULEMD_DEFAULTS_REQUIRED_ATTR,
+    YAML_MODULEMD_OBSOLETES_REQUIRED_ATTR,
+)
+from pulp_rpm.app.schema import MODULEMD_SCHEMA
+
+log = logging.getLogger(__name__)
+
+
+class ModulemdLoader(getattr(yaml, "CSafeLoader", yaml.SafeLoader)):
+    """
+    The SafeLoader, in C if PyYAML was built with libyaml, which keeps numbers as written.
+
+    Unquoted values like the stream "1.10" or versions with leading zeros must not be cast to
+    numbers. See issue: <https://github.com/pulp/pulp_rpm/issues/3285>
+    """
+
+
+def _string_constructor(loader, node):
+    return node.value
+
+
+ModulemdLoader.add_constructor("tag:yaml.org,2002:float", _string_constructor)
+ModulemdLoader.add_constructor("tag:yaml.org,2002:int", _string_constructor)
+
+# the schema is compiled once, not for every module
+MODULEMD_VALIDATOR = Draft7Validator(MODULEMD_SCHEMA)
+
+
+def split_modulemd_file(file: str):
+    """
+    Helper method to preserve original formatting of modulemd.
+
+    Args:
+        file: Absolute path to file
+    """
+    with tempfile.TemporaryDirectory(dir=".") as tf:
+        decompressed_path = os.path.join(tf, "modulemd.yaml")
+        cr.decompress_file(file, decompressed_path, cr.AUTO_DETECT_COMPRESSION)
+        with open(decompressed_path) as modulemd_file:
+            for doc in modulemd_file.read().split("---"):
+                # strip any spaces or newlines from either side, strip the document end marking,
+                # then strip again so we have only the document text w/o newlines
+                stripped = doc.strip().rstrip("...").rstrip()
+                if stripped:
+                    # add the document begin/end markers backs
+                    normalized = "---\n{}\n...".format(stripped)
+                    yield normalized
+
+
+def check_mandatory_module_fields(module, required_fields):
+    """
+    Check mandatory fields on module dict.
+    """
+    data = module["data"]
+    for field in required_fields:
+        if field not in data.keys():
+            raise ValueError(
+                _("Mandatory field {} is missing in {}.").format(field, module["document"])
+            )
+
+
+def create_modulemd(modulemd, snippet):
+    """
+    Create dict with modulemd data to be saved to DB.
+    """
+    new_module = dict()
+    new_module[PULP_MODULE_ATTR.NAME] = modulemd["data"].get("name")
+    new_module[PULP_MODULE_ATTR.STREAM] = str(modulemd["data"].get("stream"))
+    new_module[PULP_MODULE_ATTR.VERSION] = str(modulemd["data"].get("version"))
+    new_module[PULP_MODULE_ATTR.STATIC_CONTEXT] = modulemd["data"].get("static_context")
+    new_module[PULP_MODULE_ATTR.CONTEXT] = modulemd["data"].get("context")
+    new_module[PULP_MODULE_ATTR.ARCH] = modulemd["data"].get("arch")
+    new_module[PULP_MODULE_ATTR.ARTIFACTS] = modulemd["data"].get("artifacts", {}).get("rpms", [])
+    new_module[PULP_MODULE_ATTR.DESCRIPTION] = modulemd["data"].get("description")
+    new_module[PULP_MODULE_ATTR.DEPENDENCIES] = modulemd["data"].get("dependencies", [])
+
+    # keep data formatted the same as it was with previous parsing implementation
+    unprocessed_profiles = modulemd["data"].get("profiles", {})
+    profiles = {}
+    if unprocessed_profiles:
+        for name, data in unprocessed_profiles.items():
+            rpms = data.get("rpms")
+            if not rpms:
+                msg = (
+                    "Got unexpected data for module {}-{}-{}-{}-{}: "
+                    "profiles failed to parse properly"
+                ).format(
+                    new_module[PULP_MODULE_ATTR.NAME],
+                    new_module[PULP_MODULE_ATTR.STREAM],
+                    new_module[PULP_MODULE_ATTR.VERSION],
+                    new_module[PULP_MODULE_ATTR.CONTEXT],
+                    new_module[PULP_MODULE_ATTR.ARCH],
+                )
+                log.warning(msg)
+            else:
+                profiles[name] = rpms
+
+    new_module[PULP_MODULE_ATTR.PROFILES] = profiles
+    new_module["snippet"] = snippet
+    new_module["digest"] = hashlib.sha256(snippet.encode()).hexdigest()
+
+    return new_module
+
+
+def create_modulemd_defaults(default, snippet):
+    """
+    Create dict with modulemd-defaults data to can be saved to DB.
+    """
+    new_default = dict()
+    new_default[PULP_MODULEDEFAULTS_ATTR.MODULE] = default["data"].get("module")
+    new_default[PULP_MODULEDEFAULTS_ATTR.STREAM] = str(default["data"].get("stream", ""))
+    new_default[PULP_MODULEDEFAULTS_ATTR.PROFILES] = default["data"].get("profiles")
+    new_default["snippet"] = snippet
+    new_default[PULP_MODULEDEFAULTS_ATTR.DIGEST] = hashlib.sha256(snippet.encode()).hexdigest()
+
+    return new_default
+
+
+def create_modulemd_obsoletes(obsolete, snippet):
+    """
+    Create dict with modulemd-obsoletes data to can be saved to DB.
+    """
+    new_obsolete = dict()
+
+    new_obsolete[PULP_MODULEOBSOLETES_ATTR.MODIFIED] = obsolete["data"].get("modified")
+    new_obsolete[PULP_MODULEOBSOLETES_ATTR.MODULE] = obsolete["data"].get("module")
+    new_obsolete[PULP_MODULEOBSOLETES_ATTR.STREAM] = str(obsolete["data"].get("stream"))
+    new_obsolete[PULP_MODULEOBSOLETES_ATTR.MESSAGE] = obsolete["data"].get("message")
+    new_obsolete[PULP_MODULEOBSOLETES_ATTR.RESET] = obsolete["data"].get("reset")
+    new_obsolete[PULP_MODULEOBSOLETES_ATTR.CONTEXT] = obsolete["data"].get("context")
+
+    if obsolete["data"].get("eol_date"):
+        new_obsolete[PULP_MODULEOBSOLETES_ATTR.EOL] = obsolete["data"].get("eol_date")
+    if obsolete["data"].get("obsoleted_by"):
+        new_obsolete[PULP_MODULEOBSOLETES_ATTR.OBSOLETE_BY_MODULE] = obsolete["data"][
+            "obsoleted_by"
+        ].get("module")
+        new_obsolete[PULP_MODULEOBSOLETES_ATTR.OBSOLETE_BY_STREAM] = obsolete["data"][
+            "obsoleted_by"
+        ].get("stream")
+    new_obsolete["snippet"] = snippet
+
+    return new_obsolete
+
+
+def parse_modulemd_document(snippet):
+    """
+    Parse one document of a modules.yaml file.
+
+    Args:
+        snippet: The document, as yielded by split_modulemd_file()
+
+    Returns:
+        tuple: The document type and the dict of the data to save, which is None for unknown
+            document types.
+
+    """
+    parsed_data = yaml.load(snippet, Loader=ModulemdLoader)
+    document = parsed_data["document"]
+    # here we check the modulemd document as we don't store all info, so serializers
+    # are not enough then we only need to take required data from dict which is
+    # parsed by pyyaml library
+    if document == "modulemd":
+        # the validator currently accepts formatting slightly different to the
+        # spec due to the misconfiguration of some Rocky Linux 9 repositories
+        # https://bugs.rockylinux.org/view.php?id=2575
+        # further discussion on this issue can be found here:
+        # https://github.com/pulp/pulp_rpm/issues/2998
+        err = []
+        for error in sorted(MODULEMD_VALIDATOR.iter_errors(parsed_data["data"]), key=str):
+            err.append(error.message)
+        if err:
+            raise ValueError(_("Provided modular data is invalid:'{}'").format(err))
+        return document, create_modulemd(parsed_data, snippet)
+    elif document == "modulemd-defaults":
+        check_mandatory_module_fields(parsed_data, YAML_MODULEMD_DEFAULTS_REQUIRED_ATTR)
+        return document, create_modulemd_defaults(parsed_data, snippet)
+    elif document == "modulemd-obsoletes":
+        check_mandatory_module_fields(parsed_data, YAML_MODULEMD_OBSOLETES_REQUIRED_ATTR)
+        return document, create_modulemd_obsoletes(parsed_data, snippet)
+    return document, None
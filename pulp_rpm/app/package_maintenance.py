@@ -0,0 +1,327 @@
+"""
+Bulk maintenance of the metadata of the packages in the database.
+
+Changelogs are trimmed and file lists compacted by the database, with jsonb functions in
+UPDATE statements over chunks of consecutive packages. Rows which need no change are not
+written, so that a rerun only reads the table and the amount of WAL is kept to a minimum. The
+packages are split into keyset partitions, which can be processed in parallel and whose progress
+can be saved to resume an interrupted run.
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+
+from pulp_rpm.app.models import PackageChangelog, PackageFileDirectory, PackageFilelist
+from pulp_rpm.app.shared_utils import submit_with_connection
+
+# Lower than any package pk
+MIN_PK = "00000000-0000-0000-0000-000000000000"
+
+# The upper bound of each of a number of partitions of the packages of about the same size
+PARTITIONS_SQL = """
+SELECT DISTINCT ON (partition) content_ptr_id
+FROM (
+    SELECT content_ptr_id, ntile(%(partitions)s) OVER (ORDER BY content_ptr_id) AS partition
+    FROM rpm_package
+) partitions
+ORDER BY partition, content_ptr_id DESC
+"""
+
+# The last package of the next chunk of a partition
+CHUNK_SQL = """
+SELECT content_ptr_id
+FROM (
+    SELECT content_ptr_id FROM rpm_package
+    WHERE content_ptr_id > %(after)s AND content_ptr_id <= %(upper)s
+    ORDER BY content_ptr_id
+    LIMIT %(chunk_size)s
+) chunk
+ORDER BY content_ptr_id DESC
+LIMIT 1
+"""
+
+# Keep the newest entries, in chronological order. Entries of the same date keep their order,
+# like with a stable sort.
+TRIM_CHANGELOGS_SQL = """
+UPDATE rpm_package SET changelogs = (
+    SELECT jsonb_agg(entry ORDER BY entry -> 1, position)
+    FROM (
+        SELECT entry, position
+        FROM jsonb_array_elements(changelogs) WITH ORDINALITY AS changelog (entry, position)
+        ORDER BY entry -> 1 DESC, position DESC
+        LIMIT %(limit)s
+    ) newest
+)
+WHERE content_ptr_id > %(after)s AND content_ptr_id <= %(last)s
+    AND jsonb_array_length(changelogs) > %(limit)s
+"""
+
+# Keep the first of every file listed more than once
+COMPACT_FILES_SQL = """
+UPDATE rpm_package SET files = (
+    SELECT jsonb_agg(entry ORDER BY position)
+    FROM (
+        SELECT entry, min(position) AS position
+        FROM jsonb_array_elements(files) WITH ORDINALITY AS file (entry, position)
+        GROUP BY entry
+    ) distinct_files
+)
+WHERE content_ptr_id > %(after)s AND content_ptr_id <= %(last)s
+    AND jsonb_array_length(files) > (
+        SELECT count(DISTINCT entry) FROM jsonb_array_elements(files) AS file (entry)
+    )
+"""
+
+
+class MaintenanceState:
+    """
+    The partitions of a maintenance run, and how far each of them has been processed.
+
+    Saved to `path` after every chunk if given, so that an interrupted run can be resumed.
+    """
+
+    def __init__(self, partitions, options, path=None):
+        self.partitions = partitions
+        self.options = options
+        self.path = path
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, options):
+        """Load the state of a previous run with the same options, if any."""
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path) as state_file:
+            state = json.load(state_file)
+        if state["options"] != options:
+            return None
+        return cls(state["partitions"], options, path)
+
+    def advance(self, partition, after):
+        with self._lock:
+            self.partitions[partition]["after"] = after
+            if self.path is not None:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w") as state_file:
+                    json.dump({"options": self.options, "partitions": self.partitions}, state_file)
+                os.replace(tmp_path, self.path)
+
+
+def partition_packages(partitions):
+    """
+    Split the packages into keyset partitions of about the same size.
+
+    Returns:
+        list: {"after": pk, "upper": pk} dicts, each partition being the packages with a pk
+            greater than "after" and lower or equal to "upper".
+
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(PARTITIONS_SQL, {"partitions": partitions})
+        uppers = [str(upper) for (upper,) in cursor.fetchall()]
+    return [
+        {"after": after, "upper": upper} for after, upper in zip([MIN_PK] + uppers[:-1], uppers)
+    ]
+
+
+def process_partition(state, partition, changelog_limit, compact_files, chunk_size, progress):
+    """
+    Trim the changelogs and compact the files of the packages of a partition, chunk by chunk.
+
+    Every chunk is updated in a transaction of its own and recorded in the `state`.
+
+    Args:
+        state (MaintenanceState): The partitions and their progress.
+        partition (int): The index of the partition to process.
+        changelog_limit (int): The number of changelog entries to keep, or None.
+        compact_files (bool): Remove the files listed more than once.
+        chunk_size (int): The number of packages to update in one statement.
+        progress (callable): Called with the number of packages whose changelogs were trimmed
+            and the number of packages whose files were compacted by every chunk.
+
+    """
+    after, upper = state.partitions[partition]["after"], state.partitions[partition]["upper"]
+    with connection.cursor() as cursor:
+        while True:
+            params = {"after": after, "upper": upper, "chunk_size": chunk_size}
+            cursor.execute(CHUNK_SQL, params)
+            row = cursor.fetchone()
+            if row is None:
+                break
+            (last,) = row
+            params.update(last=str(last), limit=changelog_limit)
+            trimmed = compacted = 0
+            with transaction.atomic():
+                if changelog_limit is not None:
+                    cursor.execute(TRIM_CHANGELOGS_SQL, params)
+                    trimmed = cursor.rowcount
+                if compact_files:
+                    cursor.execute(COMPACT_FILES_SQL, params)
+                    compacted = cursor.rowcount
+            after = str(last)
+            state.advance(partition, after)
+            progress(trimmed, compacted)
+
+
+def process_packages(
+    changelog_limit=None,
+    compact_files=False,
+    workers=1,
+    chunk_size=1000,
+    state_path=None,
+    progress=None,
+):
+    """
+    Trim the changelogs and compact the files of all packages.
+
+    Args:
+        changelog_limit (int): The number of changelog entries to keep, or None.
+        compact_files (bool): Remove the files listed more than once.
+        workers (int): The number of partitions to process in parallel, each with a database
+            connection of its own.
+        chunk_size (int): The number of packages to update in one statement.
+        state_path (str): Save the progress to this file, and resume from it if it was saved by
+            a run with the same options.
+        progress (callable): Called with the number of packages whose changelogs were trimmed
+            and the number of packages whose files were compacted by every chunk.
+
+    """
+    options = {"changelog_limit": changelog_limit, "compact_files": compact_files}
+    state = MaintenanceState.load(state_path, options)
+    if state is None:
+        state = MaintenanceState(partition_packages(workers), options, state_path)
+    progress = progress or (lambda trimmed, compacted: None)
+    if workers > 1:
+        lock = threading.Lock()
+
+        def locked_progress(trimmed, compacted):
+            with lock:
+                progress(trimmed, compacted)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                submit_with_connection(
+                    executor,
+                    process_partition,
+                    state,
+                    partition,
+                    changelog_limit,
+                    compact_files,
+                    chunk_size,
+                    locked_progress,
+                )
+                for partition in range(len(state.partitions))
+            ]
+            for future in futures:
+                future.result()
+    else:
+        for partition in range(len(state.partitions)):
+            process_partition(
+                state, partition, changelog_limit, compact_files, chunk_size, progress
+            )
+    if state_path is not None and os.path.exists(state_path):
+        os.remove(state_path)
+
+
+def _replace_shared(model, field, replacements):
+    """
+    Point the packages to the replacements of shared rows and remove the replaced rows.
+
+    Args:
+        model (Model): PackageChangelog or PackageFilelist
+        field (str): The Package field referencing the model
+        replacements (dict): New unsaved rows by the digest of the rows they replace
+
+    """
+    with transaction.atomic():
+        model.objects.bulk_create(replacements.values(), ignore_conflicts=True)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE rpm_package SET {field}_id = replacement.new "
+                "FROM unnest(%s::text[], %s::text[]) AS replacement (old, new) "
+                f"WHERE {field}_id = replacement.old",
+                [list(replacements), [row.digest for row in replacements.values()]],
+            )
+        model.objects.filter(digest__in=list(replacements)).delete()
+
+
+def trim_shared_changelogs(changelog_limit, chunk_size=1000):
+    """
+    Trim the changelogs shared by packages (see RPM_DEDUPLICATE_PACKAGE_METADATA).
+
+    A shared changelog is keyed by the hash of its entries, so the trimmed entries are stored as
+    a new shared changelog (or one which already exists), the packages are pointed to it and the
+    original one is removed.
+
+    Returns:
+        int: The number of shared changelogs trimmed.
+
+    """
+    trimmed = 0
+    after = ""
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT digest, entries FROM rpm_packagechangelog "
+                "WHERE digest > %s AND jsonb_array_length(entries) > %s "
+                "ORDER BY digest LIMIT %s",
+                [after, changelog_limit, chunk_size],
+            )
+            rows = cursor.fetchall()
+        if not rows:
+            return trimmed
+
+        replacements = {}
+        for digest, entries in rows:
+            entries = json.loads(entries) if isinstance(entries, str) else entries
+            entries.sort(key=lambda entry: entry[1])
+            replacements[digest] = PackageChangelog.from_changelogs(entries[-changelog_limit:])
+        _replace_shared(PackageChangelog, "changelog", replacements)
+        trimmed += len(replacements)
+        after = rows[-1][0]
+
+
+def compact_shared_filelists(chunk_size=1000):
+    """
+    Remove the files listed more than once from the filelists shared by packages.
+
+    Like with trim_shared_changelogs(), the compacted files are stored as a new shared filelist
+    (or one which already exists), the packages are pointed to it and the original one is removed.
+
+    Returns:
+        int: The number of shared filelists compacted.
+
+    """
+    compacted = 0
+    after = ""
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT digest, entries FROM rpm_packagefilelist "
+                "WHERE digest > %s AND jsonb_array_length(entries) > ("
+                "    SELECT count(DISTINCT entry) FROM jsonb_array_elements(entries) AS entry"
+                ") "
+                "ORDER BY digest LIMIT %s",
+                [after, chunk_size],
+            )
+            rows = cursor.fetchall()
+        if not rows:
+            return compacted
+
+        replacements = {}
+        for digest, entries in rows:
+            entries = json.loads(entries) if isinstance(entries, str) else entries
+            # a directory id stands for a single path, so the entries can be compared directly
+            entries = [list(entry) for entry in dict.fromkeys(map(tuple, entries))]
+            paths = PackageFileDirectory.get_paths({entry[1] for entry in entries})
+            files = [[typ, paths[directory_id], name] for typ, directory_id, name in entries]
+            replacements[digest] = PackageFilelist.from_files(
+                files, {path: directory_id for directory_id, path in paths.items()}
+            )
+        _replace_shared(PackageFilelist, "filelist", replacements)
+        compacted += len(replacements)
+        after = rows[-1][0]
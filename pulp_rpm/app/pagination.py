@@ -0,0 +1,128 @@
+import base64
+import binascii
+import json
+import uuid
+from gettext import gettext as _
+
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PackageKeysetPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination, or keyset pagination ordered by (name, evr, pk) given a cursor.
+
+    With an offset, every page scans and discards all the rows before it, and counts them all, so
+    walking a large catalog is quadratic. Passing a `cursor` (empty for the first page) instead
+    continues right after the last package of the previous page. The `next` link carries the
+    cursor of the following page; keyset pages have no `count` and no `previous` link. Keyset
+    pages have their own order, so they cannot be combined with `ordering`.
+    """
+
+    cursor_query_param = "cursor"
+    cursor_query_description = _(
+        "Keyset pagination cursor, empty for the first page. Replaces 'offset' for walking over "
+        "large result sets."
+    )
+    invalid_cursor_message = _("Invalid cursor")
+    ordering_query_param = "ordering"
+    keyset_fields = ("name", "evr", "pk")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view=view)
+
+        if self.ordering_query_param in request.query_params:
+            raise ValidationError(
+                {
+                    self.ordering_query_param: _(
+                        "Cannot be combined with '{}', keyset pages are ordered by {}."
+                    ).format(self.cursor_query_param, ", ".join(self.keyset_fields))
+                }
+            )
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.position = self.decode_cursor(request.query_params[self.cursor_query_param])
+
+        queryset = queryset.order_by(*self.keyset_fields)
+        if self.position:
+            queryset = queryset.filter(
+                RawSQL(
+                    f"({self.keyset_columns(queryset.model)}) > (%s, %s, %s)",
+                    self.position,
+                    output_field=BooleanField(),
+                )
+            )
+        page = list(queryset[: self.limit + 1])
+        self.next_position = None
+        if len(page) > self.limit:
+            page = page[: self.limit]
+            last = page[-1]
+            self.next_position = (last.name, bytes(last.evr), last.pk)
+        return page
+
+    def keyset_columns(self, model):
+        """Return the qualified columns of the keyset fields, for comparing them as a row."""
+        quote_name = connection.ops.quote_name
+        return ", ".join(
+            f"{quote_name(model._meta.db_table)}.{quote_name(field.column)}"
+            for field in (
+                model._meta.pk if name == "pk" else model._meta.get_field(name)
+                for name in self.keyset_fields
+            )
+        )
+
+    def decode_cursor(self, cursor):
+        """Return the (name, evr, pk) the page starts after, or None for the first page."""
+        if not cursor:
+            return None
+        try:
+            name, evr, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return (name, bytes.fromhex(evr), uuid.UUID(pk))
+        except (binascii.Error, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        name, evr, pk = position
+        return base64.urlsafe_b64encode(json.dumps([name, evr.hex(), str(pk)]).encode()).decode()
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response(
+            {"count": None, "next": self.get_next_link(), "previous": None, "results": data}
+        )
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.offset_query_param)
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count"]["nullable"] = True
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": str(self.cursor_query_description),
+                "schema": {"type": "string"},
+            }
+        ]
@@ -0,0 +1,201 @@
+"""
+On-demand profiling of the rpm tasks.
+
+Tasks decorated with `profiled` run under cProfile when they are listed in the
+RPM_TASK_PROFILING setting, or when they were dispatched with the "rpm-profile" task diagnostic
+(e.g. with the `X-Task-Diagnostics: rpm-profile` header) and it is enabled in
+TASK_DIAGNOSTICS. With RPM_TASK_PROFILING_TRACEMALLOC, or the "rpm-tracemalloc" diagnostic,
+the memory allocated by Python is traced as well and a snapshot is taken at every
+`profile_checkpoint()` the task reaches, i.e. at the boundaries of its phases. The diagnostic
+traces the memory of a task on its own too, without profiling it. The profile and the checkpoints
+are attached to the task as profile artifacts.
+
+cProfile only profiles the thread a task runs in; the time spent in queries run from other
+threads (e.g. by the stages of a sync) is seen as the time spent waiting for them. Tasks are not
+profiled when Python refuses to start cProfile because another profiler is already active.
+"""
+
+import cProfile
+import functools
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from pulpcore.plugin.models import Task
+
+from pulp_rpm.app.shared_utils import attach_task_artifact
+
+log = logging.getLogger(__name__)
+
+PROFILE_DIAGNOSTIC = "rpm-profile"
+TRACEMALLOC_DIAGNOSTIC = "rpm-tracemalloc"
+
+# How many functions and allocation sites are listed in the reports
+TOP_ENTRIES = 50
+TRACEMALLOC_FRAMES = 10
+
+_current_profile = ContextVar("rpm_task_profile", default=None)
+
+
+class TaskProfile:
+    """
+    The profile of a task run, and the checkpoints it reached.
+
+    Usage::
+
+        profile = TaskProfile("publish", trace_memory=True)
+        with profile.run():
+            ...
+            profile_checkpoint("write_metadata")
+        profile.attach()
+    """
+
+    def __init__(self, name, profile_calls=True, trace_memory=False):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.profiler = cProfile.Profile() if profile_calls else None
+        self.checkpoints = []
+        self._started = None
+        self._previous_snapshot = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def run(self):
+        """Profile the code run in the block."""
+        stop_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if stop_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        token = _current_profile.set(self)
+        self._started = time.perf_counter()
+        if self.profiler is not None:
+            try:
+                self.profiler.enable()
+            except ValueError:
+                log.warning("Not profiling the task %s, another profiler is active", self.name)
+                self.profiler = None
+        try:
+            yield self
+        finally:
+            if self.profiler is not None:
+                self.profiler.disable()
+            self.checkpoint("end")
+            _current_profile.reset(token)
+            if stop_tracing:
+                tracemalloc.stop()
+            self._previous_snapshot = None
+
+    def checkpoint(self, label):
+        """Record the time, and the memory allocations since the previous checkpoint."""
+        entry = {"label": label, "elapsed": round(time.perf_counter() - self._started, 3)}
+        if self.trace_memory and tracemalloc.is_tracing():
+            with self._lock:
+                entry.update(self._memory_usage())
+        with self._lock:
+            self.checkpoints.append(entry)
+
+    def _memory_usage(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            ]
+        )
+        current, peak = tracemalloc.get_traced_memory()
+        # the peak is reported per phase
+        tracemalloc.reset_peak()
+        if self._previous_snapshot is None:
+            statistics = snapshot.statistics("lineno")
+        else:
+            statistics = snapshot.compare_to(self._previous_snapshot, "lineno")
+        self._previous_snapshot = snapshot
+        return {
+            "traced_memory": current,
+            "peak_traced_memory": peak,
+            "top_allocations": [
+                {
+                    "location": str(statistic.traceback),
+                    "size": statistic.size,
+                    "size_diff": getattr(statistic, "size_diff", statistic.size),
+                    "count": statistic.count,
+                }
+                for statistic in statistics[:TOP_ENTRIES]
+            ],
+        }
+
+    def attach(self):
+        """Write out the profile, if any, and the checkpoints and attach them to the running task."""
+        if self.profiler is not None:
+            profile_path = f"rpm_{self.name}_profile.prof"
+            self.profiler.dump_stats(profile_path)
+            attach_task_artifact(profile_path, f"rpm_{self.name}_profile")
+
+            summary = io.StringIO()
+            stats = pstats.Stats(self.profiler, stream=summary)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_ENTRIES)
+            summary_path = f"rpm_{self.name}_profile.txt"
+            with open(summary_path, "w") as summary_file:
+                summary_file.write(summary.getvalue())
+            attach_task_artifact(summary_path, f"rpm_{self.name}_profile_summary")
+
+        checkpoints_path = f"rpm_{self.name}_checkpoints.json"
+        with open(checkpoints_path, "w") as checkpoints_file:
+            json.dump(
+                {"task": self.name, "checkpoints": self.checkpoints}, checkpoints_file, indent=2
+            )
+        attach_task_artifact(checkpoints_path, f"rpm_{self.name}_checkpoints")
+
+
+def profile_checkpoint(label):
+    """Mark a phase boundary of the task being profiled, if any."""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.checkpoint(label)
+
+
+def _requested_profiling(task_name):
+    """Whether to profile the task, and whether to trace its memory allocations."""
+    diagnostics = set()
+    task = Task.current()
+    if task is not None and task.profile_options:
+        diagnostics = set(task.profile_options) & set(settings.TASK_DIAGNOSTICS)
+    profile = task_name in settings.RPM_TASK_PROFILING or PROFILE_DIAGNOSTIC in diagnostics
+    trace_memory = (
+        profile and settings.RPM_TASK_PROFILING_TRACEMALLOC
+    ) or TRACEMALLOC_DIAGNOSTIC in diagnostics
+    return profile, trace_memory
+
+
+def profiled(task_func):
+    """Profile the decorated task when requested, see the module documentation."""
+
+    @functools.wraps(task_func)
+    def wrapper(*args, **kwargs):
+        profile, trace_memory = _requested_profiling(task_func.__name__)
+        # tasks calling other tasks are profiled as a whole
+        if not (profile or trace_memory) or _current_profile.get() is not None:
+            return task_func(*args, **kwargs)
+
+        task_profile = TaskProfile(
+            task_func.__name__, profile_calls=profile, trace_memory=trace_memory
+        )
+        try:
+            with task_profile.run():
+                return task_func(*args, **kwargs)
+        finally:
+            try:
+                task_profile.attach()
+            except Exception:
+                # the profile of a failed task is the most interesting one, but it must not
+                # hide the error the task failed with
+                log.exception("Could not attach the profile of the task %s", task_func.__name__)
+
+    return wrapper
@@ -2,6 +2,8 @@ from .acs import (  # noqa
     RpmAlternateContentSourceSerializer,
 )
 from .advisory import (  # noqa
+    ApplicabilitySerializer,
+    ApplicabilityResultSerializer,
     MinimalUpdateRecordSerializer,
     UpdateCollectionSerializer,
     UpdateRecordSerializer,
@@ -28,6 +30,7 @@ from .modulemd import (  # noqa
 )
 from .package import PackageSerializer, PackageUploadSerializer, MinimalPackageSerializer  # noqa
 from .prune import PrunePackagesSerializer  # noqa
+from .freshness import FreshnessCheckSerializer  # noqa
 from .repository import (  # noqa
     CopySerializer,
     RpmDistributionSerializer,
@@ -36,4 +39,5 @@ from .repository import (  # noqa
     UlnRemoteSerializer,
     RpmRepositorySerializer,
     RpmRepositorySyncURLSerializer,
+    RepositoryVersionDiffSerializer,
 )
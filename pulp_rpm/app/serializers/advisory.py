@@ -9,6 +9,8 @@ from rest_framework import serializers
 from pulpcore.plugin.serializers import (
     ModelSerializer,
     NoArtifactContentUploadSerializer,
+    RepositoryVersionRelatedField,
+    ValidateFieldsMixin,
 )
 
 from pulp_rpm.app.advisory import hash_update_record
@@ -24,11 +26,13 @@ from pulp_rpm.app.fields import (
     UpdateReferenceField,
 )
 from pulp_rpm.app.models import (
+    RpmRepository,
     UpdateCollection,
     UpdateCollectionPackage,
     UpdateRecord,
     UpdateReference,
 )
+from pulp_rpm.app.shared_utils import parse_nevra
 
 
 class UpdateCollectionSerializer(ModelSerializer):
@@ -269,3 +273,75 @@ class MinimalUpdateRecordSerializer(UpdateRecordSerializer):
             "type",
         )
         model = UpdateRecord
+
+
+class ApplicabilityHostSerializer(serializers.Serializer):
+    """
+    A host and the packages installed on it.
+    """
+
+    name = serializers.CharField(help_text=_("A name identifying the host in the response."))
+    packages = serializers.ListField(
+        child=serializers.CharField(),
+        help_text=_(
+            "The packages installed on the host, as 'name-epoch:version-release.arch' strings. "
+            "The epoch may be omitted."
+        ),
+    )
+
+    def validate_packages(self, value):
+        """Parse the NEVRA strings into tuples."""
+        try:
+            return [parse_nevra(nevra) for nevra in value]
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+
+class ApplicabilitySerializer(serializers.Serializer, ValidateFieldsMixin):
+    """
+    A Serializer for finding the advisories of a repository version applicable to hosts.
+    """
+
+    repository_version = RepositoryVersionRelatedField(
+        help_text=_("The repository version with the advisories to check.")
+    )
+    hosts = ApplicabilityHostSerializer(
+        many=True, allow_empty=False, help_text=_("The hosts to find applicable advisories for.")
+    )
+
+    def validate_repository_version(self, value):
+        """Ensure the repository version belongs to an RPM repository."""
+        if not isinstance(value.repository.cast(), RpmRepository):
+            raise serializers.ValidationError(_("Must be a version of an RPM repository."))
+        return value
+
+    def validate_hosts(self, value):
+        """Ensure host names are unique."""
+        names = [host["name"] for host in value]
+        if len(names) != len(set(names)):
+            raise serializers.ValidationError(_("Host names must be unique."))
+        return value
+
+
+class ApplicableAdvisorySerializer(serializers.Serializer):
+    """
+    An advisory applicable to a host, with the packages to upgrade to.
+    """
+
+    pulp_href = serializers.CharField(help_text=_("The href of the advisory."))
+    id = serializers.CharField(help_text=_("The id of the advisory, e.g. RHSA-2024:1234."))
+    type = serializers.CharField(help_text=_("The type of the advisory."))
+    severity = serializers.CharField(help_text=_("The severity of the advisory."))
+    packages = serializers.ListField(
+        child=serializers.CharField(),
+        help_text=_("NEVRAs of the packages of the advisory which upgrade installed packages."),
+    )
+
+
+class ApplicabilityResultSerializer(serializers.Serializer):
+    """
+    The advisories applicable to a host.
+    """
+
+    name = serializers.CharField(help_text=_("The name of the host."))
+    advisories = ApplicableAdvisorySerializer(many=True)
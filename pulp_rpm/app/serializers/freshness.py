@@ -0,0 +1,76 @@
+from gettext import gettext as _
+
+from rest_framework import fields, serializers
+
+from pulpcore.plugin.serializers import ValidateFieldsMixin
+from pulpcore.plugin.util import get_domain
+
+from pulp_rpm.app.constants import SKIP_TYPES, SYNC_POLICY_CHOICES
+from pulp_rpm.app.models import RpmRepository
+
+
+class FreshnessCheckSerializer(serializers.Serializer, ValidateFieldsMixin):
+    """
+    Serializer for the check-repositories-for-updates operation.
+    """
+
+    repo_hrefs = fields.ListField(
+        required=True,
+        help_text=_(
+            "Will check the remotes of the specified list of repos for updates. "
+            "Use ['*'] to specify all repos. "
+            "Repositories without a remote are ignored."
+        ),
+        child=serializers.CharField(),
+    )
+
+    sync_policy = serializers.ChoiceField(
+        help_text=_(
+            "The sync policy to sync the changed repositories with. "
+            "Default: the sync policy of the last sync of each repository."
+        ),
+        choices=SYNC_POLICY_CHOICES,
+        required=False,
+        allow_null=True,
+    )
+
+    skip_types = serializers.ListField(
+        help_text=_(
+            "List of content types to skip during sync. "
+            "Default: the skipped types of the last sync of each repository."
+        ),
+        required=False,
+        allow_null=True,
+        child=serializers.ChoiceField([(skip_type, skip_type) for skip_type in SKIP_TYPES]),
+    )
+
+    dry_run = serializers.BooleanField(
+        help_text=_(
+            "Determine which repositories changed and log them, without syncing them. "
+            "Intended as a debugging aid."
+        ),
+        default=False,
+        required=False,
+    )
+
+    def validate_repo_hrefs(self, value):
+        """
+        Insure repo_hrefs is not empty and contains either valid RPM Repository hrefs or "*".
+        Args:
+            value (list): The list supplied by the user
+        Returns:
+            The list of RpmRepositories after validation
+        Raises:
+            ValidationError: If the list is empty or contains invalid hrefs.
+        """
+        if len(value) == 0:
+            raise serializers.ValidationError("Must not be [].")
+
+        if "*" in value:
+            if len(value) != 1:
+                raise serializers.ValidationError("Can't specify specific HREFs when using '*'")
+            return RpmRepository.objects.filter(pulp_domain=get_domain(), remote__isnull=False)
+
+        from pulpcore.plugin.viewsets import NamedModelViewSet
+
+        return [NamedModelViewSet.get_resource(href, RpmRepository) for href in value]
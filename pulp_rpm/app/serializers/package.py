@@ -100,12 +100,14 @@ class PackageSerializer(SingleArtifactContentUploadSerializer, ContentChecksumSe
 
     changelogs = serializers.JSONField(
         help_text=_("Changelogs that package contains"),
+        source="get_changelogs",
         default="[]",
         required=False,
         read_only=True,
     )
     files = serializers.JSONField(
         help_text=_("Files that package contains"),
+        source="get_files",
         default="[]",
         required=False,
         read_only=True,
@@ -5,6 +5,7 @@ from gettext import gettext as _
 from textwrap import dedent
 from urllib.parse import urlparse
 
+import createrepo_c as cr
 from django.conf import settings
 from drf_spectacular.utils import extend_schema_field, extend_schema_serializer
 from jsonschema import Draft7Validator
@@ -258,6 +259,30 @@ class RpmRepositorySerializer(RepositorySerializer):
         required=False,
         allow_null=True,
     )
+    zchunk_metadata = serializers.BooleanField(
+        help_text=_(
+            "Whether to publish zchunk variants of the package and advisory metadata as well, which "
+            "clients supporting zchunk can update by downloading only the changed chunks."
+        ),
+        required=False,
+    )
+    arches = serializers.ListField(
+        help_text=_(
+            "The architectures of the packages to publish, e.g. ['x86_64', 'i686']. noarch "
+            "packages are always published. All packages are published if null."
+        ),
+        child=serializers.CharField(),
+        required=False,
+        allow_null=True,
+    )
+    exclude_debuginfo = serializers.BooleanField(
+        help_text=_("Whether to leave the debuginfo and debugsource packages out of publications."),
+        required=False,
+    )
+    exclude_source = serializers.BooleanField(
+        help_text=_("Whether to leave the source packages out of publications."),
+        required=False,
+    )
     gpgcheck = serializers.IntegerField(
         help_text=_(
             "REMOVED: An option specifying whether a client should perform a GPG signature "
@@ -320,6 +345,11 @@ class RpmRepositorySerializer(RepositorySerializer):
                 data[field] = None
         return data
 
+    def validate_zchunk_metadata(self, value):
+        if value and not cr.HAS_ZCK:
+            raise serializers.ValidationError(_("createrepo_c was built without zchunk support."))
+        return value
+
     def validate(self, data):
         """Validate data."""
         if checksum_type := data.get("checksum_type"):
@@ -369,6 +399,10 @@ class RpmRepositorySerializer(RepositorySerializer):
             "repo_config",
             "compression_type",
             "layout",
+            "zchunk_metadata",
+            "arches",
+            "exclude_debuginfo",
+            "exclude_source",
             "osv_config",
         )
         model = RpmRepository
@@ -503,12 +537,45 @@ class RpmPublicationSerializer(PublicationSerializer):
         choices=COMPRESSION_CHOICES,
         required=False,
     )
+    compression_threads = serializers.IntegerField(
+        help_text=_(
+            "The number of threads to compress metadata files with. Defaults to the "
+            "RPM_METADATA_COMPRESSION_THREADS setting."
+        ),
+        min_value=1,
+        required=False,
+        write_only=True,
+    )
     layout = serializers.ChoiceField(
         help_text=_("How to layout the packages within the published repository."),
         choices=LAYOUT_CHOICES,
         required=False,
         allow_null=True,
     )
+    zchunk_metadata = serializers.BooleanField(
+        help_text=_(
+            "Whether to publish zchunk variants of the package and advisory metadata as well, which "
+            "clients supporting zchunk can update by downloading only the changed chunks."
+        ),
+        required=False,
+    )
+    arches = serializers.ListField(
+        help_text=_(
+            "The architectures of the packages to publish, e.g. ['x86_64', 'i686']. noarch "
+            "packages are always published. All packages are published if null."
+        ),
+        child=serializers.CharField(),
+        required=False,
+        allow_null=True,
+    )
+    exclude_debuginfo = serializers.BooleanField(
+        help_text=_("Whether to leave the debuginfo and debugsource packages out of publications."),
+        required=False,
+    )
+    exclude_source = serializers.BooleanField(
+        help_text=_("Whether to leave the source packages out of publications."),
+        required=False,
+    )
     gpgcheck = serializers.IntegerField(
         help_text=_(
             "REMOVED: An option specifying whether a client should perform "
@@ -544,6 +611,11 @@ class RpmPublicationSerializer(PublicationSerializer):
         ),
     )
 
+    def validate_zchunk_metadata(self, value):
+        if value and not cr.HAS_ZCK:
+            raise serializers.ValidationError(_("createrepo_c was built without zchunk support."))
+        return value
+
     def validate(self, data):
         """Validate data."""
         if checksum_type := data.get("checksum_type"):
@@ -567,7 +639,12 @@ class RpmPublicationSerializer(PublicationSerializer):
             "sqlite_metadata",
             "repo_config",
             "compression_type",
+            "compression_threads",
             "layout",
+            "zchunk_metadata",
+            "arches",
+            "exclude_debuginfo",
+            "exclude_source",
         )
         model = RpmPublication
 
@@ -589,12 +666,22 @@ class RpmDistributionSerializer(DistributionSerializer):
         required=False,
         help_text=_("An option specifying whether Pulp should generate *.repo files."),
     )
+    dynamic_repodata = serializers.BooleanField(
+        default=False,
+        required=False,
+        help_text=_(
+            "An option specifying whether a distribution of a repository serves the latest "
+            "repository version with repodata generated on the first request, instead of the "
+            "latest publication. Does not apply to distributions of a publication."
+        ),
+    )
     checkpoint = serializers.BooleanField(required=False)
 
     class Meta:
         fields = DistributionSerializer.Meta.fields + (
             "publication",
             "generate_repo_config",
+            "dynamic_repodata",
             "checkpoint",
         )
         model = RpmDistribution
@@ -807,3 +894,44 @@ class CopySerializer(ValidateFieldsMixin, serializers.Serializer):
                 check_cross_domain_config(data["config"])
 
         return data
+
+
+class PackageChangeSerializer(serializers.Serializer):
+    """
+    A change of the packages of one name and arch between two repository versions.
+    """
+
+    change = serializers.ChoiceField(
+        choices=["added", "removed", "upgraded", "downgraded"],
+        help_text=_("The kind of change"),
+    )
+    name = serializers.CharField(help_text=_("Name of the package"))
+    arch = serializers.CharField(help_text=_("Architecture of the package"))
+    old = serializers.CharField(
+        allow_null=True, help_text=_("NEVRA of the package in the base version, if any")
+    )
+    new = serializers.CharField(
+        allow_null=True, help_text=_("NEVRA of the package in the compared version, if any")
+    )
+
+
+class AdvisoryChangeSerializer(serializers.Serializer):
+    """
+    A change of an advisory between two repository versions.
+    """
+
+    change = serializers.ChoiceField(
+        choices=["added", "removed", "updated"], help_text=_("The kind of change")
+    )
+    id = serializers.CharField(help_text=_("Id of the advisory"))
+    type = serializers.CharField(help_text=_("Type of the advisory"))
+    severity = serializers.CharField(help_text=_("Severity of the advisory"))
+
+
+class RepositoryVersionDiffSerializer(serializers.Serializer):
+    """
+    The package and advisory changes between two repository versions.
+    """
+
+    packages = PackageChangeSerializer(many=True)
+    advisories = AdvisoryChangeSerializer(many=True)
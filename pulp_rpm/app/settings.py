@@ -16,6 +16,19 @@ KEEP_CHANGELOG_LIMIT = 10
 SOLVER_DEBUG_LOGS = True
 RPM_METADATA_USE_REPO_PACKAGE_TIME = False
 NOCACHE_LIST = ["repomd.xml", "repomd.xml.asc", "repomd.xml.key"]
+RPM_METADATA_COMPRESSION_THREADS = 1
+RPM_METADATA_CACHE_SIZE = 64 * 1024 * 1024
+RPM_METADATA_CACHE_MAX_FILE_SIZE = 1024 * 1024
+RPM_DYNAMIC_REPODATA_DIR = None
+RPM_DEDUPLICATE_PACKAGE_METADATA = False
+RPM_BULK_INSERT_PACKAGES = True
+RPM_MODULEMD_PARSE_WORKERS = 1
+RPM_SYNC_STAGE_METRICS = False
+RPM_SYNC_REUSE_CONTENT = False
+RPM_PUBLISH_REUSE_METADATA = False
+RPM_FRESHNESS_CHECK_CONCURRENCY = 50
+RPM_TASK_PROFILING = []
+RPM_TASK_PROFILING_TRACEMALLOC = False
 PRUNE_WORKERS_MAX = 5
 # workaround for: https://github.com/pulp/pulp_rpm/issues/4125
 SPECTACULAR_SETTINGS__OAS_VERSION = "3.0.1"
@@ -5,8 +5,11 @@ from hashlib import sha256
 import createrepo_c as cr
 import rpm_rs
 from django.conf import settings
+from django.db import IntegrityError, connection, transaction
 from django.utils.dateparse import parse_datetime
 
+from pulpcore.plugin.models import Artifact, Task
+
 from pulp_rpm.app.constants import CR_HEADER_FLAGS
 
 
@@ -34,6 +37,25 @@ def format_nevra_short(name=None, epoch=0, version=None, release=None, arch=None
     return format_nvra(name, version, release, arch)
 
 
+def parse_nevra(nevra):
+    """
+    Split a "name-[epoch:]version-release.arch" string into its parts.
+
+    Returns:
+        tuple: (name, epoch, version, release, arch), epoch defaults to "0"
+
+    Raises:
+        ValueError: If the string is not a NEVRA.
+    """
+    nevr, _, arch = nevra.rpartition(".")
+    nev, _, release = nevr.rpartition("-")
+    name, _, epoch_version = nev.rpartition("-")
+    epoch, _, version = epoch_version.rpartition(":")
+    if not (name and version and release and arch):
+        raise ValueError(f"{nevra} is not a valid NEVRA.")
+    return name, epoch or "0", version, release, arch
+
+
 _VERSION_PREFIX = {
     rpm_rs.SignatureVersion.V4: "v4",
     rpm_rs.SignatureVersion.V6: "v6",
@@ -176,6 +198,28 @@ def get_sha256(file_path):
         return None
 
 
+def attach_task_artifact(file_path, name):
+    """
+    Attach a file to the running task, to be downloaded from its profile artifacts.
+
+    Args:
+        file_path(str): path of the file
+        name(str): name of the file among the profile artifacts of the task
+
+    """
+    task = Task.current()
+    if task is None:
+        return
+    artifact = Artifact.init_and_validate(file_path)
+    try:
+        with transaction.atomic():
+            artifact.save()
+    except IntegrityError:
+        # an identical file has been attached to a task before
+        artifact = Artifact.objects.get(sha256=artifact.sha256, pulp_domain=artifact.pulp_domain)
+    Task.profile_artifacts.through.objects.get_or_create(task=task, artifact=artifact, name=name)
+
+
 def is_previous_version(version, target_version):
     """
     Compare version with a target version.
@@ -242,3 +286,24 @@ def parse_time(value):
         int | datetime | None: formatted time value
     """
     return int(value) if value.isdigit() else parse_datetime(value)
+
+
+def submit_with_connection(executor, function, *args, **kwargs):
+    """
+    Submit a call of function to a thread pool, closing the database connection it opens there.
+
+    Every thread has a database connection of its own, which Django leaves open once the thread
+    is done with it.
+
+    Returns:
+        concurrent.futures.Future: The future of the call.
+
+    """
+
+    def call():
+        try:
+            return function(*args, **kwargs)
+        finally:
+            connection.close()
+
+    return executor.submit(call)
@@ -49,6 +49,19 @@ def safe_in(field_name: str, values: Iterable) -> Q:
     return Q(**{f"{field_name}__any_array": list(values)})
 
 
+def repoversion_content_ids(repo_version):
+    """The ids of the content in repo_version, as a subquery which stays in the database.
+
+    Raw SQL can select from `repoversion_content_ids(...).query.sql_with_params()` instead of
+    depending on how pulpcore stores the content of a repository version.
+    """
+    return (
+        RepositoryVersion.objects.filter(pk=repo_version.pk)
+        .annotate(cids=Func(F("content_ids"), function="unnest"))
+        .values_list("cids", flat=True)
+    )
+
+
 def get_content_in_repoversion(repo_version, content_qs=None, pulp_type=None, cast=False):
     """Get content present in repo_version.
 
@@ -68,11 +81,7 @@ def get_content_in_repoversion(repo_version, content_qs=None, pulp_type=None, ca
     # leverages the fact that the table already contains the content_ids field, so it can
     # select the content in the repository version directly on the db side (without requiring
     # the app to ever re-send the whole set).
-    repo_content_ids = (
-        RepositoryVersion.objects.filter(pk=repo_version.pk)
-        .annotate(cids=Func(F("content_ids"), function="unnest"))
-        .values_list("cids", flat=True)
-    )
+    repo_content_ids = repoversion_content_ids(repo_version)
 
     if cast:
         if pulp_type is None:
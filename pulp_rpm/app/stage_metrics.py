@@ -0,0 +1,248 @@
+"""
+Opt-in timing and throughput measurements of the stages of a sync pipeline.
+
+Every stage of an instrumented pipeline records how long it waited for units from the previous
+stage and for the next stage to take its units, how many units and batches it handled, how many
+units were queued for it, and how many queries it sent to the database. Named phases of a stage
+(e.g. downloading or parsing metadata) can be timed with `phase()`, which does nothing unless
+the code runs in an instrumented stage.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+
+log = logging.getLogger(__name__)
+
+# The metrics of the stage and of the pipeline the running code belongs to. Context variables
+# are inherited by the asyncio tasks a stage starts and by the threads it runs queries in.
+_current_stage = ContextVar("rpm_current_stage_metrics", default=None)
+_current_pipeline = ContextVar("rpm_current_pipeline_metrics", default=None)
+
+
+class StageMetrics:
+    """
+    The measurements of one stage of a pipeline.
+
+    The busy time of a stage is the time it ran minus the time it waited for its input and
+    output. Stages handling many units concurrently (e.g. the ArtifactDownloader) keep working
+    while waiting for more input, so for them it is a lower bound.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started = None
+        self.finished = None
+        self.input_wait = 0.0
+        self.output_wait = 0.0
+        self.items_in = 0
+        self.items_out = 0
+        self.batches = 0
+        self.queue_depth_total = 0
+        self.queue_depth_max = 0
+        self.blocked_puts = 0
+        self.queries = 0
+        self.phases = {}
+
+    @property
+    def wall_time(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def as_dict(self):
+        wall_time = self.wall_time
+        receives = self.batches or self.items_in
+        return {
+            "stage": self.name,
+            "wall_time": round(wall_time, 3),
+            "busy_time": round(max(wall_time - self.input_wait - self.output_wait, 0.0), 3),
+            "input_wait": round(self.input_wait, 3),
+            "output_wait": round(self.output_wait, 3),
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "batches": self.batches,
+            "items_per_second": round(self.items_out / wall_time, 1) if wall_time else 0.0,
+            "queue_depth_max": self.queue_depth_max,
+            "queue_depth_mean": round(self.queue_depth_total / receives, 2) if receives else 0.0,
+            "blocked_puts": self.blocked_puts,
+            "queries": self.queries,
+            "phases": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+        }
+
+
+class PipelineMetrics:
+    """
+    The measurements of all instrumented stages of a pipeline.
+
+    Queries of the stages which are not instrumented, e.g. those pulpcore appends to the pipeline
+    to associate the content with the new repository version, are counted for the pipeline.
+
+    Usage::
+
+        metrics = PipelineMetrics("sub-repo")
+        with metrics.collect():
+            run(metrics.instrument(stages))
+        metrics.as_dict()
+    """
+
+    def __init__(self, name=""):
+        self.name = name
+        self.stages = []
+        self.other_queries = 0
+        self.started = None
+        self.finished = None
+
+    def instrument(self, stages):
+        """
+        Instrument the stages of the pipeline in place.
+
+        Args:
+            stages (list): The :class:`~pulpcore.plugin.stages.Stage` instances to instrument.
+
+        Returns:
+            list: The same stages.
+
+        """
+        for stage in stages:
+            stage_metrics = StageMetrics(type(stage).__name__)
+            _instrument_stage(stage, stage_metrics)
+            self.stages.append(stage_metrics)
+        return stages
+
+    @contextmanager
+    def collect(self):
+        """Collect the metrics of the pipeline run in the block, and log them at the end."""
+        token = _current_pipeline.set(self)
+        _install_query_counter()
+        self.started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.finished = time.perf_counter()
+            _current_pipeline.reset(token)
+            self.log()
+
+    def log(self):
+        for stage in self.as_dict()["stages"]:
+            log.info(
+                "Sync stage {stage} of '{name}': {wall_time}s wall time, {busy_time}s busy, "
+                "{input_wait}s waiting for input, {output_wait}s waiting for output, "
+                "{items_out} units at {items_per_second}/s, {queries} queries".format(
+                    name=self.name, **stage
+                )
+            )
+
+    def as_dict(self):
+        wall_time = (self.finished or time.perf_counter()) - self.started if self.started else 0.0
+        return {
+            "name": self.name,
+            "wall_time": round(wall_time, 3),
+            "other_queries": self.other_queries,
+            "stages": [stage.as_dict() for stage in self.stages],
+        }
+
+
+@contextmanager
+def phase(name):
+    """
+    Time a phase of the instrumented stage running the block, if any.
+
+    The time the stage waits for the next stage to take its units is not counted. Can be used
+    as a decorator of synchronous functions as well.
+    """
+    stage = _current_stage.get()
+    if stage is None:
+        yield
+        return
+    start, output_wait = time.perf_counter(), stage.output_wait
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start - (stage.output_wait - output_wait)
+        stage.phases[name] = stage.phases.get(name, 0.0) + seconds
+
+
+def _count_query(execute, sql, params, many, context):
+    stage = _current_stage.get()
+    if stage is not None:
+        stage.queries += 1
+    else:
+        pipeline = _current_pipeline.get()
+        if pipeline is not None:
+            pipeline.other_queries += 1
+        else:
+            # Nothing is measured anymore in this thread, stop counting
+            context["connection"].execute_wrappers.remove(_count_query)
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter():
+    """Count the queries of the current thread for the stage or pipeline running them."""
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def _instrument_stage(stage, metrics):
+    """Replace the methods of a stage instance with ones recording its `metrics`."""
+    run, items, batches, put = stage.run, stage.items, stage.batches, stage.put
+
+    async def instrumented_run():
+        # Set in the task running the stage, so that only this stage is measured
+        _current_stage.set(metrics)
+        # The stages run their queries in a thread of their own
+        await sync_to_async(_install_query_counter)()
+        metrics.started = time.perf_counter()
+        try:
+            await run()
+        finally:
+            metrics.finished = time.perf_counter()
+
+    async def _receive(iterator):
+        while True:
+            # The units already queued when the stage asks for more
+            queue_depth = stage._in_q.qsize()
+            start = time.perf_counter()
+            busy, items_out = sum(metrics.phases.values()) + metrics.output_wait, metrics.items_out
+            try:
+                received = await anext(iterator)
+            except StopAsyncIteration:
+                return
+            finally:
+                # Stages may handle and pass on units while receiving them, e.g. RpmContentSaver
+                busy = sum(metrics.phases.values()) + metrics.output_wait - busy
+                metrics.input_wait += time.perf_counter() - start - busy
+                metrics.items_in += metrics.items_out - items_out
+            metrics.queue_depth_total += queue_depth
+            metrics.queue_depth_max = max(metrics.queue_depth_max, queue_depth)
+            yield received
+
+    async def instrumented_items():
+        async for item in _receive(items()):
+            metrics.items_in += 1
+            yield item
+
+    async def instrumented_batches(*args, **kwargs):
+        async for batch in _receive(batches(*args, **kwargs)):
+            metrics.batches += 1
+            metrics.items_in += len(batch)
+            yield batch
+
+    async def instrumented_put(item):
+        if stage._out_q.full():
+            metrics.blocked_puts += 1
+        start = time.perf_counter()
+        try:
+            await put(item)
+        finally:
+            metrics.output_wait += time.perf_counter() - start
+        metrics.items_out += 1
+
+    stage.run = instrumented_run
+    stage.items = instrumented_items
+    stage.batches = instrumented_batches
+    stage.put = instrumented_put
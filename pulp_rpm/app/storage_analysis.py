@@ -0,0 +1,174 @@
+"""
+Set-based storage analysis of rpm repositories.
+
+The sizes of a batch of repositories are computed in a few aggregate queries, rather than
+repository by repository. The content of a repository is the content of all of its versions and
+of the repositories of the addons and variants of its distribution trees (its sub-repos). An
+artifact is unique to a repository when no other repository has content referencing it; the
+sub-repos of a distribution tree count as part of the repositories containing the tree.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+
+from pulp_rpm.app.shared_utils import submit_with_connection
+
+# The repositories the sub-repos of the distribution trees belong to. A variant can be the
+# repository of the tree itself.
+TREE_MEMBERS_SQL = """
+tree_members AS (
+    SELECT DISTINCT rc.repository_id AS owner_id, sub.repository_id AS member_id
+    FROM core_repositorycontent rc
+    JOIN (
+        SELECT distribution_tree_id, repository_id FROM rpm_addon
+        UNION ALL
+        SELECT distribution_tree_id, repository_id FROM rpm_variant
+    ) sub ON sub.distribution_tree_id = rc.content_id
+    WHERE sub.repository_id <> rc.repository_id
+), selected_members AS (
+    SELECT id AS repository_id, id AS member_id FROM unnest(%(repositories)s::uuid[]) AS s (id)
+    UNION
+    SELECT owner_id, member_id FROM tree_members WHERE owner_id = ANY(%(repositories)s::uuid[])
+)
+"""
+
+DISK_SIZES_SQL = f"""
+WITH {TREE_MEMBERS_SQL}, repository_artifacts AS (
+    SELECT DISTINCT m.repository_id, ca.artifact_id
+    FROM selected_members m
+    JOIN core_repositorycontent rc ON rc.repository_id = m.member_id
+    JOIN core_contentartifact ca ON ca.content_id = rc.content_id
+    WHERE ca.artifact_id IS NOT NULL
+), shared_artifacts AS (
+    SELECT ra.repository_id, ra.artifact_id, EXISTS (
+        SELECT 1
+        FROM core_contentartifact other_ca
+        JOIN core_repositorycontent other_rc ON other_rc.content_id = other_ca.content_id
+        LEFT JOIN tree_members t ON t.member_id = other_rc.repository_id
+        WHERE other_ca.artifact_id = ra.artifact_id
+            AND coalesce(t.owner_id, other_rc.repository_id) <> ra.repository_id
+    ) AS shared
+    FROM repository_artifacts ra
+)
+SELECT
+    sa.repository_id,
+    sum(a.size)::bigint,
+    coalesce(sum(a.size) FILTER (WHERE NOT sa.shared), 0)::bigint,
+    coalesce(sum(a.size) FILTER (WHERE sa.shared), 0)::bigint
+FROM shared_artifacts sa
+JOIN core_artifact a ON a.pulp_id = sa.artifact_id
+GROUP BY sa.repository_id
+"""
+
+# Several remotes can provide the same on-demand artifact, only one of them is counted
+ON_DEMAND_SIZES_SQL = f"""
+WITH {TREE_MEMBERS_SQL}, repository_content AS (
+    SELECT DISTINCT m.repository_id, rc.content_id
+    FROM selected_members m
+    JOIN core_repositorycontent rc ON rc.repository_id = m.member_id
+)
+SELECT rc.repository_id, sum(ra.size)::bigint
+FROM repository_content rc
+JOIN core_contentartifact ca ON ca.content_id = rc.content_id AND ca.artifact_id IS NULL
+JOIN LATERAL (
+    SELECT size FROM core_remoteartifact
+    WHERE content_artifact_id = ca.pulp_id AND size IS NOT NULL
+    LIMIT 1
+) ra ON true
+GROUP BY rc.repository_id
+"""
+
+PUBLISHED_METADATA_SIZES_SQL = """
+SELECT published.repository_id, sum(a.size)::bigint
+FROM (
+    SELECT DISTINCT rv.repository_id, ca.artifact_id
+    FROM core_repositoryversion rv
+    JOIN core_publication p ON p.repository_version_id = rv.pulp_id AND p.complete
+    JOIN core_publishedmetadata pm ON pm.publication_id = p.pulp_id
+    JOIN core_contentartifact ca ON ca.content_id = pm.content_ptr_id
+    WHERE rv.repository_id = ANY(%(repositories)s::uuid[]) AND ca.artifact_id IS NOT NULL
+) published
+JOIN core_artifact a ON a.pulp_id = published.artifact_id
+GROUP BY published.repository_id
+"""
+
+
+def _sizes(sql, repository_pks):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"repositories": repository_pks})
+        return {str(repository_pk): sizes for repository_pk, *sizes in cursor.fetchall()}
+
+
+def repository_sizes(repository_pks, include_on_demand=False, include_published_metadata=False):
+    """
+    Compute the sizes of a batch of repositories.
+
+    Args:
+        repository_pks (list): The pks of the repositories.
+        include_on_demand (bool): Compute the approximate size of the on-demand artifacts.
+        include_published_metadata (bool): Compute the size of the published metadata.
+
+    Returns:
+        dict: The sizes of each repository by pk: "disk-size", "unique-disk-size" and
+            "shared-disk-size", and "on-demand-size" and "published-metadata-size" if requested.
+
+    """
+    repository_pks = [str(repository_pk) for repository_pk in repository_pks]
+    disk_sizes = _sizes(DISK_SIZES_SQL, repository_pks)
+    on_demand_sizes = _sizes(ON_DEMAND_SIZES_SQL, repository_pks) if include_on_demand else {}
+    published_metadata_sizes = (
+        _sizes(PUBLISHED_METADATA_SIZES_SQL, repository_pks) if include_published_metadata else {}
+    )
+
+    sizes = {}
+    for repository_pk in repository_pks:
+        total, unique, shared = disk_sizes.get(repository_pk, (0, 0, 0))
+        sizes[repository_pk] = {
+            "disk-size": total,
+            "unique-disk-size": unique,
+            "shared-disk-size": shared,
+        }
+        if include_on_demand:
+            sizes[repository_pk]["on-demand-size"] = on_demand_sizes.get(repository_pk, [0])[0]
+        if include_published_metadata:
+            sizes[repository_pk]["published-metadata-size"] = published_metadata_sizes.get(
+                repository_pk, [0]
+            )[0]
+    return sizes
+
+
+def iter_repository_sizes(repository_pks, batch_size=100, workers=1, **kwargs):
+    """
+    Yield the sizes of many repositories, computed in batches.
+
+    Args:
+        repository_pks (list): The pks of the repositories.
+        batch_size (int): How many repositories to compute the sizes of at once.
+        workers (int): How many batches to compute in parallel, each with a database connection
+            of its own.
+        kwargs: Passed on to `repository_sizes()`.
+
+    Yields:
+        tuple: The pk and the sizes of each repository, in the order of `repository_pks`.
+
+    """
+    batches = [
+        repository_pks[start : start + batch_size]
+        for start in range(0, len(repository_pks), batch_size)
+    ]
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                submit_with_connection(executor, repository_sizes, batch, **kwargs)
+                for batch in batches
+            ]
+            for batch, future in zip(batches, futures):
+                sizes = future.result()
+                for repository_pk in batch:
+                    yield repository_pk, sizes[str(repository_pk)]
+    else:
+        for batch in batches:
+            sizes = repository_sizes(batch, **kwargs)
+            for repository_pk in batch:
+                yield repository_pk, sizes[str(repository_pk)]
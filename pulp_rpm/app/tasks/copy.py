@@ -7,15 +7,19 @@ from pulpcore.plugin.util import get_domain_pk
 
 from pulp_rpm.app.depsolving import Solver
 from pulp_rpm.app.models import (
+    LatestPackage,
     Modulemd,
     Package,
     PackageCategory,
     PackageEnvironment,
     PackageGroup,
     RpmRepository,
+    UpdateCollection,
+    UpdateCollectionPackage,
     UpdateRecord,
 )
-from pulp_rpm.app.sql_utils import annotate_with_age, get_content_in_repoversion, safe_in
+from pulp_rpm.app.profiling import profile_checkpoint, profiled
+from pulp_rpm.app.sql_utils import get_content_in_repoversion, safe_in
 
 
 def find_children_of_content(content, src_repo_version):
@@ -57,48 +61,61 @@ def find_children_of_content(content, src_repo_version):
     children = set()
 
     # --- Advisories: resolve the packages and modules they reference ---
+    # The references of all advisories are looked up at once, not advisory by advisory
     domain_pk = get_domain_pk()
-    for advisory in advisories.iterator():
-        package_nevras = advisory.get_pkglist()
-        if package_nevras:
-            # Uses a single unnest()-zipped array comparison (avoid param blow)
-            names, epochs, versions, releases, arches = zip(*package_nevras)
-            matching_packages = (
-                packages.filter(pulp_domain=domain_pk)
-                .annotate(
-                    _nevra_match=RawSQL(
-                        '("rpm_package"."name", "rpm_package"."epoch", "rpm_package"."version", '
-                        '"rpm_package"."release", "rpm_package"."arch") IN '
-                        "(SELECT * FROM unnest(%s::text[], %s::text[], %s::text[], "
-                        "%s::text[], %s::text[]))",
-                        (list(names), list(epochs), list(versions), list(releases), list(arches)),
-                        output_field=BooleanField(),
-                    )
+    package_nevras = list(
+        UpdateCollectionPackage.objects.filter(update_collection__update_record__in=advisories)
+        .values_list("name", "epoch", "version", "release", "arch")
+        .distinct()
+        .iterator()
+    )
+    if package_nevras:
+        # Uses a single unnest()-zipped array comparison (avoid param blow)
+        names, epochs, versions, releases, arches = zip(*package_nevras)
+        matching_packages = (
+            packages.filter(pulp_domain=domain_pk)
+            .annotate(
+                _nevra_match=RawSQL(
+                    '("rpm_package"."name", "rpm_package"."epoch", "rpm_package"."version", '
+                    '"rpm_package"."release", "rpm_package"."arch") IN '
+                    "(SELECT * FROM unnest(%s::text[], %s::text[], %s::text[], "
+                    "%s::text[], %s::text[]))",
+                    (list(names), list(epochs), list(versions), list(releases), list(arches)),
+                    output_field=BooleanField(),
                 )
-                .filter(_nevra_match=True)
             )
-            children.update(matching_packages.values_list("pk", flat=True))
-
-        module_nsvcas = advisory.get_module_list()
-        if module_nsvcas:
-            # Uses a single unnest()-zipped array comparison (avoid param blow)
-            names, streams, versions, contexts, arches = zip(*module_nsvcas)
-            matching_modules = (
-                modules.filter(pulp_domain=domain_pk)
-                .annotate(
-                    _nsvca_match=RawSQL(
-                        '("rpm_modulemd"."name", "rpm_modulemd"."stream", '
-                        '"rpm_modulemd"."version", "rpm_modulemd"."context", '
-                        '"rpm_modulemd"."arch") IN '
-                        "(SELECT * FROM unnest(%s::text[], %s::text[], %s::text[], "
-                        "%s::text[], %s::text[]))",
-                        (list(names), list(streams), list(versions), list(contexts), list(arches)),
-                        output_field=BooleanField(),
-                    )
+            .filter(_nevra_match=True)
+        )
+        children.update(matching_packages.values_list("pk", flat=True))
+
+    module_nsvcas = {
+        (module["name"], module["stream"], module["version"], module["context"], module["arch"])
+        for module in UpdateCollection.objects.filter(
+            update_record__in=advisories, module__isnull=False
+        )
+        .values_list("module", flat=True)
+        .iterator()
+        if module
+    }
+    if module_nsvcas:
+        # Uses a single unnest()-zipped array comparison (avoid param blow)
+        names, streams, versions, contexts, arches = zip(*module_nsvcas)
+        matching_modules = (
+            modules.filter(pulp_domain=domain_pk)
+            .annotate(
+                _nsvca_match=RawSQL(
+                    '("rpm_modulemd"."name", "rpm_modulemd"."stream", '
+                    '"rpm_modulemd"."version", "rpm_modulemd"."context", '
+                    '"rpm_modulemd"."arch") IN '
+                    "(SELECT * FROM unnest(%s::text[], %s::text[], %s::text[], "
+                    "%s::text[], %s::text[]))",
+                    (list(names), list(streams), list(versions), list(contexts), list(arches)),
+                    output_field=BooleanField(),
                 )
-                .filter(_nsvca_match=True)
             )
-            children.update(matching_modules.values_list("pk", flat=True))
+            .filter(_nsvca_match=True)
+        )
+        children.update(matching_modules.values_list("pk", flat=True))
 
     # --- PackageCategories & PackageEnvironments: resolve the PackageGroups they reference ---
     # (must go before the PackageGroups section below, which needs the full group set)
@@ -136,22 +153,17 @@ def find_children_of_content(content, src_repo_version):
 
     missing_package_names = packagegroup_package_names - set(existing_package_names)
 
-    needed_packages = annotate_with_age(
-        Package.objects.filter(
-            safe_in("name", missing_package_names),
-            pk__in=get_content_in_repoversion(src_repo_version),
-        )
-    )
-
     # Pick the latest version of each package available which isn't already present
     # in the content set.
-    for pk, age in needed_packages.values_list("pk", "age").iterator():
-        if age == 1:
-            children.add(pk)
+    needed_packages = LatestPackage.get_packages(src_repo_version).filter(
+        safe_in("name", missing_package_names)
+    )
+    children.update(needed_packages.values_list("pk", flat=True).iterator())
 
     return Content.objects.filter(safe_in("pk", children))
 
 
+@profiled
 @transaction.atomic
 def copy_content(config, dependency_solving, dependency_upgrade=False):
     """
@@ -212,6 +224,7 @@ def copy_content(config, dependency_solving, dependency_upgrade=False):
             base_version = dest_repo_version if dest_version_provided else None
             with dest_repo.new_version(base_version=base_version) as new_version:
                 new_version.add_content(content_to_copy)
+            profile_checkpoint(f"finalize {dest_repo.name}")
     else:
         # Dependency Solving Branch
         # =========================
@@ -257,10 +270,12 @@ def copy_content(config, dependency_solving, dependency_upgrade=False):
             content_to_copy[source_repo_name] = content | children
 
         solver.finalize()
+        profile_checkpoint("load_repositories")
 
         content_to_copy = solver.resolve_dependencies(
             content_to_copy, focus_installed=not dependency_upgrade
         )
+        profile_checkpoint("resolve_dependencies")
 
         for from_repo, units in content_to_copy.items():
             src_repo_version = libsolv_repo_names[from_repo]
@@ -268,3 +283,4 @@ def copy_content(config, dependency_solving, dependency_upgrade=False):
             base_version = dest_repo_version if base_versions[src_repo_version] else None
             with dest_repo_version.repository.new_version(base_version=base_version) as new_version:
                 new_version.add_content(Content.objects.filter(pk__in=units))
+            profile_checkpoint(f"finalize {dest_repo_version.repository.name}")
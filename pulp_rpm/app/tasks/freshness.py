@@ -0,0 +1,279 @@
+import asyncio
+import logging
+from gettext import gettext as _
+from typing import NamedTuple
+
+import createrepo_c as cr
+from aiohttp.client_exceptions import ClientResponseError
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from pulpcore.plugin.models import ProgressReport, RepositoryVersion, TaskGroup
+from pulpcore.plugin.tasking import dispatch
+
+from pulp_rpm.app.constants import DIST_TREE_MAIN_REPO_PATH, SYNC_POLICIES
+from pulp_rpm.app.kickstart.treeinfo import PulpTreeInfo, TreeinfoData
+from pulp_rpm.app.models import RpmRemote, RpmRepository
+from pulp_rpm.app.shared_utils import urlpath_sanitize
+from pulp_rpm.app.tasks.synchronizing import (
+    make_sync_details,
+    should_optimize_sync,
+    synchronize,
+)
+
+log = logging.getLogger(__name__)
+
+
+class FreshnessCheck(NamedTuple):
+    """A repository to check for changes of the metadata of its remote, loaded beforehand."""
+
+    repository: RpmRepository
+    remote: RpmRemote
+    sync_policy: str
+    skip_types: list
+    # the sub-repos of the distribution tree of the last sync, by name
+    sub_repos: dict
+
+
+async def fetch_optional(remote, url):
+    """Download a file which may not exist. Returns None if it does not."""
+    downloader = remote.get_downloader(url=url, silence_errors_for_response_status_codes={403, 404})
+    try:
+        return await downloader.run()
+    except FileNotFoundError:
+        return None
+
+
+async def fetch_treeinfo(remote, url):
+    """
+    Download and parse the treeinfo file of a repository, like the sync does.
+
+    Returns:
+        dict: The treeinfo data with its "hash" and sub-repos, or an empty dict if there is none.
+
+    """
+    for namespace in (".treeinfo", "treeinfo"):
+        result = await fetch_optional(remote, urlpath_sanitize(url, namespace))
+        if result is None:
+            continue
+        with open(result.path) as treeinfo_file:
+            treeinfo_str = treeinfo_file.read()
+        # an HTML error page returned with HTTP 200
+        if treeinfo_str.startswith("<"):
+            continue
+        treeinfo = PulpTreeInfo()
+        treeinfo.loads(treeinfo_str)
+        treeinfo_data = TreeinfoData(treeinfo.parsed_sections())
+        return treeinfo_data.to_dict(hash=result.artifact_attributes["sha256"], filename=namespace)
+    return {}
+
+
+async def fetch_sync_details(check, repository, url):
+    """
+    Download the metadata a sync of a repository from `url` would start with.
+
+    Returns:
+        tuple: The sync details, to compare with the last ones of the repository, and the
+            treeinfo data.
+
+    """
+    downloader = check.remote.get_downloader(url=urlpath_sanitize(url, "repodata/repomd.xml"))
+    result = await downloader.run()
+    repomd = cr.Repomd(result.path)
+    treeinfo = {}
+    if "treeinfo" not in check.skip_types:
+        treeinfo = await fetch_treeinfo(check.remote, url)
+    sync_details = make_sync_details(
+        check.remote,
+        repository,
+        repository.latest_version_number,
+        check.sync_policy,
+        check.skip_types,
+        repomd.revision,
+        result.artifact_attributes["sha256"],
+        treeinfo.get("hash", ""),
+    )
+    return sync_details, treeinfo
+
+
+async def has_changed(check):
+    """
+    Check whether a sync of a repository would not be skipped as unchanged.
+
+    The repository, and the sub-repos of its distribution tree if it has one, are compared with
+    their last sync in the same way as `synchronize()` does.
+    """
+    # mirror lists are resolved by the sync
+    url = check.remote.url.rstrip("/") + "/"
+    sync_details, treeinfo = await fetch_sync_details(check, check.repository, url)
+    if not should_optimize_sync(sync_details, check.repository.last_sync_details):
+        return True
+
+    for repodata in set(treeinfo.get("download", {}).get("repodatas", [])):
+        if repodata == DIST_TREE_MAIN_REPO_PATH:
+            continue
+        sub_repo = check.sub_repos.get(f"{repodata}-{treeinfo['hash']}-{check.repository.pk}")
+        if sub_repo is None:
+            return True
+        try:
+            sub_repo_details, _treeinfo = await fetch_sync_details(
+                check, sub_repo, urlpath_sanitize(url, f"{repodata}/")
+            )
+        except ClientResponseError as exc:
+            # a sub-repo without metadata is skipped by the sync as well
+            if exc.status == 404:
+                continue
+            raise
+        if not should_optimize_sync(sub_repo_details, sub_repo.last_sync_details):
+            return True
+    return False
+
+
+async def check_repositories(checks, concurrency, progress_report):
+    """Check the repositories concurrently, return those which changed."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check_repository(check):
+        async with semaphore:
+            try:
+                changed = await has_changed(check)
+            except Exception as exc:
+                # the sync will report the error, or resolve e.g. a mirror list
+                log.info(
+                    _("Failed to check repository {name} for updates: {exc}").format(
+                        name=check.repository.name, exc=exc
+                    )
+                )
+                changed = True
+        await progress_report.aincrement()
+        return changed
+
+    changes = await asyncio.gather(*(check_repository(check) for check in checks))
+    # repositories of the same remote share its instance, and the connection pool of its downloaders
+    await close_sessions({check.remote.pk: check.remote for check in checks}.values())
+    return [check for check, changed in zip(checks, changes) if changed]
+
+
+async def close_sessions(remotes):
+    """Close the connection pools of the remotes, instead of keeping them until the worker exits."""
+    for remote in remotes:
+        downloader = remote.get_downloader(url=remote.url)
+        # only HTTP downloaders have a session
+        if session := getattr(downloader, "session", None):
+            await session.close()
+
+
+def with_latest_version_number(repositories):
+    return repositories.annotate(
+        latest_version_number=Subquery(
+            RepositoryVersion.objects.filter(repository=OuterRef("pk"), complete=True)
+            .order_by("-number")
+            .values("number")[:1]
+        )
+    )
+
+
+def get_sync_policy_errors(repository, sync_policy, skip_types):
+    """Return why the repository cannot be synced with the sync policy, like the sync API does."""
+    if sync_policy in (SYNC_POLICIES.MIRROR_COMPLETE, SYNC_POLICIES.MIRROR_CONTENT_ONLY):
+        if repository.retain_package_versions > 0:
+            return "retain_package_versions"
+    if sync_policy == SYNC_POLICIES.MIRROR_COMPLETE:
+        if repository.autopublish:
+            return "autopublish"
+        if skip_types:
+            return "skip_types"
+    return None
+
+
+def check_repositories_freshness(repo_pks, sync_policy=None, skip_types=None, dry_run=False):
+    """
+    Check many repositories for changes of their upstream metadata, and sync those which changed.
+
+    The repomd.xml and treeinfo files of the remotes of all repositories are downloaded from one
+    event loop, without locking the repositories, and compared with the last sync of each
+    repository like an optimized sync does. A sync task is dispatched only for the repositories
+    whose sync would not be skipped, in the task group of this task.
+
+    Repositories without a remote are ignored, those with a ULN remote are always synced.
+
+    Args:
+        repo_pks (list): The pks of the repositories to check.
+        sync_policy (str): The sync policy to sync with. Defaults to the one of the last sync of
+            each repository.
+        skip_types (list): The content types to skip. Defaults to those of the last sync of each
+            repository.
+        dry_run (bool): Only log the repositories which changed, without syncing them.
+
+    """
+    repositories = with_latest_version_number(
+        RpmRepository.objects.filter(pk__in=repo_pks, remote__isnull=False)
+    )
+    remotes = RpmRemote.objects.in_bulk(repositories.values_list("remote_id", flat=True))
+
+    checks = []
+    changed = []
+    for repository in repositories.select_related("remote"):
+        last_sync_details = repository.last_sync_details
+        check = FreshnessCheck(
+            repository=repository,
+            remote=remotes.get(repository.remote_id) or repository.remote.cast(),
+            sync_policy=sync_policy or last_sync_details.get("sync_policy", SYNC_POLICIES.ADDITIVE),
+            skip_types=last_sync_details.get("skip_types", [])
+            if skip_types is None
+            else skip_types,
+            sub_repos={},
+        )
+        if error := get_sync_policy_errors(repository, check.sync_policy, check.skip_types):
+            log.warning(
+                _("Cannot sync repository {name} with '{policy}' because of '{error}'.").format(
+                    name=repository.name, policy=check.sync_policy, error=error
+                )
+            )
+            continue
+        if not isinstance(check.remote, RpmRemote) or not check.remote.url:
+            changed.append(check)
+            continue
+        if treeinfo_checksum := last_sync_details.get("treeinfo_checksum"):
+            sub_repos = with_latest_version_number(
+                RpmRepository.objects.filter(
+                    user_hidden=True, name__endswith=f"-{treeinfo_checksum}-{repository.pk}"
+                )
+            )
+            check.sub_repos.update((sub_repo.name, sub_repo) for sub_repo in sub_repos)
+        checks.append(check)
+
+    with ProgressReport(
+        message="Checking repositories for updates",
+        code="sync.checking_for_updates",
+        total=len(checks),
+    ) as progress_report:
+        changed += asyncio.get_event_loop().run_until_complete(
+            check_repositories(checks, settings.RPM_FRESHNESS_CHECK_CONCURRENCY, progress_report)
+        )
+
+    log.info(
+        _("{changed} of {total} repositories changed: {names}").format(
+            changed=len(changed),
+            total=len(checks),
+            names=", ".join(sorted(check.repository.name for check in changed)),
+        )
+    )
+    if dry_run:
+        return
+
+    task_group = TaskGroup.current()
+    for check in changed:
+        dispatch(
+            synchronize,
+            shared_resources=[check.remote],
+            exclusive_resources=[check.repository],
+            task_group=task_group,
+            kwargs={
+                "sync_policy": check.sync_policy,
+                "remote_pk": str(check.remote.pk),
+                "repository_pk": str(check.repository.pk),
+                "skip_types": check.skip_types,
+                "optimize": True,
+            },
+        )
@@ -14,13 +14,14 @@ from pulpcore.plugin.models import (
 )
 from pulpcore.plugin.tasking import dispatch
 
-from pulp_rpm.app.models.package import Package
+from pulp_rpm.app.models.package import LatestPackage, Package
 from pulp_rpm.app.models.repository import RpmRepository
-from pulp_rpm.app.sql_utils import annotate_with_age
+from pulp_rpm.app.profiling import profile_checkpoint, profiled
 
 log = getLogger(__name__)
 
 
+@profiled
 def prune_repo_packages(repo_pk, keep_days, dry_run):
     """
     This task prunes old Packages from the latest_version of the specified repository.
@@ -38,8 +39,8 @@ def prune_repo_packages(repo_pk, keep_days, dry_run):
 
     # We only care about RPM-Names that have more than one EVRA - "singles" are always kept.
     rpm_by_name_age = (
-        annotate_with_age(curr_vers.get_content(Package.objects))
-        .filter(age__gt=1)
+        curr_vers.get_content(Package.objects)
+        .exclude(pk__in=LatestPackage.get_packages(curr_vers).values("pk"))
         .order_by("name", "epoch", "version", "release", "arch")
         .values("pk")
     )
@@ -73,6 +74,7 @@ def prune_repo_packages(repo_pk, keep_days, dry_run):
     )
     to_be_removed = len(target_ids_q)
     log.debug(f">>> TARGET IDS: {to_be_removed}.")
+    profile_checkpoint("find_packages")
     # Use the progressreport to report back numbers. The prune happens as one
     # action.
     data = dict(
@@ -95,6 +97,7 @@ def prune_repo_packages(repo_pk, keep_days, dry_run):
     else:
         with repo.new_version(base_version=None) as new_version:
             new_version.remove_content(Content.objects.filter(pk__in=target_ids_q))
+        profile_checkpoint("finalize")
         data["done"] = to_be_removed
 
     pb = ProgressReport(**data)
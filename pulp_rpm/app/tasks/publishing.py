@@ -10,7 +10,8 @@ import createrepo_c as cr
 import libcomps
 from django.conf import settings
 from django.core.files import File
-from django.db.models import Q
+from django.db import connection
+from django.db.models import Prefetch, Q
 
 from pulpcore.plugin.models import (
     AsciiArmoredDetachedSigningService,
@@ -22,6 +23,7 @@ from pulpcore.plugin.models import (
     RepositoryVersion,
 )
 
+from pulp_rpm.app.compression import parallel_compress_file
 from pulp_rpm.app.comps import dict_to_strdict
 from pulp_rpm.app.constants import (
     ALLOWED_CHECKSUM_ERROR_MSG,
@@ -35,6 +37,7 @@ from pulp_rpm.app.exceptions import (
     ForbiddenChecksumTypeError,
     MetadataSigningError,
     UnsupportedLayoutError,
+    ZchunkUnsupportedError,
 )
 from pulp_rpm.app.kickstart.treeinfo import PulpTreeInfo, TreeinfoData
 from pulp_rpm.app.models import (
@@ -49,14 +52,34 @@ from pulp_rpm.app.models import (
     PackageLangpacks,
     RepoMetadataFile,
     RpmPublication,
+    UpdateCollection,
+    UpdateCollectionPackage,
     UpdateRecord,
+    UpdateReference,
 )
+from pulp_rpm.app.profiling import profile_checkpoint, profiled
 from pulp_rpm.app.serializers import RpmPublicationSerializer
 from pulp_rpm.app.shared_utils import format_nevra
+from pulp_rpm.app.sql_utils import repoversion_content_ids
 
 log = logging.getLogger(__name__)
 
 REPODATA_PATH = "repodata"
+# The metadata createrepo_c compresses when it writes a repository
+COMPRESSED_RECORD_TYPES = {"primary", "filelists", "other", "updateinfo"}
+
+# The architectures of source packages
+SOURCE_ARCHES = ["src", "nosrc"]
+# The names of debuginfo and debugsource packages, e.g. foo-debuginfo or kernel-debuginfo-common
+DEBUGINFO_NAME_REGEX = r"-debug(info|source)(-|$)"
+
+# The content of a repository version, in a stable order
+CONTENT_FINGERPRINT_SQL = """
+SELECT encode(sha256(convert_to(
+    coalesce(string_agg(content_id::text, ',' ORDER BY content_id), ''), 'UTF8'
+)), 'hex')
+FROM ({content_ids}) AS content (content_id)
+"""
 
 # lift dynaconf lookups outside of loops
 ALLOWED_CONTENT_CHECKSUMS = settings.ALLOWED_CONTENT_CHECKSUMS
@@ -230,7 +253,30 @@ class PublicationData:
 
     def publish_artifacts(self, content, prefix=""):
         """
-        Create PublishedArtifacts for each Artifact. Special considerations for Packages:
+        Create PublishedArtifacts for each Artifact, laid out as described in `layout_artifacts`.
+
+        Args:
+            content (pulpcore.plugin.models.Content): content set.
+            prefix (str): a relative path prefix for the published artifact
+
+        Returns:
+            dict: Mapping of content_id to PackageInfo for retained packages.
+        """
+        cid_to_pkginfo, paths = self.layout_artifacts(content, prefix=prefix)
+        published_artifacts = [
+            PublishedArtifact(
+                relative_path=relative_path,
+                publication=self.publication,
+                content_artifact_id=caid,
+            )
+            for relative_path, caid in paths
+        ]
+        PublishedArtifact.objects.bulk_create(published_artifacts, batch_size=2000)
+        return cid_to_pkginfo
+
+    def layout_artifacts(self, content, prefix=""):
+        """
+        Compute the relative path of each Artifact. Special considerations for Packages:
 
         1. Respect the layout of the publication.
            1. "flat": "Packages/xxx.rpm"
@@ -280,7 +326,8 @@ class PublicationData:
             prefix (str): a relative path prefix for the published artifact
 
         Returns:
-            dict: Mapping of content_id to PackageInfo for retained packages.
+            tuple: Mapping of content_id to PackageInfo for retained packages, and a list of
+                (relative_path, content_artifact_id) tuples of everything to publish.
         """
 
         def nested_alphabetically_path(pkg_filename):
@@ -304,15 +351,17 @@ class PublicationData:
             """Returns the path to use for flat layout. Define to keep it close to the others."""
             return os.path.join(PACKAGES_DIRECTORY, pkg_filename)
 
-        published_artifacts = []
+        paths = []
         requested_checksum_type = get_checksum_type(self.checksum_types)
         layout = self.publication.layout
         collision_manager = _CollisionManager()
         cid_to_pkginfo: dict[UUID, PackageInfo] = {}
 
         # Special Handling for Packages first
-        contentartifact_qs = ContentArtifact.objects.filter(content__in=content).filter(
-            content__pulp_type=Package.get_pulp_type()
+        contentartifact_qs = (
+            ContentArtifact.objects.filter(content__in=content)
+            .filter(content__pulp_type=Package.get_pulp_type())
+            .filter(package_filters(self.publication, prefix="content__rpm_package__"))
         )
 
         fields = [
@@ -395,15 +444,9 @@ class PublicationData:
         retained_cids = collision_manager.retained_cids()
         cid_to_pkginfo = {k: cid_to_pkginfo[k] for k in retained_cids}
 
-        # Finally create the PublishedArtifacts for the remaining packages
+        # Finally record the paths of the remaining packages
         for cid, pkg_info in cid_to_pkginfo.items():
-            published_artifacts.append(
-                PublishedArtifact(
-                    relative_path=os.path.join(prefix, pkg_info.path),
-                    publication=self.publication,
-                    content_artifact_id=pkg_info.caid,
-                )
-            )
+            paths.append((os.path.join(prefix, pkg_info.path), pkg_info.caid))
 
         # Handle the non-packages
         is_treeinfo = Q(relative_path__in=["treeinfo", ".treeinfo"])
@@ -424,16 +467,9 @@ class PublicationData:
         )
 
         for content_artifact in contentartifact_qs.values("pk", "relative_path").iterator():
-            published_artifacts.append(
-                PublishedArtifact(
-                    relative_path=content_artifact["relative_path"],
-                    publication=self.publication,
-                    content_artifact_id=content_artifact["pk"],
-                )
-            )
+            paths.append((content_artifact["relative_path"], content_artifact["pk"]))
 
-        PublishedArtifact.objects.bulk_create(published_artifacts, batch_size=2000)
-        return cid_to_pkginfo
+        return cid_to_pkginfo, paths
 
     def handle_sub_repos(self, distribution_tree):
         """
@@ -522,6 +558,28 @@ class PublicationData:
             setattr(self, f"{name}_packages", self.publish_artifacts(content, prefix=name))
 
 
+def package_filters(publication, prefix=""):
+    """
+    Return the condition the packages published by a publication meet, per its package filters.
+
+    Args:
+        publication (RpmPublication): The publication.
+        prefix (str): The path of the package fields from the model being filtered.
+
+    Returns:
+        django.db.models.Q: The condition, which all packages meet without filters.
+
+    """
+    condition = Q()
+    if publication.arches is not None:
+        condition &= Q(**{f"{prefix}arch__in": [*publication.arches, "noarch"]})
+    if publication.exclude_source:
+        condition &= ~Q(**{f"{prefix}arch__in": SOURCE_ARCHES})
+    if publication.exclude_debuginfo:
+        condition &= ~Q(**{f"{prefix}name__regex": DEBUGINFO_NAME_REGEX})
+    return condition
+
+
 def get_checksum_type(checksum_types, default=CHECKSUM_TYPES.SHA256):
     """
     Get checksum algorithm for publishing metadata.
@@ -548,6 +606,116 @@ def cr_checksum_type_from_string(checksum_type):
     return getattr(cr, checksum_type.upper())
 
 
+def content_fingerprint(repository_version):
+    """
+    Compute the fingerprint of the content set of a repository version.
+
+    Versions with the same content have the same fingerprint, so that the metadata published for
+    one of them can be reused for the others.
+
+    Returns:
+        str: The fingerprint, or None if the metadata of the version cannot be reused: when it
+            depends on the repository as well, i.e. with RPM_METADATA_USE_REPO_PACKAGE_TIME or
+            distribution trees, whose sub-repos are published from the latest version of the
+            repositories of their addons and variants.
+
+    """
+    if RPM_METADATA_USE_REPO_PACKAGE_TIME:
+        return None
+    if DistributionTree.objects.filter(pk__in=repository_version.content).exists():
+        return None
+    with connection.cursor() as cursor:
+        sql, params = repoversion_content_ids(repository_version).query.sql_with_params()
+        cursor.execute(CONTENT_FINGERPRINT_SQL.format(content_ids=sql), params)
+        return cursor.fetchone()[0]
+
+
+def find_reusable_publication(publication):
+    """
+    Find a complete publication whose metadata is the same as the metadata of `publication`.
+
+    That is a publication of the same content with the same checksum type, compression, layout,
+    zchunk metadata, package filters and signing service.
+
+    Returns:
+        RpmPublication: The most recent such publication, or None.
+
+    """
+    if publication.content_fingerprint is None:
+        return None
+    publications = RpmPublication.objects.filter(
+        pulp_domain=publication.pulp_domain,
+        complete=True,
+        content_fingerprint=publication.content_fingerprint,
+        checksum_type=publication.checksum_type,
+        compression_type=publication.compression_type,
+        layout=publication.layout,
+        zchunk_metadata=publication.zchunk_metadata,
+        arches=publication.arches,
+        exclude_debuginfo=publication.exclude_debuginfo,
+        exclude_source=publication.exclude_source,
+        metadata_signing_service=publication.metadata_signing_service,
+    ).exclude(pk=publication.pk)
+    if publication.metadata_signing_service is None:
+        # the signing service of a signed publication may have been removed since
+        publications = publications.exclude(
+            published_artifact__relative_path=os.path.join(REPODATA_PATH, "repomd.xml.asc")
+        )
+    return publications.order_by("-pulp_created").first()
+
+
+def reuse_publication(publication, source):
+    """
+    Populate a publication with the published artifacts and metadata of another publication.
+
+    The metadata files are published with the artifacts of `source`, without generating or
+    storing them again.
+
+    Args:
+        publication (RpmPublication): The publication to populate.
+        source (RpmPublication): A publication with the same metadata (see
+            `find_reusable_publication()`).
+
+    """
+    source_metadata = list(PublishedMetadata.objects.filter(publication=source))
+    metadata_artifacts = {
+        content_artifact.content_id: content_artifact
+        for content_artifact in ContentArtifact.objects.filter(content__in=source_metadata)
+    }
+    # the content artifacts of the metadata of the source, by those of the publication
+    reused_artifacts = {}
+    for metadata in source_metadata:
+        content_artifact = metadata_artifacts[metadata.pk]
+        reused_metadata = PublishedMetadata(
+            relative_path=metadata.relative_path, publication=publication
+        )
+        reused_metadata.save()
+        reused_artifacts[content_artifact.pk] = ContentArtifact(
+            content=reused_metadata,
+            artifact_id=content_artifact.artifact_id,
+            relative_path=content_artifact.relative_path,
+        )
+    ContentArtifact.objects.bulk_create(reused_artifacts.values())
+
+    published_artifacts = []
+    for relative_path, content_artifact_pk in (
+        PublishedArtifact.objects.filter(publication=source)
+        .values_list("relative_path", "content_artifact_id")
+        .iterator(chunk_size=2000)
+    ):
+        if content_artifact_pk in reused_artifacts:
+            content_artifact_pk = reused_artifacts[content_artifact_pk].pk
+        published_artifacts.append(
+            PublishedArtifact(
+                relative_path=relative_path,
+                publication=publication,
+                content_artifact_id=content_artifact_pk,
+            )
+        )
+    PublishedArtifact.objects.bulk_create(published_artifacts, batch_size=2000)
+
+
+@profiled
 def publish(
     repository_version_pk,
     metadata_signing_service=None,
@@ -557,6 +725,11 @@ def publish(
     repo_config=None,
     compression_type=COMPRESSION_TYPES.GZ,
     layout=None,
+    compression_threads=None,
+    zchunk_metadata=False,
+    arches=None,
+    exclude_debuginfo=False,
+    exclude_source=False,
     *args,
     **kwargs,
 ):
@@ -574,6 +747,15 @@ def publish(
             Compression type to use for metadata files.
         layout(pulp_rpm.app.constants.LAYOUT_TYPES):
             How to layout the package files within the publication (flat, nested, etc.)
+        compression_threads(int):
+            Number of threads to compress metadata files with. Defaults to
+            RPM_METADATA_COMPRESSION_THREADS.
+        zchunk_metadata(bool):
+            Whether to publish zchunk variants of the package and advisory metadata as well.
+        arches(list):
+            The architectures of the packages to publish, besides noarch. All of them if None.
+        exclude_debuginfo(bool): Whether to leave the debuginfo and debugsource packages out.
+        exclude_source(bool): Whether to leave the source packages out.
 
     """
     repository_version = RepositoryVersion.objects.get(pk=repository_version_pk)
@@ -593,6 +775,12 @@ def publish(
         # with an explicit None value.
         layout = LAYOUT_TYPES.NESTED_ALPHABETICALLY
 
+    if compression_threads is None:
+        compression_threads = settings.RPM_METADATA_COMPRESSION_THREADS
+
+    if zchunk_metadata and not cr.HAS_ZCK:
+        raise ZchunkUnsupportedError()
+
     log.info(
         _("Publishing: repository={repo}, version={version}").format(
             repo=repository.name,
@@ -606,9 +794,31 @@ def publish(
             publication.compression_type = compression_type
             publication.layout = layout
             publication.repo_config = repo_config
+            publication.zchunk_metadata = zchunk_metadata
+            publication.arches = sorted(set(arches)) if arches is not None else None
+            publication.exclude_debuginfo = exclude_debuginfo
+            publication.exclude_source = exclude_source
+            publication.metadata_signing_service = metadata_signing_service
+            publication.content_fingerprint = content_fingerprint(repository_version)
+
+            source = None
+            if settings.RPM_PUBLISH_REUSE_METADATA:
+                source = find_reusable_publication(publication)
+            if source is not None:
+                reuse_publication(publication, source)
+                profile_checkpoint("reuse_publication")
+                log.info(
+                    _("Publication: {publication} created from {source}").format(
+                        publication=publication.pk, source=source.pk
+                    )
+                )
+                return RpmPublicationSerializer(
+                    instance=publication, context={"request": None}
+                ).data
 
             publication_data = PublicationData(publication, checksum_types)
             publication_data.populate()
+            profile_checkpoint("layout_artifacts")
 
             total_repos = 1 + len(publication_data.sub_repos)
             pb_data = dict(
@@ -628,7 +838,10 @@ def publish(
                     metadata_signing_service=metadata_signing_service,
                     compression_type=compression_type,
                     retained_packages=publication_data.packages,
+                    compression_threads=compression_threads,
+                    zchunk_metadata=zchunk_metadata,
                 )
+                profile_checkpoint("write_metadata")
                 publish_pb.increment()
 
                 for sub_repo in publication_data.sub_repos:
@@ -645,7 +858,10 @@ def publish(
                         metadata_signing_service=metadata_signing_service,
                         compression_type=compression_type,
                         retained_packages=packages,
+                        compression_threads=compression_threads,
+                        zchunk_metadata=zchunk_metadata,
                     )
+                    profile_checkpoint(f"write_metadata {name}")
                     publish_pb.increment()
 
             log.info(_("Publication: {publication} created").format(publication=publication.pk))
@@ -664,6 +880,8 @@ def generate_repo_metadata(
     metadata_signing_service=None,
     compression_type=COMPRESSION_TYPES.GZ,
     retained_packages: dict[UUID, PackageInfo] = {},
+    compression_threads=1,
+    zchunk_metadata=False,
 ):
     """
     Creates a repomd.xml file.
@@ -680,12 +898,12 @@ def generate_repo_metadata(
         retained_packages(dict):
             A dictionary of content_id to PackageInfo for packages that should actually be included
             in the repository metadata. Will be used to filter `content` and add additional info.
+        compression_threads(int): number of threads to compress metadata files with
+        zchunk_metadata(bool): whether to add zchunk variants of the metadata files
 
     """
     cwd = os.getcwd()
     repodata_path = REPODATA_PATH
-    has_modules = False
-    has_comps = False
     requested_checksum_type = get_checksum_type(checksum_types)
 
     if requested_checksum_type not in ALLOWED_CONTENT_CHECKSUMS:
@@ -695,6 +913,122 @@ def generate_repo_metadata(
         cwd = os.path.join(cwd, sub_folder)
         repodata_path = os.path.join(sub_folder, repodata_path)
 
+    repomd_path = os.path.join(repodata_path, "repomd.xml")
+
+    repomd = write_repo_metadata(
+        content,
+        publication.repository_version,
+        publication.checksum_type,
+        extra_repomdrecords,
+        cwd,
+        compression_type=compression_type,
+        retained_packages=retained_packages,
+        compression_threads=compression_threads,
+        zchunk_metadata=zchunk_metadata,
+    )
+
+    for record in repomd.records:
+        path = os.path.join(repodata_path, os.path.basename(record.location_href))
+        with open(path, "rb") as repodata_fd:
+            PublishedMetadata.create_from_file(
+                relative_path=path,
+                publication=publication,
+                file=File(repodata_fd),
+            )
+
+    if metadata_signing_service:
+        signing_service = AsciiArmoredDetachedSigningService.objects.get(
+            pk=metadata_signing_service
+        )
+        sign_results = signing_service.sign(repomd_path)
+
+        # https://github.com/pulp/pulp_rpm/issues/3526
+        signature_file_path = sign_results["signature"]
+        if os.stat(signature_file_path).st_size == 0:
+            log.error(f"{signature_file_path} is 0 bytes! sign_results: {sign_results}")
+            raise MetadataSigningError("Signature file is 0 bytes")
+
+        # publish a signed file
+        with open(sign_results["file"], "rb") as signed_file_fd:
+            PublishedMetadata.create_from_file(
+                relative_path=os.path.join(repodata_path, os.path.basename(sign_results["file"])),
+                publication=publication,
+                file=File(signed_file_fd),
+            )
+
+        # publish a detached signature
+        with open(sign_results["signature"], "rb") as signature_fd:
+            PublishedMetadata.create_from_file(
+                relative_path=os.path.join(
+                    repodata_path, os.path.basename(sign_results["signature"])
+                ),
+                publication=publication,
+                file=File(signature_fd),
+            )
+
+        # publish a public key required for further verification
+        pubkey_name = "repomd.xml.key"
+        with open(pubkey_name, "wb+") as f:
+            f.write(signing_service.public_key.encode("utf-8"))
+            f.flush()
+            # important! as the file has already been opened and used, it will be treated as a
+            # cursor and when calculating the checksum it will calculate the checksum of nothing.
+            f.seek(0)
+            PublishedMetadata.create_from_file(
+                relative_path=os.path.join(repodata_path, pubkey_name),
+                publication=publication,
+                file=File(f),
+            )
+    else:
+        with open(repomd_path, "rb") as repomd_fd:
+            PublishedMetadata.create_from_file(
+                relative_path=os.path.join(repodata_path, os.path.basename(repomd_path)),
+                publication=publication,
+                file=File(repomd_fd),
+            )
+
+
+def write_repo_metadata(
+    content,
+    repository_version,
+    checksum_type,
+    extra_repomdrecords,
+    path,
+    compression_type=COMPRESSION_TYPES.GZ,
+    retained_packages: dict[UUID, PackageInfo] = {},
+    compression_threads=1,
+    zchunk_metadata=False,
+):
+    """
+    Write the repodata of a content set to the filesystem.
+
+    Args:
+        content(app.models.Content): A DB Content set of all original artifacts in the repository.
+        repository_version(pulpcore.plugin.models.RepositoryVersion): the version content is from
+        checksum_type(pulp_rpm.app.constants.CHECKSUM_TYPES): checksum type of the metadata
+        extra_repomdrecords(list): list with data relative to repo metadata files
+        path(str): directory to create the "repodata" directory in
+        compression_type(pulp_rpm.app.constants.COMPRESSION_TYPES):
+            Compression type to use for metadata files.
+        retained_packages(dict):
+            A dictionary of content_id to PackageInfo for packages that should actually be included
+            in the repository metadata. Will be used to filter `content` and add additional info.
+        compression_threads(int):
+            When greater than 1, metadata files are written uncompressed and then compressed with
+            this many threads, instead of being compressed by createrepo_c while being written.
+        zchunk_metadata(bool):
+            Whether to add zchunk variants of the package and advisory metadata files. The packages
+            are then ordered by source package, so that the packages built together are close to
+            each other in the files and an update of a source package changes few chunks.
+
+    Returns:
+        createrepo_c.Repomd: the repomd that was written, listing every generated file.
+
+    """
+    repodata_path = os.path.join(path, REPODATA_PATH)
+    has_modules = False
+    has_comps = False
+
     # Prepare metadata files
     if compression_type == COMPRESSION_TYPES.ZSTD:
         cr_compression_type = cr.ZSTD
@@ -703,29 +1037,31 @@ def generate_repo_metadata(
     else:
         # Gzip is the default option & fallback should the value be something unexpected
         cr_compression_type = cr.GZ
+    compress_in_parallel = compression_threads > 1 and cr_compression_type != cr.NO_COMPRESSION
     total_packages = len(retained_packages)
 
     if RPM_METADATA_USE_REPO_PACKAGE_TIME:
         # gather the times the packages were added to the repo
         repo_content = (
             RepositoryContent.objects.filter(
-                repository=publication.repository,
-                version_added__number__lte=publication.repository_version.number,
+                repository=repository_version.repository,
+                version_added__number__lte=repository_version.number,
             )
-            .exclude(version_removed__number__lte=publication.repository_version.number)
+            .exclude(version_removed__number__lte=repository_version.number)
             .values_list("content", "pulp_created")
         )
         repo_pkg_times = {pk: created.timestamp() for pk, created in repo_content}
 
-    repomd_path = os.path.join(repodata_path, "repomd.xml")
     mod_yml_path = os.path.join(repodata_path, "modules.yaml")
     comps_xml_path = os.path.join(repodata_path, "comps.xml")
 
-    cr_checksum_type = cr_checksum_type_from_string(publication.checksum_type)
+    cr_checksum_type = cr_checksum_type_from_string(checksum_type)
 
     # Process all packages
     with cr.RepositoryWriter(
-        cwd, compression=cr_compression_type, checksum_type=cr_checksum_type
+        path,
+        compression=cr.NO_COMPRESSION if compress_in_parallel else cr_compression_type,
+        checksum_type=cr_checksum_type,
     ) as writer:
         writer.set_num_of_pkgs(total_packages)
 
@@ -733,8 +1069,12 @@ def generate_repo_metadata(
         # See: https://pulp.plan.io/issues/9402
         if not content.exists():
             writer.repomd.revision = "0"
+        package_order = ("rpm_sourcerpm", "name", "evr") if zchunk_metadata else ("name", "evr")
         for package in (
-            Package.objects.filter(pk__in=content).order_by("name", "evr").iterator(chunk_size=200)
+            Package.objects.filter(pk__in=content)
+            .select_related("changelog", "filelist")
+            .order_by(*package_order)
+            .iterator(chunk_size=200)
         ):
             if package.pk not in retained_packages:
                 continue
@@ -752,8 +1092,16 @@ def generate_repo_metadata(
             writer.add_pkg(pkg)
 
         # Process update records
-        update_records = UpdateRecord.objects.filter(pk__in=content).order_by("id", "digest")
-        for update_record in update_records.iterator():
+        update_records = (
+            UpdateRecord.objects.filter(pk__in=content)
+            .order_by("id", "digest")
+            .prefetch_related(
+                Prefetch("collections", UpdateCollection.objects.order_by("name", "pulp_id")),
+                Prefetch("collections__packages", UpdateCollectionPackage.objects.order_by("sum")),
+                Prefetch("references", UpdateReference.objects.order_by("href")),
+            )
+        )
+        for update_record in update_records.iterator(chunk_size=500):
             writer.add_update_record(update_record.to_createrepo_c())
 
         # Process modulemd, modulemd_defaults and obsoletes
@@ -820,62 +1168,100 @@ def generate_repo_metadata(
         for name, record in extra_repomdrecords:
             writer.add_repomd_metadata(name, record)
 
-    for record in writer.repomd.records:
-        path = os.path.join(repodata_path, os.path.basename(record.location_href))
-        with open(path, "rb") as repodata_fd:
-            PublishedMetadata.create_from_file(
-                relative_path=path,
-                publication=publication,
-                file=File(repodata_fd),
-            )
-
-    if metadata_signing_service:
-        signing_service = AsciiArmoredDetachedSigningService.objects.get(
-            pk=metadata_signing_service
+    if compress_in_parallel:
+        compress_repodata(
+            writer.repomd,
+            repodata_path,
+            COMPRESSED_RECORD_TYPES | {name for name, _ in extra_repomdrecords},
+            cr_compression_type,
+            cr_checksum_type,
+            compression_threads,
         )
-        sign_results = signing_service.sign(repomd_path)
 
-        # https://github.com/pulp/pulp_rpm/issues/3526
-        signature_file_path = sign_results["signature"]
-        if os.stat(signature_file_path).st_size == 0:
-            log.error(f"{signature_file_path} is 0 bytes! sign_results: {sign_results}")
-            raise MetadataSigningError("Signature file is 0 bytes")
+    if zchunk_metadata:
+        add_zchunk_records(writer.repomd, repodata_path, cr_checksum_type)
 
-        # publish a signed file
-        with open(sign_results["file"], "rb") as signed_file_fd:
-            PublishedMetadata.create_from_file(
-                relative_path=os.path.join(repodata_path, os.path.basename(sign_results["file"])),
-                publication=publication,
-                file=File(signed_file_fd),
-            )
+    return writer.repomd
 
-        # publish a detached signature
-        with open(sign_results["signature"], "rb") as signature_fd:
-            PublishedMetadata.create_from_file(
-                relative_path=os.path.join(
-                    repodata_path, os.path.basename(sign_results["signature"])
-                ),
-                publication=publication,
-                file=File(signature_fd),
-            )
 
-        # publish a public key required for further verification
-        pubkey_name = "repomd.xml.key"
-        with open(pubkey_name, "wb+") as f:
-            f.write(signing_service.public_key.encode("utf-8"))
-            f.flush()
-            # important! as the file has already been opened and used, it will be treated as a
-            # cursor and when calculating the checksum it will calculate the checksum of nothing.
-            f.seek(0)
-            PublishedMetadata.create_from_file(
-                relative_path=os.path.join(repodata_path, pubkey_name),
-                publication=publication,
-                file=File(f),
-            )
-    else:
-        with open(repomd_path, "rb") as repomd_fd:
-            PublishedMetadata.create_from_file(
-                relative_path=os.path.join(repodata_path, os.path.basename(repomd_path)),
-                publication=publication,
-                file=File(repomd_fd),
+def compress_repodata(
+    repomd, repodata_path, record_types, cr_compression_type, cr_checksum_type, threads
+):
+    """
+    Compress uncompressed repodata files with several threads and update repomd.xml.
+
+    The records are filled in again from the compressed files, so that their size, open-size and
+    checksums describe the files actually published.
+
+    Args:
+        repomd(createrepo_c.Repomd): the repomd the records of the files belong to
+        repodata_path(str): the directory containing repomd.xml and the files
+        record_types(set): the types of the records to compress
+        cr_compression_type: createrepo_c compression type to use (GZ or ZSTD)
+        cr_checksum_type: createrepo_c checksum type of the records
+        threads(int): number of threads to compress each file with
+
+    """
+    compression_type = (
+        COMPRESSION_TYPES.ZSTD if cr_compression_type == cr.ZSTD else COMPRESSION_TYPES.GZ
+    )
+    suffix = cr.compression_suffix(cr_compression_type)
+    for record in list(repomd.records):
+        if record.type not in record_types:
+            continue
+        uncompressed_path = os.path.join(repodata_path, os.path.basename(record.location_href))
+        # drop the checksum prefix of the uncompressed file, the record is renamed again below
+        filename = os.path.basename(uncompressed_path).removeprefix(f"{record.checksum}-")
+        compressed_path = os.path.join(repodata_path, filename + suffix)
+        parallel_compress_file(uncompressed_path, compressed_path, compression_type, threads)
+        os.remove(uncompressed_path)
+
+        compressed_record = cr.RepomdRecord(record.type, compressed_path)
+        compressed_record.fill(cr_checksum_type)
+        compressed_record.rename_file()
+        repomd.set_record(compressed_record)
+
+    with open(os.path.join(repodata_path, "repomd.xml"), "w") as repomd_xml:
+        repomd_xml.write(repomd.xml_dump())
+
+
+def add_zchunk_records(repomd, repodata_path, cr_checksum_type):
+    """
+    Add zchunk variants of the package and advisory metadata files and update repomd.xml.
+
+    Clients supporting zchunk, e.g. dnf, download the `<type>_zck` records instead of the others,
+    and only the chunks of them which they don't have from the previous version of the file.
+    zchunk splits the files into chunks by their content, so that the chunks of the packages which
+    did not change are the same across publications.
+
+    Args:
+        repomd(createrepo_c.Repomd): the repomd the records of the files belong to
+        repodata_path(str): the directory containing repomd.xml and the files
+        cr_checksum_type: createrepo_c checksum type of the records
+
+    """
+    if not cr.HAS_ZCK:
+        raise ZchunkUnsupportedError()
+    suffix = cr.compression_suffix(cr.ZCK_COMPRESSION)
+    with tempfile.TemporaryDirectory(dir=".") as working_dir:
+        for record in list(repomd.records):
+            if record.type not in COMPRESSED_RECORD_TYPES:
+                continue
+            path = os.path.join(repodata_path, os.path.basename(record.location_href))
+            xml_path = os.path.join(working_dir, f"{record.type}.xml")
+            cr.decompress_file(path, xml_path, cr.AUTO_DETECT_COMPRESSION)
+            # Unlike compress_file(), which writes a single chunk, this enables the automatic
+            # content-defined chunking of zchunk. It writes the file next to the source.
+            cr.RepomdRecord(record.type, xml_path).compress_and_fill(
+                cr_checksum_type, cr.ZCK_COMPRESSION
             )
+            zck_path = os.path.join(repodata_path, f"{record.type}.xml{suffix}")
+            shutil.move(f"{xml_path}{suffix}", zck_path)
+
+            zck_record = cr.RepomdRecord(f"{record.type}_zck", zck_path)
+            zck_record.fill(cr_checksum_type)
+            zck_record.rename_file()
+            repomd.set_record(zck_record)
+
+    with open(os.path.join(repodata_path, "repomd.xml"), "w") as repomd_xml:
+        repomd_xml.write(repomd.xml_dump())
@@ -18,7 +18,7 @@ from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.files import File
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from rpm_rs import Evr
 
 from pulpcore.plugin.exceptions import SyncError
@@ -29,6 +29,7 @@ from pulpcore.plugin.models import (
     PublishedArtifact,
     PublishedMetadata,
     Remote,
+    RemoteArtifact,
 )
 from pulpcore.plugin.stages import (
     ACSArtifactHandler,
@@ -47,6 +48,7 @@ from pulpcore.plugin.stages import (
 from pulpcore.plugin.util import get_domain
 
 from pulp_rpm.app.advisory import hash_update_record
+from pulp_rpm.app.bulk_insert import copy_insert_content_artifacts, copy_insert_packages
 from pulp_rpm.app.comps import dict_digest, strdict_to_dict
 from pulp_rpm.app.constants import (
     CHECKSUM_TYPES,
@@ -91,11 +93,14 @@ from pulp_rpm.app.models import (
     Variant,
 )
 from pulp_rpm.app.modulemd import parse_modular
+from pulp_rpm.app.profiling import profile_checkpoint, profiled
 from pulp_rpm.app.shared_utils import (
+    attach_task_artifact,
     get_sha256,
     is_previous_version,
     urlpath_sanitize,
 )
+from pulp_rpm.app.stage_metrics import PipelineMetrics, phase
 
 log = logging.getLogger(__name__)
 
@@ -313,6 +318,46 @@ def fetch_remote_url(remote, custom_url=None):
         raise RemoteFetchError(url, exc.status, exc.message)
 
 
+def make_sync_details(
+    remote,
+    repository,
+    most_recent_version,
+    sync_policy,
+    skip_types,
+    revision,
+    repomd_checksum,
+    treeinfo_checksum,
+):
+    """
+    Collect the details of a sync, which are compared with those of the next sync.
+
+    Args:
+        remote (RpmRemote or UlnRemote): The remote synced from.
+        repository (RpmRepository): The repository synced.
+        most_recent_version (int): The number of the latest version of the repository.
+        sync_policy (str): How the sync is performed.
+        skip_types (list): The content types skipped.
+        revision (str): The revision of repomd.xml.
+        repomd_checksum (str): The sha256 of repomd.xml.
+        treeinfo_checksum (str): The sha256 of the treeinfo file, if any.
+
+    Returns:
+        dict: The details, see `should_optimize_sync()`.
+
+    """
+    return {
+        "url": remote.url,  # use the original remote url so that mirrorlists are optimizable
+        "download_policy": remote.policy,
+        "sync_policy": sync_policy,
+        "most_recent_version": most_recent_version,
+        "revision": revision,
+        "repomd_checksum": repomd_checksum,
+        "treeinfo_checksum": treeinfo_checksum,
+        "retain_package_versions": repository.retain_package_versions,
+        "skip_types": sorted(skip_types),
+    }
+
+
 def should_optimize_sync(sync_details, last_sync_details):
     """
     Check whether the sync should be optimized by comparing its parameters with the previous sync.
@@ -360,6 +405,101 @@ def should_optimize_sync(sync_details, last_sync_details):
     return True
 
 
+def find_synced_version(repository, sync_details):
+    """
+    Find a repository version another repository synced from the same upstream metadata.
+
+    The version must have been created by a mirror sync with the same skip_types and retention,
+    so that its content is exactly what syncing the upstream metadata would result in. Content
+    that must be downloaded immediately is only reused from a sync that downloaded it.
+
+    Args:
+        repository (RpmRepository): The repository being synced.
+        sync_details (dict): The details of the sync, see `synchronize()`.
+
+    Returns:
+        pulpcore.plugin.models.RepositoryVersion: The version, or None.
+
+    """
+    candidates = (
+        RpmRepository.objects.filter(
+            pulp_domain=repository.pulp_domain,
+            last_sync_details__repomd_checksum=sync_details["repomd_checksum"],
+            last_sync_details__treeinfo_checksum=sync_details["treeinfo_checksum"],
+            last_sync_details__skip_types=sync_details["skip_types"],
+            last_sync_details__retain_package_versions=sync_details["retain_package_versions"],
+            last_sync_details__sync_policy__in=[
+                SYNC_POLICIES.MIRROR_CONTENT_ONLY,
+                SYNC_POLICIES.MIRROR_COMPLETE,
+            ],
+        )
+        .exclude(pk=repository.pk)
+        .order_by("-pulp_last_updated")
+    )
+    if sync_details["download_policy"] == Remote.IMMEDIATE:
+        candidates = candidates.filter(last_sync_details__download_policy=Remote.IMMEDIATE)
+    for candidate in candidates[:10]:
+        version = candidate.versions.filter(
+            number=candidate.last_sync_details["most_recent_version"], complete=True
+        ).first()
+        if version is not None:
+            return version
+    return None
+
+
+def reuse_synced_version(repository, remote, url, source_version, mirror):
+    """
+    Create a new repository version from the content another repository synced.
+
+    The remote artifacts of the on-demand content are added for `remote`, so that the content
+    can be downloaded through the remote of the repository.
+
+    Args:
+        repository (RpmRepository): The repository being synced.
+        remote (RpmRemote): The remote of the sync.
+        url (str): The url the repository would be synced from.
+        source_version (pulpcore.plugin.models.RepositoryVersion): The synced version to reuse,
+            see `find_synced_version()`.
+        mirror (bool): Replace the content of the repository rather than add to it.
+
+    Returns:
+        pulpcore.plugin.models.RepositoryVersion: The new version, or the latest version if
+            nothing changed.
+
+    """
+    source_url = source_version.repository.cast().last_sync_details["url"]
+    fields = ("content_artifact_id", "url", "size", *Artifact.DIGEST_FIELDS)
+    remote_artifacts = (
+        RemoteArtifact.objects.filter(
+            content_artifact__content__in=source_version.content,
+            content_artifact__artifact__isnull=True,
+        )
+        .order_by("content_artifact")
+        .distinct("content_artifact")
+        .values(*fields)
+    )
+    batch = []
+    for remote_artifact in remote_artifacts.iterator(chunk_size=2000):
+        if remote_artifact["url"].startswith(source_url):
+            remote_artifact["url"] = urlpath_sanitize(
+                url, remote_artifact["url"][len(source_url) :]
+            )
+        batch.append(RemoteArtifact(remote=remote, **remote_artifact))
+        if len(batch) >= 2000:
+            RemoteArtifact.objects.bulk_create(batch, ignore_conflicts=True)
+            batch.clear()
+    RemoteArtifact.objects.bulk_create(batch, ignore_conflicts=True)
+
+    with repository.new_version() as new_version:
+        if mirror:
+            new_version.remove_content(
+                new_version.content.exclude(pk__in=source_version.content.values("pk"))
+            )
+        new_version.add_content(source_version.content)
+    return repository.latest_version()
+
+
+@profiled
 def synchronize(remote_pk, repository_pk, sync_policy, skip_types, optimize, url=None, **kwargs):
     """
     Sync content from the remote repository.
@@ -469,16 +609,16 @@ def synchronize(remote_pk, repository_pk, sync_policy, skip_types, optimize, url
             treeinfo_file_data = get_treeinfo_data(remote, url)
             treeinfo_checksum = treeinfo_file_data.get("hash", "")
 
-        return {
-            "url": remote.url,  # use the original remote url so that mirrorlists are optimizable
-            "download_policy": remote.policy,
-            "sync_policy": sync_policy,
-            "most_recent_version": version.number,
-            "revision": repomd.revision,
-            "repomd_checksum": repomd_checksum,
-            "treeinfo_checksum": treeinfo_checksum,
-            "retain_package_versions": repository.retain_package_versions,
-        }
+        return make_sync_details(
+            remote,
+            repository,
+            version.number,
+            sync_policy,
+            skip_types,
+            repomd.revision,
+            repomd_checksum,
+            treeinfo_checksum,
+        )
 
     mirror = sync_policy.startswith("mirror")
     mirror_metadata = sync_policy == SYNC_POLICIES.MIRROR_COMPLETE
@@ -548,7 +688,9 @@ def synchronize(remote_pk, repository_pk, sync_policy, skip_types, optimize, url
             return
 
         skipped_syncs = 0
+        reused_syncs = 0
         repo_sync_results = {}
+        pipeline_metrics = []
 
         # If some repos need to be synced and others do not, we go through them all
         # items() returns in insertion-order - make sure PRIMARY is the LAST thing we process
@@ -562,6 +704,26 @@ def synchronize(remote_pk, repository_pk, sync_policy, skip_types, optimize, url
                 repo_sync_results[directory] = repo.latest_version()
                 continue
 
+            # Distribution trees refer to the sub-repos of their repository, they cannot be shared
+            if settings.RPM_SYNC_REUSE_CONTENT and not mirror_metadata and not treeinfo:
+                source_version = find_synced_version(repo, repo_config["sync_details"])
+                if source_version is not None:
+                    log.info(
+                        _("Reusing the content of {version} synced from the same metadata").format(
+                            version=source_version
+                        )
+                    )
+                    repo_version = reuse_synced_version(
+                        repo, remote, repo_config["url"], source_version, mirror
+                    )
+                    profile_checkpoint(f"reuse_content {directory}".rstrip())
+                    repo_config["sync_details"]["most_recent_version"] = repo_version.number
+                    repo.last_sync_details = repo_config["sync_details"]
+                    repo.save()
+                    repo_sync_results[directory] = repo_version
+                    reused_syncs += 1
+                    continue
+
             stage = RpmFirstStage(
                 remote,
                 repo,
@@ -573,8 +735,18 @@ def synchronize(remote_pk, repository_pk, sync_policy, skip_types, optimize, url
                 namespace=directory,
             )
 
-            dv = RpmDeclarativeVersion(first_stage=stage, repository=repo, mirror=mirror)
+            dv = RpmDeclarativeVersion(
+                first_stage=stage,
+                repository=repo,
+                mirror=mirror,
+                pipeline_metrics=(
+                    PipelineMetrics(directory) if settings.RPM_SYNC_STAGE_METRICS else None
+                ),
+            )
             repo_version = dv.create() or repo.latest_version()
+            profile_checkpoint(f"save_and_finalize {directory}".rstrip())
+            if dv.pipeline_metrics:
+                pipeline_metrics.append(dv.pipeline_metrics.as_dict())
 
             repo_config["sync_details"]["most_recent_version"] = repo_version.number
             repo.last_sync_details = repo_config["sync_details"]
@@ -589,6 +761,19 @@ def synchronize(remote_pk, repository_pk, sync_policy, skip_types, optimize, url
             pb.done = skipped_syncs
             pb.total = len(repo_sync_config)
 
+    if reused_syncs:
+        with ProgressReport(
+            message="Reusing content synced from the same metadata by another repository",
+            code="sync.reused_content",
+        ) as pb:
+            pb.done = reused_syncs
+            pb.total = len(repo_sync_config)
+
+    if pipeline_metrics:
+        with open("rpm_sync_stage_metrics.json", "w") as metrics_file:
+            json.dump({"pipelines": pipeline_metrics}, metrics_file, indent=2)
+        attach_task_artifact("rpm_sync_stage_metrics.json", "rpm_sync_stage_metrics")
+
     if mirror_metadata:
         with RpmPublication.create(
             repo_sync_results[PRIMARY_REPO], pass_through=False
@@ -627,14 +812,26 @@ class RpmDeclarativeVersion(DeclarativeVersion):
     Subclassed Declarative version creates a custom pipeline for RPM sync.
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, pipeline_metrics=None, **kwargs):
         """
         Adding support for ACS.
 
         Adding it here, because we call RpmDeclarativeVersion multiple times in sync.
+
+        Keyword Args:
+            pipeline_metrics (PipelineMetrics): Measure the stages of the pipeline into this,
+                see `pulp_rpm.app.stage_metrics`.
         """
         kwargs["acs"] = True
         super().__init__(*args, **kwargs)
+        self.pipeline_metrics = pipeline_metrics
+
+    def create(self):
+        """Create the new repository version, measuring the pipeline if requested."""
+        if self.pipeline_metrics is None:
+            return super().create()
+        with self.pipeline_metrics.collect():
+            return super().create()
 
     def pipeline_stages(self, new_version):
         """
@@ -668,6 +865,8 @@ class RpmDeclarativeVersion(DeclarativeVersion):
                 RemoteArtifactSaver(fix_mismatched_remote_artifacts=True),
             ]
         )
+        if self.pipeline_metrics is not None:
+            self.pipeline_metrics.instrument(pipeline)
         return pipeline
 
 
@@ -750,150 +949,158 @@ class RpmFirstStage(Stage):
         cr.xml_parse_updateinfo(updateinfo_xml_path, uinfo)
         return uinfo.updates
 
-    async def run(self):
-        """Build `DeclarativeContent` from the repodata."""
-        with tempfile.TemporaryDirectory(dir="."):
-            progress_data = dict(
-                message="Downloading Metadata Files", code="sync.downloading.metadata"
+    async def download_metadata(self):
+        """
+        Download repomd.xml and the metadata files it lists.
+
+        Returns:
+            tuple: The parsed :obj:`createrepo_c.Repomd` and the download results of the
+                metadata files by their type.
+
+        """
+        progress_data = dict(message="Downloading Metadata Files", code="sync.downloading.metadata")
+        async with ProgressReport(**progress_data) as metadata_pb:
+            # download repomd.xml
+            downloader = self.remote.get_downloader(
+                url=urlpath_sanitize(self.remote_url, "repodata/repomd.xml")
             )
-            async with ProgressReport(**progress_data) as metadata_pb:
-                # download repomd.xml
-                downloader = self.remote.get_downloader(
-                    url=urlpath_sanitize(self.remote_url, "repodata/repomd.xml")
-                )
-                result = await downloader.run()
-                store_metadata_for_mirroring(self.repository, result.path, "repodata/repomd.xml")
-                await metadata_pb.aincrement()
-
-                repomd_path = result.path
-                repomd = cr.Repomd(repomd_path)
-
-                if repomd.warnings:
-                    for warn_type, warn_msg in repomd.warnings:
-                        log.warn(warn_msg)
-                    msg = (
-                        "Problems encountered parsing repomd.xml - proxy used: {}, url: {}".format(
-                            self.remote.proxy_url,
-                            result.url,
-                        )
-                    )
-                    log.warn(msg)
+            result = await downloader.run()
+            store_metadata_for_mirroring(self.repository, result.path, "repodata/repomd.xml")
+            await metadata_pb.aincrement()
 
-                checksum_types = {}
-                repomd_downloaders = {}
-                repomd_files = {}
+            repomd_path = result.path
+            repomd = cr.Repomd(repomd_path)
 
-                types_to_download = (
-                    set(PACKAGE_REPODATA)
-                    | set(UPDATE_REPODATA)
-                    | set(COMPS_REPODATA)
-                    | set(MODULAR_REPODATA)
+            if repomd.warnings:
+                for warn_type, warn_msg in repomd.warnings:
+                    log.warn(warn_msg)
+                msg = "Problems encountered parsing repomd.xml - proxy used: {}, url: {}".format(
+                    self.remote.proxy_url,
+                    result.url,
                 )
+                log.warn(msg)
 
-                async def run_repomdrecord_download(name, location_href, downloader):
-                    result = await downloader.run()
-                    return name, location_href, result
+            checksum_types = {}
+            repomd_downloaders = {}
+            repomd_files = {}
 
-                for record in repomd.records:
-                    record_checksum_type = getattr(CHECKSUM_TYPES, record.checksum_type.upper())
-                    checksum_types[record.type] = record_checksum_type
-                    record.checksum_type = record_checksum_type
+            types_to_download = (
+                set(PACKAGE_REPODATA)
+                | set(UPDATE_REPODATA)
+                | set(COMPS_REPODATA)
+                | set(MODULAR_REPODATA)
+            )
 
-                    if self.mirror_metadata:
-                        uses_base_url = record.location_base
-                        illegal_relative_path = self.is_illegal_relative_path(record.location_href)
+            async def run_repomdrecord_download(name, location_href, downloader):
+                result = await downloader.run()
+                return name, location_href, result
 
-                        if (
-                            uses_base_url
-                            or illegal_relative_path
-                            or record.type in RepoMetadataFile.UNSUPPORTED_METADATA
-                        ):
-                            raise MirrorIncompatibleRepositoryError()
+            for record in repomd.records:
+                record_checksum_type = getattr(CHECKSUM_TYPES, record.checksum_type.upper())
+                checksum_types[record.type] = record_checksum_type
+                record.checksum_type = record_checksum_type
 
-                    if not self.mirror_metadata and record.type not in types_to_download:
-                        continue
+                if self.mirror_metadata:
+                    uses_base_url = record.location_base
+                    illegal_relative_path = self.is_illegal_relative_path(record.location_href)
 
-                    base_url = record.location_base or self.remote_url
-                    downloader = self.remote.get_downloader(
-                        url=urlpath_sanitize(base_url, record.location_href),
-                        expected_size=record.size,
-                        expected_digests={record_checksum_type: record.checksum},
-                    )
-                    repomd_downloaders[record.type] = asyncio.ensure_future(
-                        run_repomdrecord_download(record.type, record.location_href, downloader)
-                    )
+                    if (
+                        uses_base_url
+                        or illegal_relative_path
+                        or record.type in RepoMetadataFile.UNSUPPORTED_METADATA
+                    ):
+                        raise MirrorIncompatibleRepositoryError()
 
-                try:
-                    for future in asyncio.as_completed(list(repomd_downloaders.values())):
-                        name, location_href, result = await future
-                        store_metadata_for_mirroring(self.repository, result.path, location_href)
-                        repomd_files[name] = result
-                        await metadata_pb.aincrement()
-                except ClientResponseError as exc:
-                    raise RemoteFetchError(
-                        url=str(exc.request_info.url),
-                        status=exc.status,
-                        message=exc.message,
-                    )
-                except FileNotFoundError:
-                    raise
+                if not self.mirror_metadata and record.type not in types_to_download:
+                    continue
 
-                if self.mirror_metadata:
-                    # optional signature and key files for repomd metadata
-                    for file_href in ["repodata/repomd.xml.asc", "repodata/repomd.xml.key"]:
-                        try:
-                            downloader = self.remote.get_downloader(
-                                url=urlpath_sanitize(self.remote_url, file_href),
-                                silence_errors_for_response_status_codes={403, 404},
-                            )
-                            result = await downloader.run()
-                            store_metadata_for_mirroring(self.repository, result.path, file_href)
-                            await metadata_pb.aincrement()
-                        except (ClientResponseError, FileNotFoundError):
-                            pass
-
-                    # extra files to copy, e.g. EULA, LICENSE
+                base_url = record.location_base or self.remote_url
+                downloader = self.remote.get_downloader(
+                    url=urlpath_sanitize(base_url, record.location_href),
+                    expected_size=record.size,
+                    expected_digests={record_checksum_type: record.checksum},
+                )
+                repomd_downloaders[record.type] = asyncio.ensure_future(
+                    run_repomdrecord_download(record.type, record.location_href, downloader)
+                )
+
+            try:
+                for future in asyncio.as_completed(list(repomd_downloaders.values())):
+                    name, location_href, result = await future
+                    store_metadata_for_mirroring(self.repository, result.path, location_href)
+                    repomd_files[name] = result
+                    await metadata_pb.aincrement()
+            except ClientResponseError as exc:
+                raise RemoteFetchError(
+                    url=str(exc.request_info.url),
+                    status=exc.status,
+                    message=exc.message,
+                )
+            except FileNotFoundError:
+                raise
+
+            if self.mirror_metadata:
+                # optional signature and key files for repomd metadata
+                for file_href in ["repodata/repomd.xml.asc", "repodata/repomd.xml.key"]:
                     try:
                         downloader = self.remote.get_downloader(
-                            url=urlpath_sanitize(self.remote_url, "extra_files.json"),
+                            url=urlpath_sanitize(self.remote_url, file_href),
                             silence_errors_for_response_status_codes={403, 404},
                         )
                         result = await downloader.run()
-                        store_metadata_for_mirroring(
-                            self.repository, result.path, "extra_files.json"
-                        )
+                        store_metadata_for_mirroring(self.repository, result.path, file_href)
                         await metadata_pb.aincrement()
                     except (ClientResponseError, FileNotFoundError):
                         pass
-                    else:
-                        try:
-                            with open(result.path, "r") as f:
-                                extra_files = json.loads(f.read())
-                                for data in extra_files["data"]:
-                                    filtered_checksums = {
-                                        digest: value
-                                        for digest, value in data["checksums"].items()
-                                        if digest in ALLOWED_CONTENT_CHECKSUMS
-                                    }
-                                    downloader = self.remote.get_downloader(
-                                        url=urlpath_sanitize(self.remote_url, data["file"]),
-                                        expected_size=data["size"],
-                                        expected_digests=filtered_checksums,
-                                    )
-                                    result = await downloader.run()
-                                    store_metadata_for_mirroring(
-                                        self.repository, result.path, data["file"]
-                                    )
-                                    await metadata_pb.aincrement()
-                        except ClientResponseError as exc:
-                            raise RemoteFetchError(
-                                url=str(exc.request_info.url),
-                                status=exc.status,
-                                message=exc.message,
-                            )
-                        except FileNotFoundError:
-                            raise
 
+                # extra files to copy, e.g. EULA, LICENSE
+                try:
+                    downloader = self.remote.get_downloader(
+                        url=urlpath_sanitize(self.remote_url, "extra_files.json"),
+                        silence_errors_for_response_status_codes={403, 404},
+                    )
+                    result = await downloader.run()
+                    store_metadata_for_mirroring(self.repository, result.path, "extra_files.json")
+                    await metadata_pb.aincrement()
+                except (ClientResponseError, FileNotFoundError):
+                    pass
+                else:
+                    try:
+                        with open(result.path, "r") as f:
+                            extra_files = json.loads(f.read())
+                            for data in extra_files["data"]:
+                                filtered_checksums = {
+                                    digest: value
+                                    for digest, value in data["checksums"].items()
+                                    if digest in ALLOWED_CONTENT_CHECKSUMS
+                                }
+                                downloader = self.remote.get_downloader(
+                                    url=urlpath_sanitize(self.remote_url, data["file"]),
+                                    expected_size=data["size"],
+                                    expected_digests=filtered_checksums,
+                                )
+                                result = await downloader.run()
+                                store_metadata_for_mirroring(
+                                    self.repository, result.path, data["file"]
+                                )
+                                await metadata_pb.aincrement()
+                    except ClientResponseError as exc:
+                        raise RemoteFetchError(
+                            url=str(exc.request_info.url),
+                            status=exc.status,
+                            message=exc.message,
+                        )
+                    except FileNotFoundError:
+                        raise
+
+        return repomd, repomd_files
+
+    async def run(self):
+        """Build `DeclarativeContent` from the repodata."""
+        with tempfile.TemporaryDirectory(dir="."):
+            with phase("download_metadata"):
+                repomd, repomd_files = await self.download_metadata()
+            profile_checkpoint(f"download_metadata {self.namespace}".rstrip())
             await self.parse_repository_metadata(repomd, repomd_files)
 
     async def parse_distribution_tree(self):
@@ -952,24 +1159,29 @@ class RpmFirstStage(Stage):
             # can't be flagged as 'modular' thus broken repository!
             if modulemd_result.url.endswith("zck"):
                 raise UnsupportedModularCompressionError("zck")
-            modulemd_dcs, modulemd_list = await self.parse_modules_metadata(modulemd_result)
+            with phase("parse_modules"):
+                modulemd_dcs, modulemd_list = await self.parse_modules_metadata(modulemd_result)
 
         # **Now** we can successfully parse package-metadata
-        await self.parse_packages(
-            metadata_results.get("primary"),
-            metadata_results.get("filelists"),
-            metadata_results.get("other"),
-            modulemd_list=modulemd_list,
-        )
+        with phase("parse_packages"):
+            await self.parse_packages(
+                metadata_results.get("primary"),
+                metadata_results.get("filelists"),
+                metadata_results.get("other"),
+                modulemd_list=modulemd_list,
+            )
 
         groups_list = []
         comps_result = metadata_results.get("group", None)
         if comps_result:
-            groups_list = await self.parse_packages_components(comps_result)
+            with phase("parse_comps"):
+                groups_list = await self.parse_packages_components(comps_result)
 
         updateinfo_result = metadata_results.get("updateinfo", None)
         if updateinfo_result:
-            await self.parse_advisories(updateinfo_result)
+            with phase("parse_advisories"):
+                await self.parse_advisories(updateinfo_result)
+        profile_checkpoint(f"parse_metadata {self.namespace}".rstrip())
 
         # now send modules and groups down the pipeline since all relations have been set up
         for modulemd_dc in modulemd_dcs:
@@ -1613,6 +1825,82 @@ class RpmContentSaver(ContentSaver):
     the UpdateRecord content unit.
     """
 
+    async def batches(self, minsize=500, flush_event=None):
+        """
+        Insert the new packages of each batch, and hand the rest of it to ContentSaver.
+
+        The inserted packages are passed on to the next stage directly. ContentSaver would treat
+        them as saved before, and look up and update the ContentArtifacts just inserted.
+        With ``RPM_BULK_INSERT_PACKAGES`` disabled, ContentSaver saves the whole batch.
+        """
+        async for batch in super().batches(minsize=minsize, flush_event=flush_event):
+            if not settings.RPM_BULK_INSERT_PACKAGES:
+                yield batch
+                continue
+            inserted = await sync_to_async(self._insert_new_packages)(batch)
+            for d_content in inserted:
+                await self.put(d_content)
+            inserted_ids = {id(d_content) for d_content in inserted}
+            batch = [d_content for d_content in batch if id(d_content) not in inserted_ids]
+            if batch:
+                yield batch
+
+    @phase("insert_packages")
+    def _insert_new_packages(self, batch):
+        """
+        Insert the new packages of a batch and their ContentArtifacts with COPY.
+
+        The rows are streamed into the database at once instead of being saved one by one by
+        ContentSaver. Packages which already exist, e.g. because a concurrent sync saved them
+        first, are replaced by the existing ones and left to ContentSaver, the same as when
+        saving them fails on a unique constraint.
+
+        Args:
+            batch (list of :class:`~pulpcore.plugin.stages.DeclarativeContent`): The batch of
+                :class:`~pulpcore.plugin.stages.DeclarativeContent` objects to be saved.
+
+        Returns:
+            list: The :class:`~pulpcore.plugin.stages.DeclarativeContent` of the inserted packages.
+
+        """
+        new_packages = [
+            declarative_content
+            for declarative_content in batch
+            if isinstance(declarative_content.content, Package)
+            and declarative_content.content._state.adding
+        ]
+        if not new_packages:
+            return []
+        # Insert in natural key order to prevent deadlocks with concurrent syncs
+        new_packages.sort(key=lambda d_content: "".join(map(str, d_content.content.natural_key())))
+        with transaction.atomic():
+            if settings.RPM_DEDUPLICATE_PACKAGE_METADATA:
+                Package.deduplicate_metadata([d_content.content for d_content in new_packages])
+            copy_insert_packages([d_content.content for d_content in new_packages])
+
+            inserted = []
+            content_artifacts = []
+            for d_content in new_packages:
+                if d_content.content._state.adding:
+                    d_content.content = Package.objects.get(d_content.content.q())
+                    continue
+                inserted.append(d_content)
+                for d_artifact in d_content.d_artifacts:
+                    content_artifacts.append(
+                        ContentArtifact(
+                            content=d_content.content,
+                            # None for on-demand synced artifacts
+                            artifact=None
+                            if d_artifact.artifact._state.adding
+                            else d_artifact.artifact,
+                            relative_path=d_artifact.relative_path,
+                        )
+                    )
+            content_artifacts.sort(key=ContentArtifact.sort_key)
+            copy_insert_content_artifacts(content_artifacts)
+        return inserted
+
+    @phase("post_save")
     def _post_save(self, batch):
         """
         Save a batch of UpdateCollection, UpdateCollectionPackage, UpdateReference objects.
@@ -1678,6 +1966,24 @@ class RpmContentSaver(ContentSaver):
         update_collection_packages_to_save = []
         seen_updaterecords = []
 
+        # existing content which was retrieved from the db at earlier stages has its relations
+        update_record_pks = [
+            declarative_content.content.pk
+            for declarative_content in batch
+            if declarative_content is not None
+            and isinstance(declarative_content.content, UpdateRecord)
+        ]
+        update_records_with_relations = set()
+        if update_record_pks:
+            update_records_with_relations = set(
+                UpdateRecord.objects.filter(pk__in=update_record_pks)
+                .filter(
+                    Exists(UpdateCollection.objects.filter(update_record=OuterRef("pk")))
+                    | Exists(UpdateReference.objects.filter(update_record=OuterRef("pk")))
+                )
+                .values_list("pk", flat=True)
+            )
+
         for declarative_content in batch:
             if declarative_content is None:
                 continue
@@ -1687,12 +1993,7 @@ class RpmContentSaver(ContentSaver):
                 continue
             elif isinstance(declarative_content.content, UpdateRecord):
                 update_record = declarative_content.content
-
-                relations_exist = (
-                    update_record.collections.count() or update_record.references.count()
-                )
-                if relations_exist:
-                    # existing content which was retrieved from the db at earlier stages
+                if update_record.pk in update_records_with_relations:
                     continue
 
                 # if there are same update_records in a batch, the relations to the references
@@ -3,7 +3,13 @@ from django.urls import path
 
 from pulpcore.plugin.find_url import find_api_root
 
-from .viewsets import CompsXmlViewSet, CopyViewSet, PrunePackagesViewSet
+from .viewsets import (
+    ApplicabilityViewSet,
+    CompsXmlViewSet,
+    CopyViewSet,
+    FreshnessCheckViewSet,
+    PrunePackagesViewSet,
+)
 
 if getattr(settings, "ENABLE_V4_API", None):
     VERSION = "<str:version>"
@@ -15,4 +21,9 @@ urlpatterns = [
     path(f"{API_ROOT}rpm/copy/", CopyViewSet.as_view({"post": "create"})),
     path(f"{API_ROOT}rpm/comps/", CompsXmlViewSet.as_view({"post": "create"})),
     path(f"{API_ROOT}rpm/prune/", PrunePackagesViewSet.as_view({"post": "prune_packages"})),
+    path(
+        f"{API_ROOT}rpm/freshness_check/",
+        FreshnessCheckViewSet.as_view({"post": "check_freshness"}),
+    ),
+    path(f"{API_ROOT}rpm/applicability/", ApplicabilityViewSet.as_view({"post": "create"})),
 ]
@@ -1,5 +1,5 @@
 from .acs import RpmAlternateContentSourceViewSet  # noqa
-from .advisory import UpdateRecordViewSet  # noqa
+from .advisory import ApplicabilityViewSet, UpdateRecordViewSet  # noqa
 from .comps import (  # noqa
     CompsXmlViewSet,
     PackageGroupViewSet,
@@ -12,6 +12,7 @@ from .distribution import DistributionTreeViewSet  # noqa
 from .modulemd import ModulemdViewSet, ModulemdDefaultsViewSet, ModulemdObsoleteViewSet  # noqa
 from .package import PackageViewSet  # noqa
 from .prune import PrunePackagesViewSet  # noqa
+from .freshness import FreshnessCheckViewSet  # noqa
 from .repository import (  # noqa
     RpmRepositoryViewSet,
     RpmRepositoryVersionViewSet,
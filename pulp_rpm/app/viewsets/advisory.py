@@ -1,15 +1,24 @@
+from drf_spectacular.utils import extend_schema
+from rest_framework import viewsets
+from rest_framework.response import Response
+
+from pulpcore.plugin.util import get_url
 from pulpcore.plugin.viewsets import (
     ContentFilter,
     NoArtifactContentUploadViewSet,
 )
 
+from pulp_rpm.app.advisory import find_applicable_advisories
 from pulp_rpm.app.models import (
     UpdateRecord,
 )
 from pulp_rpm.app.serializers import (
+    ApplicabilityResultSerializer,
+    ApplicabilitySerializer,
     MinimalUpdateRecordSerializer,
     UpdateRecordSerializer,
 )
+from pulp_rpm.app.shared_utils import format_nevra
 
 
 class UpdateRecordFilter(ContentFilter):
@@ -72,3 +81,69 @@ class UpdateRecordViewSet(NoArtifactContentUploadViewSet):
         ],
         "queryset_scoping": {"function": "scope_queryset"},
     }
+
+
+class ApplicabilityViewSet(viewsets.ViewSet):
+    """
+    ViewSet for finding the advisories applicable to hosts.
+    """
+
+    serializer_class = ApplicabilitySerializer
+
+    DEFAULT_ACCESS_POLICY = {
+        "statements": [
+            {
+                "action": ["create"],
+                "principal": "authenticated",
+                "effect": "allow",
+                "condition": [
+                    "has_repo_or_repo_ver_param_model_or_domain_or_obj_perms:"
+                    "rpm.view_rpmrepository",
+                ],
+            },
+        ],
+    }
+
+    @extend_schema(
+        description="Find the advisories of a repository version which apply to the packages "
+        "installed on one or more hosts, and the packages of the advisories to upgrade to.",
+        summary="Find applicable advisories",
+        operation_id="rpm_applicability",
+        request=ApplicabilitySerializer,
+        responses={200: ApplicabilityResultSerializer(many=True)},
+    )
+    def create(self, request, **kwargs):
+        """Find applicable advisories."""
+        serializer = ApplicabilitySerializer(data=request.data, context={"request": request})
+        serializer.is_valid(raise_exception=True)
+
+        hosts = {host["name"]: host["packages"] for host in serializer.validated_data["hosts"]}
+        applicable = find_applicable_advisories(
+            serializer.validated_data["repository_version"], hosts
+        )
+        advisory_pks = {pk for advisories in applicable.values() for pk in advisories}
+        advisories = UpdateRecord.objects.filter(pk__in=advisory_pks).only(
+            "pk", "pulp_type", "id", "type", "severity"
+        )
+        advisories = {advisory.pk: advisory for advisory in advisories}
+
+        results = []
+        for host, host_advisories in applicable.items():
+            results.append(
+                {
+                    "name": host,
+                    "advisories": [
+                        {
+                            "pulp_href": get_url(advisories[pk]),
+                            "id": advisories[pk].id,
+                            "type": advisories[pk].type,
+                            "severity": advisories[pk].severity,
+                            "packages": sorted(format_nevra(*nevra) for nevra in nevras),
+                        }
+                        for pk, nevras in sorted(
+                            host_advisories.items(), key=lambda item: advisories[item[0]].id
+                        )
+                    ],
+                }
+            )
+        return Response(ApplicabilityResultSerializer(results, many=True).data)
@@ -0,0 +1,71 @@
+from django.conf import settings
+from drf_spectacular.utils import extend_schema
+from rest_framework.viewsets import ViewSet
+
+from pulpcore.plugin.models import TaskGroup
+from pulpcore.plugin.serializers import TaskGroupOperationResponseSerializer
+from pulpcore.plugin.tasking import dispatch
+from pulpcore.plugin.viewsets import TaskGroupOperationResponse
+
+from pulp_rpm.app.serializers import FreshnessCheckSerializer
+from pulp_rpm.app.tasks import check_repositories_freshness
+
+
+class FreshnessCheckViewSet(ViewSet):
+    """
+    Viewset for check-repositories-for-updates endpoint.
+    """
+
+    serializer_class = FreshnessCheckSerializer
+
+    DEFAULT_ACCESS_POLICY = {
+        "statements": [
+            {
+                "action": ["check_freshness"],
+                "principal": "authenticated",
+                "effect": "allow",
+                "condition": [
+                    "has_repository_model_or_domain_or_obj_perms:rpm.sync_rpmrepository",
+                    "has_repository_model_or_domain_or_obj_perms:rpm.view_rpmrepository",
+                ],
+            },
+        ],
+    }
+
+    @extend_schema(
+        description="Trigger an asynchronous check of repositories for updates.",
+        responses={202: TaskGroupOperationResponseSerializer},
+    )
+    def check_freshness(self, request, **kwargs):
+        """
+        Triggers an asynchronous check of the remotes of many repositories for updates.
+
+        This returns a task-group that contains a "master" task that checks the metadata of the
+        remotes of all repositories concurrently, and dispatches one sync task per repository
+        whose metadata changed since its last sync. Unchanged repositories are neither locked
+        nor synced.
+        """
+        serializer = FreshnessCheckSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        repos = serializer.validated_data.get("repo_hrefs", [])
+
+        uri = "/api/v3/rpm/freshness_check/"
+        if settings.DOMAIN_ENABLED:
+            uri = f"/{request.pulp_domain.name}{uri}"
+        exclusive_resources = [uri, f"pdrn:{request.pulp_domain.pulp_id}:rpm:freshness_check"]
+
+        task_group = TaskGroup.objects.create(description="Check repositories for updates.")
+
+        dispatch(
+            check_repositories_freshness,
+            exclusive_resources=exclusive_resources,
+            task_group=task_group,
+            kwargs={
+                "repo_pks": [str(repo.pk) for repo in repos],
+                "sync_policy": serializer.validated_data.get("sync_policy"),
+                "skip_types": serializer.validated_data.get("skip_types"),
+                "dry_run": serializer.validated_data["dry_run"],
+            },
+        )
+        return TaskGroupOperationResponse(task_group, request)
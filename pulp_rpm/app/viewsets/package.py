@@ -1,9 +1,13 @@
+from gettext import gettext as _
+
 from django.db import transaction
-from django_filters import CharFilter
+from django.db.models import Exists, OuterRef
+from django_filters import BooleanFilter, CharFilter
 from drf_spectacular.utils import extend_schema
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.serializers import ValidationError
 
 from pulpcore.plugin.models import PulpTemporaryFile
 from pulpcore.plugin.serializers import AsyncOperationResponseSerializer
@@ -15,7 +19,8 @@ from pulpcore.plugin.viewsets import (
 )
 
 from pulp_rpm.app import tasks as rpm_tasks
-from pulp_rpm.app.models import Package
+from pulp_rpm.app.models import LatestPackage, Package, PackageCapability
+from pulp_rpm.app.pagination import PackageKeysetPagination
 from pulp_rpm.app.serializers import (
     MinimalPackageSerializer,
     PackageSerializer,
@@ -36,6 +41,58 @@ class PackageFilter(ContentFilter):
         """Filter packages that have been signed with a given key fingerprint."""
         return queryset.filter(signing_keys__contains=[value])
 
+    whatprovides = CharFilter(
+        method="filter_capability",
+        help_text=_(
+            "Packages of the repository_version providing a capability, e.g. 'libssl.so.3'"
+        ),
+    )
+    whatrequires = CharFilter(
+        method="filter_capability",
+        help_text=_("Packages of the repository_version requiring a capability"),
+    )
+    whatconflicts = CharFilter(
+        method="filter_capability",
+        help_text=_("Packages of the repository_version conflicting with a capability"),
+    )
+
+    def filter_capability(self, queryset, name, value):
+        """
+        Filter packages by the name of a capability they provide, require or conflict with.
+
+        Capabilities are looked up in the PackageCapability index, which only makes sense within
+        a repository version, so the filters require the repository_version filter.
+        """
+        if not self.form.cleaned_data.get("repository_version"):
+            raise ValidationError(
+                {name: _("This filter can only be used together with 'repository_version'.")}
+            )
+        kind = name.removeprefix("what")
+        return queryset.filter(
+            Exists(
+                PackageCapability.objects.filter(package_id=OuterRef("pk"), kind=kind, name=value)
+            )
+        )
+
+    latest_only = BooleanFilter(
+        method="filter_latest_only",
+        help_text=_("Only the newest package of each name and arch of the repository_version"),
+    )
+
+    def filter_latest_only(self, queryset, name, value):
+        """Filter packages to the newest EVR of each name and arch in a repository version."""
+        repository_version = self.form.cleaned_data.get("repository_version")
+        if not repository_version:
+            raise ValidationError(
+                {name: _("This filter can only be used together with 'repository_version'.")}
+            )
+        if not value:
+            return queryset
+        repository_version = self.filters["repository_version"].get_repository_version(
+            repository_version
+        )
+        return queryset.filter(pk__in=LatestPackage.get_packages(repository_version).values("pk"))
+
     class Meta:
         model = Package
         fields = {
@@ -65,6 +122,16 @@ class PackageViewSet(SingleArtifactContentUploadViewSet):
     serializer_class = PackageSerializer
     minimal_serializer_class = MinimalPackageSerializer
     filterset_class = PackageFilter
+    pagination_class = PackageKeysetPagination
+
+    # The large columns backing some serializer fields, which are only loaded from the database
+    # when the fields are part of the response (see "fields", "exclude_fields" and "minimal").
+    HEAVY_FIELDS = {
+        "changelogs": ("changelogs", "changelog"),
+        "files": ("files", "filelist"),
+        "description": ("description",),
+        **{kind: (kind,) for kind in PackageCapability.KINDS},
+    }
 
     DEFAULT_ACCESS_POLICY = {
         "statements": [
@@ -108,6 +175,36 @@ class PackageViewSet(SingleArtifactContentUploadViewSet):
         ],
     }
 
+    def get_queryset(self):
+        """Defer the heavy columns of the fields which are not part of the response."""
+        qs = super().get_queryset()
+        response_fields = self.get_response_fields()
+        deferred = [
+            column
+            for field, columns in self.HEAVY_FIELDS.items()
+            if field not in response_fields
+            for column in columns
+        ]
+        related = [relation for relation in ("changelog", "filelist") if relation not in deferred]
+        qs = qs.defer(*deferred)
+        # select_related() without arguments would follow every foreign key
+        return qs.select_related(*related) if related else qs
+
+    def get_response_fields(self):
+        """Return the names of the serializer fields which are rendered for the request."""
+        fields = set(self.get_serializer_class().Meta.fields)
+        request = getattr(self, "request", None)
+        if request is None or request.method != "GET":
+            return fields
+
+        def field_names(param):
+            values = request.query_params.getlist(param)
+            return {name for names in values for name in names.split(",") if name}
+
+        if include := field_names("fields"):
+            fields &= include
+        return fields - field_names("exclude_fields")
+
     @extend_schema(
         description="Trigger an asynchronous task to create an RPM package,"
         "optionally create new repository version.",
@@ -1,6 +1,8 @@
 from gettext import gettext as _
 
-from drf_spectacular.utils import extend_schema
+from django.http import StreamingHttpResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.serializers import ValidationError as DRFValidationError
@@ -26,6 +28,7 @@ from pulpcore.plugin.viewsets import (
 
 from pulp_rpm.app import tasks
 from pulp_rpm.app.constants import SYNC_POLICIES
+from pulp_rpm.app.diff import stream_diff
 from pulp_rpm.app.models import (
     RpmDistribution,
     RpmPublication,
@@ -35,6 +38,7 @@ from pulp_rpm.app.models import (
 )
 from pulp_rpm.app.serializers import (
     CopySerializer,
+    RepositoryVersionDiffSerializer,
     RpmDistributionSerializer,
     RpmPublicationSerializer,
     RpmRemoteSerializer,
@@ -321,7 +325,7 @@ class RpmRepositoryVersionViewSet(RepositoryVersionViewSet):
                 ],
             },
             {
-                "action": ["scan"],
+                "action": ["scan", "diff"],
                 "principal": "authenticated",
                 "effect": "allow",
                 "condition": "has_repository_model_or_domain_or_obj_perms:rpm.view_rpmrepository",
@@ -357,6 +361,44 @@ class RpmRepositoryVersionViewSet(RepositoryVersionViewSet):
         )
         return OperationPostponedResponse(async_result, request)
 
+    @extend_schema(
+        summary="Diff packages and advisories",
+        description=(
+            "List the packages added, removed, upgraded and downgraded, by name and arch, and the "
+            "advisories added, removed and updated since another version of the repository. "
+            "The result is streamed, one change per line."
+        ),
+        parameters=[
+            OpenApiParameter(
+                "base_version",
+                OpenApiTypes.INT,
+                description=_(
+                    "The number of the repository version to compare with. Defaults to the "
+                    "previous version."
+                ),
+            )
+        ],
+        responses={200: RepositoryVersionDiffSerializer},
+    )
+    @action(detail=True, methods=["get"], serializer_class=None, pagination_class=None)
+    def diff(self, request, repository_pk, **kwargs):
+        repository_version = self.get_object()
+        base_number = request.query_params.get("base_version")
+        try:
+            if base_number is None:
+                base_version = repository_version.previous()
+            else:
+                base_version = repository_version.repository.versions.complete().get(
+                    number=int(base_number)
+                )
+        except (RepositoryVersion.DoesNotExist, ValueError):
+            raise DRFValidationError(
+                {"base_version": _("No repository version to compare with was found.")}
+            )
+        return StreamingHttpResponse(
+            stream_diff(base_version, repository_version), content_type="application/json"
+        )
+
 
 class RpmRemoteViewSet(RemoteViewSet, RolesMixin):
     """
@@ -622,9 +664,18 @@ class RpmPublicationViewSet(PublicationViewSet, RolesMixin):
         }
         if checkpoint:
             kwargs["checkpoint"] = True
+        if compression_threads := serializer.validated_data.get("compression_threads"):
+            kwargs["compression_threads"] = compression_threads
         # If the repo or the api call had a layout specified, pass it to the publish task.
         if layout := serializer.validated_data.get("layout", repository.layout):
             kwargs["layout"] = layout
+        if serializer.validated_data.get("zchunk_metadata", repository.zchunk_metadata):
+            kwargs["zchunk_metadata"] = True
+        if (arches := serializer.validated_data.get("arches", repository.arches)) is not None:
+            kwargs["arches"] = arches
+        for package_filter in ("exclude_debuginfo", "exclude_source"):
+            if serializer.validated_data.get(package_filter, getattr(repository, package_filter)):
+                kwargs[package_filter] = True
         result = dispatch(
             tasks.publish,
             shared_resources=[repository_version.repository],
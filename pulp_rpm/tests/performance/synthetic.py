@@ -0,0 +1,374 @@
+"""
+Offline building blocks for benchmarking the rpm plugin.
+
+Synthetic repositories of any size are written with createrepo_c, served over HTTP from a local
+server that can simulate a slow upstream, and every benchmarked operation is recorded with its
+wall time, peak RSS and database query counts in a machine-readable report.
+"""
+
+import hashlib
+import json
+import platform
+import resource
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import createrepo_c as cr
+from django.db.backends.utils import CursorWrapper
+from productmd.treeinfo import TreeInfo, Variant
+
+SYNTHETIC_ARCH = "x86_64"
+SYNTHETIC_TIMESTAMP = 1700000000
+
+
+@dataclass(frozen=True)
+class SyntheticRepoSpec:
+    """
+    The shape of a synthetic repository.
+
+    Every package name comes in `versions` EVRs (for pruning and retention), requires the
+    package with half its index (for dependency solving) and carries `files` files and
+    `changelogs` changelog entries. Advisories, modules and comps groups each reference a
+    slice of the package names. Every sub-repo is a treeinfo variant with its own packages.
+    """
+
+    packages: int = 100
+    versions: int = 2
+    files: int = 10
+    changelogs: int = 3
+    advisories: int = 10
+    modules: int = 2
+    groups: int = 2
+    sub_repos: int = 0
+    sub_repo_packages: int = 10
+
+
+class SyntheticRepositoryBuilder:
+    """Writes synthetic repositories, with metadata only, below a root directory."""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def build(self, spec: SyntheticRepoSpec, base_path: str) -> Path:
+        """Write the repository described by `spec` at `base_path` and return its directory."""
+        repo_dir = self.root / base_path
+        self._write_repo(repo_dir, spec, spec.packages, prefix="pkg")
+        if spec.sub_repos:
+            sub_repos = [f"Sub{n}" for n in range(spec.sub_repos)]
+            for n, sub_repo in enumerate(sub_repos):
+                self._write_repo(
+                    repo_dir / sub_repo,
+                    spec,
+                    spec.sub_repo_packages,
+                    prefix=f"sub{n}-pkg",
+                    extras=False,
+                )
+            self._write_treeinfo(repo_dir, sub_repos)
+        return repo_dir
+
+    def _write_repo(self, repo_dir, spec, packages, prefix, extras=True):
+        repo_dir.mkdir(parents=True, exist_ok=True)
+        names = [f"{prefix}{n}" for n in range(packages)]
+        with cr.RepositoryWriter(str(repo_dir), compression=cr.GZ_COMPRESSION) as writer:
+            writer.set_num_of_pkgs(packages * spec.versions)
+            for n, name in enumerate(names):
+                for version in range(1, spec.versions + 1):
+                    writer.add_pkg(self._package(spec, name, names[n // 2], version))
+            if not extras:
+                return
+            for n in range(spec.advisories):
+                writer.add_update_record(self._advisory(n, names[n :: max(spec.advisories, 1)][:5]))
+            if spec.groups:
+                comps = repo_dir / "comps.xml"
+                comps.write_text(self._comps(spec.groups, names))
+                writer.add_repomd_metadata("group", str(comps))
+            if spec.modules:
+                modules = repo_dir / "modules.yaml"
+                modules.write_text(self._modules(spec, names))
+                writer.add_repomd_metadata("modules", str(modules))
+
+    @staticmethod
+    def _package(spec, name, requirement, version):
+        package = cr.Package()
+        package.name = name
+        package.epoch = "0"
+        package.version = f"{version}.0"
+        package.release = "1"
+        package.arch = SYNTHETIC_ARCH
+        package.pkgId = hashlib.sha256(f"{name}-{version}".encode()).hexdigest()
+        package.checksum_type = "sha256"
+        package.location_href = f"Packages/{name[0]}/{name}-{version}.0-1.{SYNTHETIC_ARCH}.rpm"
+        package.summary = f"Synthetic package {name}"
+        package.description = f"Synthetic package {name}, version {version}."
+        package.rpm_license = "MIT"
+        package.rpm_sourcerpm = f"{name}-{version}.0-1.src.rpm"
+        package.time_build = SYNTHETIC_TIMESTAMP + version
+        package.time_file = SYNTHETIC_TIMESTAMP + version
+        package.size_package = package.size_installed = package.size_archive = 1024
+        package.provides = [(name, "EQ", "0", f"{version}.0", "1", False)]
+        if requirement != name:
+            package.requires = [(requirement, None, None, None, None, False)]
+        package.files = [("", f"/usr/share/{name}/", f"file{n}") for n in range(spec.files)] + [
+            ("", "/usr/bin/", name)
+        ]
+        package.changelogs = [
+            ("Synthetic <synthetic@example.com>", SYNTHETIC_TIMESTAMP + n, f"- change {n}")
+            for n in range(spec.changelogs)
+        ]
+        return package
+
+    @staticmethod
+    def _advisory(n, names):
+        advisory = cr.UpdateRecord()
+        advisory.id = f"SYNTHETIC-{n}"
+        advisory.type = "bugfix"
+        advisory.title = advisory.summary = advisory.description = f"Synthetic advisory {n}"
+        advisory.status = "final"
+        advisory.version = "1"
+        advisory.release = "1"
+        advisory.issued_date = advisory.updated_date = SYNTHETIC_TIMESTAMP
+        collection = cr.UpdateCollection()
+        collection.name = collection.shortname = f"synthetic-{n}"
+        for name in names:
+            package = cr.UpdateCollectionPackage()
+            package.name = name
+            package.epoch = "0"
+            package.version = "1.0"
+            package.release = "1"
+            package.arch = SYNTHETIC_ARCH
+            package.filename = f"{name}-1.0-1.{SYNTHETIC_ARCH}.rpm"
+            collection.append(package)
+        advisory.append_collection(collection)
+        return advisory
+
+    @staticmethod
+    def _comps(groups, names):
+        entries = []
+        for n in range(groups):
+            requirements = "".join(
+                f'<packagereq type="default">{name}</packagereq>' for name in names[n::groups]
+            )
+            entries.append(
+                f"<group><id>synthetic-{n}</id><name>Synthetic {n}</name>"
+                f"<description>Synthetic group {n}</description><default>false</default>"
+                f"<uservisible>true</uservisible><packagelist>{requirements}</packagelist></group>"
+            )
+        return '<?xml version="1.0" encoding="UTF-8"?>\n<comps>{}</comps>\n'.format(
+            "".join(entries)
+        )
+
+    @staticmethod
+    def _modules(spec, names):
+        documents = []
+        for n in range(spec.modules):
+            artifacts = "".join(
+                f"\n      - {name}-0:1.0-1.{SYNTHETIC_ARCH}" for name in names[n :: spec.modules]
+            )
+            components = "".join(
+                f"\n      {name}:\n        rationale: synthetic"
+                for name in names[n :: spec.modules]
+            )
+            documents.append(
+                f"""---
+document: modulemd
+version: 2
+data:
+  name: synthetic{n}
+  stream: "1"
+  version: 1
+  context: deadbeef
+  arch: {SYNTHETIC_ARCH}
+  summary: Synthetic module {n}
+  description: Synthetic module {n}
+  license:
+    module: [MIT]
+  profiles:
+    default:
+      rpms: [{names[n]}]
+  components:
+    rpms:{components}
+  artifacts:
+    rpms:{artifacts}
+...
+---
+document: modulemd-defaults
+version: 1
+data:
+  module: synthetic{n}
+  stream: "1"
+  profiles:
+    "1": [default]
+...
+"""
+            )
+        return "".join(documents)
+
+    @staticmethod
+    def _write_treeinfo(repo_dir, sub_repos):
+        treeinfo = TreeInfo()
+        treeinfo.release.name = "Synthetic"
+        treeinfo.release.short = "Synthetic"
+        treeinfo.release.version = "1"
+        treeinfo.tree.arch = SYNTHETIC_ARCH
+        treeinfo.tree.build_timestamp = SYNTHETIC_TIMESTAMP
+        for uid, repository in [("Main", "."), *((sub_repo, sub_repo) for sub_repo in sub_repos)]:
+            variant = Variant(treeinfo)
+            variant.id = variant.uid = variant.name = uid
+            variant.type = "variant"
+            variant.paths.repository = repository
+            variant.paths.packages = f"{repository}/Packages".removeprefix("./")
+            treeinfo.variants.add(variant)
+        treeinfo.dump(str(repo_dir / ".treeinfo"))
+
+
+class _LatencyRequestHandler(SimpleHTTPRequestHandler):
+    def __init__(self, *args, server_stats, latency, **kwargs):
+        self.server_stats = server_stats
+        self.latency = latency
+        super().__init__(*args, **kwargs)
+
+    def send_head(self):
+        self.server_stats["requests"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return super().send_head()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SyntheticRepoServer:
+    """
+    Serves a directory over HTTP from a background thread.
+
+    Every request is answered after `latency` seconds, to simulate a remote upstream.
+
+    Usable as a context manager: `with SyntheticRepoServer(root) as server: server.url(path)`.
+    """
+
+    def __init__(self, root: Path, latency: float = 0.0):
+        self.root = root
+        self.latency = latency
+        self.stats = Counter()
+        self._httpd = None
+        self._thread = None
+
+    def url(self, base_path: str) -> str:
+        """The URL of the repository at `base_path` below the served directory."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/{base_path}/"
+
+    def __enter__(self):
+        handler = partial(
+            _LatencyRequestHandler,
+            directory=str(self.root),
+            server_stats=self.stats,
+            latency=self.latency,
+        )
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+
+class QueryCounter:
+    """
+    Counts the queries sent to the database by any thread, by statement type.
+
+    Tasks run most of their queries from threads of their own (e.g. the stages pipeline of a
+    sync), which per-connection execute wrappers would not see.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._original = None
+
+    def __enter__(self):
+        self._original = original = CursorWrapper._execute_with_wrappers
+        counter = self
+
+        def _execute_with_wrappers(cursor, sql, params, many, executor):
+            statement = sql.lstrip(" \n(")
+            statement_type = statement.split(None, 1)[0].upper() if statement else ""
+            with counter._lock:
+                counter.counts[statement_type] += 1
+            return original(cursor, sql, params, many, executor)
+
+        CursorWrapper._execute_with_wrappers = _execute_with_wrappers
+        return self
+
+    def __exit__(self, *exc_info):
+        CursorWrapper._execute_with_wrappers = self._original
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+def _reset_peak_rss():
+    """Reset the peak RSS of the process, so that it can be measured per operation."""
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_kib():
+    """The peak RSS of the process in KiB, since the last reset if it could be reset."""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if platform.system() == "Darwin" else peak
+
+
+@dataclass
+class BenchmarkReport:
+    """The measurements of a benchmark run, written out as JSON."""
+
+    path: Path
+    results: list = field(default_factory=list)
+
+    @contextmanager
+    def measure(self, operation, spec, **extra):
+        """
+        Record the wall time, peak RSS and query counts of the operation run in the block.
+
+        Yields the result dict, so that the block can add more details to it.
+        """
+        result = {"operation": operation, "spec": asdict(spec), **extra}
+        per_operation_rss = _reset_peak_rss()
+        with QueryCounter() as queries:
+            start = time.perf_counter()
+            yield result
+            wall_time = time.perf_counter() - start
+        result.update(
+            wall_time=round(wall_time, 3),
+            peak_rss_kib=_peak_rss_kib(),
+            peak_rss_per_operation=per_operation_rss,
+            queries=queries.total,
+            queries_by_type=dict(queries.counts),
+        )
+        self.results.append(result)
+        self.write()
+
+    def write(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        report = {"python": platform.python_version(), "results": self.results}
+        self.path.write_text(json.dumps(report, indent=2) + "\n")
@@ -0,0 +1,163 @@
+"""
+Offline benchmarks of sync, resync, publish, copy with dependency solving and prune.
+
+The tasks run in-process against synthetic repositories served from a local HTTP server, so
+that no network access and no running Pulp services are needed. Every operation is recorded in
+a JSON report (see `BenchmarkReport`), whose location can be set with the
+PULP_RPM_BENCHMARK_REPORT environment variable. The size of the repositories can be scaled
+with PULP_RPM_BENCHMARK_SCALE and a per-request latency of the upstream server, in seconds,
+can be simulated with PULP_RPM_BENCHMARK_LATENCY.
+"""
+
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+from django.apps import apps
+from django_guid import set_guid
+
+from pulpcore.plugin.models import Task, TaskGroup
+from pulpcore.plugin.tasking import dispatch
+from pulpcore.tasking.tasks import execute_task, using_workdir
+
+from pulp_rpm.app.models import LatestPackage, Package, RpmRemote, RpmRepository
+from pulp_rpm.app.tasks import publish
+from pulp_rpm.app.tasks.copy import copy_content
+from pulp_rpm.app.tasks.prune import prune_packages
+from pulp_rpm.app.tasks.synchronizing import synchronize
+from pulp_rpm.tests.performance.synthetic import (
+    BenchmarkReport,
+    SyntheticRepoServer,
+    SyntheticRepositoryBuilder,
+    SyntheticRepoSpec,
+)
+
+SCALE = int(os.environ.get("PULP_RPM_BENCHMARK_SCALE", "1"))
+LATENCY = float(os.environ.get("PULP_RPM_BENCHMARK_LATENCY", "0"))
+
+SPECS = {
+    "packages": SyntheticRepoSpec(packages=500 * SCALE, advisories=50 * SCALE),
+    "filelists": SyntheticRepoSpec(packages=200 * SCALE, files=200, changelogs=10),
+    "modular": SyntheticRepoSpec(packages=200 * SCALE, modules=20 * SCALE, groups=20),
+    "sub_repos": SyntheticRepoSpec(
+        packages=200 * SCALE, sub_repos=3, sub_repo_packages=100 * SCALE
+    ),
+}
+
+
+@pytest.fixture
+def worker_status():
+    """Make this process a worker, which tasks can be run in."""
+    AppStatus = apps.get_model("core", "AppStatus")
+    app_status = AppStatus.objects.create(name=f"benchmark-{uuid.uuid4()}", app_type="worker")
+    yield app_status
+    app_status.delete()
+    # there can only be one app status per process, and the next test needs its own
+    AppStatus.objects._current_app_status = None
+
+
+@pytest.fixture(scope="module")
+def benchmark_report(tmp_path_factory):
+    default_path = tmp_path_factory.getbasetemp() / "pulp_rpm-benchmark.json"
+    report = BenchmarkReport(Path(os.environ.get("PULP_RPM_BENCHMARK_REPORT", default_path)))
+    yield report
+    print(f"\n->     Benchmark report: {report.path}")
+
+
+@pytest.fixture(scope="module")
+def synthetic_server(tmp_path_factory):
+    root = tmp_path_factory.mktemp("synthetic")
+    with SyntheticRepoServer(root, latency=LATENCY) as server:
+        yield server
+
+
+def run_task(func, task_group=None, **kwargs):
+    """
+    Run a task to completion in this process, the way a worker would.
+
+    Tasks spawned into the `task_group` by the task are run to completion as well.
+    """
+    set_guid(uuid.uuid4().hex)
+    _execute(dispatch(func, kwargs=kwargs, task_group=task_group))
+    if task_group:
+        for spawned_task in task_group.tasks.filter(state="waiting").order_by("pulp_created"):
+            _execute(spawned_task)
+
+
+def _execute(task):
+    AppStatus = apps.get_model("core", "AppStatus")
+    Task.objects.filter(pk=task.pk).update(app_lock=AppStatus.objects.current())
+    task.refresh_from_db()
+    with using_workdir():
+        execute_task(task)
+    task.refresh_from_db()
+    assert task.state == "completed", task.error
+
+
+# The stages of a sync run their queries from another thread, which would not see the data of a
+# transaction held open by the test.
+@pytest.mark.django_db(transaction=True, serialized_rollback=True)
+@pytest.mark.parametrize("spec_name", SPECS)
+def test_benchmark(spec_name, worker_status, benchmark_report, synthetic_server, settings):
+    """Sync, resync, publish, copy with dependency solving and prune a synthetic repository."""
+    # writing out the solver state would dominate the timings of the copy
+    settings.SOLVER_DEBUG_LOGS = False
+    spec = SPECS[spec_name]
+    base_path = f"{spec_name}-{uuid.uuid4()}"
+    SyntheticRepositoryBuilder(synthetic_server.root).build(spec, base_path)
+    remote = RpmRemote.objects.create(
+        name=base_path, url=synthetic_server.url(base_path), policy="on_demand"
+    )
+    repository = RpmRepository.objects.create(name=base_path, retain_package_versions=0)
+    extra = {"spec_name": spec_name, "latency": LATENCY}
+
+    def sync(optimize):
+        return run_task(
+            synchronize,
+            remote_pk=str(remote.pk),
+            repository_pk=str(repository.pk),
+            sync_policy="additive",
+            skip_types=[],
+            optimize=optimize,
+        )
+
+    with benchmark_report.measure("sync", spec, **extra) as result:
+        requests_before = synthetic_server.stats["requests"]
+        sync(optimize=True)
+        result["http_requests"] = synthetic_server.stats["requests"] - requests_before
+    version = repository.latest_version()
+    assert version.get_content(Package.objects).count() >= spec.packages * spec.versions
+
+    with benchmark_report.measure("resync", spec, **extra) as result:
+        sync(optimize=False)
+    assert repository.latest_version() == version
+
+    with benchmark_report.measure("publish", spec, **extra):
+        run_task(
+            publish,
+            repository_version_pk=str(version.pk),
+            checksum_type=repository.checksum_type,
+            repo_config=repository.repo_config,
+            compression_type=repository.compression_type,
+        )
+
+    destination = RpmRepository.objects.create(name=f"{base_path}-copy")
+    leaves = LatestPackage.get_packages(version).order_by("-name")[:10]
+    with benchmark_report.measure("copy_depsolve", spec, **extra) as result:
+        config = [
+            {
+                "source_repo_version": str(version.pk),
+                "dest_repo": str(destination.pk),
+                "content": [str(pk) for pk in leaves.values_list("pk", flat=True)],
+            }
+        ]
+        run_task(copy_content, config=config, dependency_solving=True)
+        result["copied"] = destination.latest_version().content.count()
+
+    with benchmark_report.measure("prune", spec, **extra) as result:
+        task_group = TaskGroup.objects.create(description=f"Prune {base_path}")
+        run_task(prune_packages, task_group=task_group, repo_pks=[str(repository.pk)], keep_days=0)
+        result["pruned"] = version.content.count() - repository.latest_version().content.count()
+    if spec.versions > 1:
+        assert result["pruned"]
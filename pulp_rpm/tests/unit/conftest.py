@@ -1,8 +1,12 @@
 import re
+import uuid
 from pathlib import Path
 
 import pytest
 
+from pulpcore.plugin.models import Task
+from pulpcore.tasking.tasks import with_task_context
+
 _SAVED_ARTIFACTS = []
 
 
@@ -28,6 +32,18 @@ def save_artifact(request):
     return _save
 
 
+@pytest.fixture
+def running_task(tmp_path, monkeypatch):
+    """Run the test in a task, in a working directory of its own like the tasks of a worker.
+
+    Publications, downloads and profiles are created by or attached to the current task.
+    """
+    monkeypatch.chdir(tmp_path)
+    task = Task.objects.create(name="test", state="running", logging_cid=uuid.uuid4().hex)
+    with with_task_context(task):
+        yield task
+
+
 def pytest_terminal_summary(terminalreporter, exitstatus, config):
     if not _SAVED_ARTIFACTS:
         return
@@ -0,0 +1,79 @@
+import uuid
+
+import pytest
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.serializers import ValidationError
+from rest_framework.test import APIRequestFactory
+
+from pulpcore.plugin.util import get_prn
+
+from pulp_rpm.app.advisory import find_applicable_advisories
+from pulp_rpm.app.models import UpdateCollectionPackage
+from pulp_rpm.app.serializers import ApplicabilitySerializer
+from pulp_rpm.app.viewsets import ApplicabilityViewSet
+from pulp_rpm.tests.unit.utils.content_factory import RepoContentFactory
+
+
+@pytest.mark.django_db
+def test_find_applicable_advisories():
+    """Advisories apply to hosts with an older package of the same name and arch installed."""
+    foo, bar = f"foo-{uuid.uuid4()}", f"bar-{uuid.uuid4()}"
+    with RepoContentFactory() as factory:
+        advisory_pk = factory.add_advisory(f"RHSA-{uuid.uuid4()}", package_names=[foo, bar])
+    assert UpdateCollectionPackage.objects.filter(name=foo).values_list("evr", flat=True)[0]
+
+    applicable = find_applicable_advisories(
+        factory.version,
+        {
+            "outdated": [(foo, "0", "0.9", "1", "noarch"), (bar, "0", "1.0", "1", "noarch")],
+            "prerelease": [(foo, "", "1.0~rc1", "1", "noarch")],
+            "updated": [(foo, "0", "0.9", "1", "noarch"), (foo, "0", "1.0", "1", "noarch")],
+            "other-arch": [(foo, "0", "0.9", "1", "x86_64")],
+            "empty": [],
+        },
+    )
+
+    assert applicable == {
+        "outdated": {advisory_pk: {(foo, "0", "1.0", "1", "noarch")}},
+        "prerelease": {advisory_pk: {(foo, "0", "1.0", "1", "noarch")}},
+        "updated": {},
+        "other-arch": {},
+        "empty": {},
+    }
+
+
+def test_applicability_serializer_parses_nevras():
+    host_serializer = ApplicabilitySerializer().fields["hosts"].child
+    assert host_serializer.validate_packages(
+        ["bash-5.1.8-6.el9.x86_64", "vim-2:9.0-1.el9.noarch"]
+    ) == [
+        ("bash", "0", "5.1.8", "6.el9", "x86_64"),
+        ("vim", "2", "9.0", "1.el9", "noarch"),
+    ]
+    with pytest.raises(ValidationError):
+        host_serializer.validate_packages(["bash"])
+
+
+@pytest.mark.django_db
+def test_applicability_view():
+    foo = f"foo-{uuid.uuid4()}"
+    with RepoContentFactory() as factory:
+        factory.add_advisory(f"RHSA-{uuid.uuid4()}", package_names=[foo])
+    request = Request(
+        APIRequestFactory().post(
+            "/",
+            {
+                "repository_version": get_prn(factory.version),
+                "hosts": [{"name": "host", "packages": [f"{foo}-0.9-1.noarch"]}],
+            },
+            format="json",
+        ),
+        parsers=[JSONParser()],
+    )
+
+    response = ApplicabilityViewSet().create(request)
+
+    [host] = response.data
+    assert host["name"] == "host"
+    assert [advisory["packages"] for advisory in host["advisories"]] == [[f"{foo}-0:1.0-1.noarch"]]
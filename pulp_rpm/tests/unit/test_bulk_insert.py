@@ -0,0 +1,133 @@
+import uuid
+
+import pytest
+from django.db import DatabaseError, transaction
+from tablib import Dataset
+
+from pulpcore.plugin.models import Artifact, Content, ContentArtifact
+from pulpcore.plugin.stages import DeclarativeArtifact, DeclarativeContent
+
+from pulp_rpm.app import bulk_insert
+from pulp_rpm.app.bulk_insert import copy_insert_content_artifacts, copy_insert_packages
+from pulp_rpm.app.modelresource import PackageResource
+from pulp_rpm.app.models import Package, RpmRemote
+from pulp_rpm.app.tasks.synchronizing import RpmContentSaver
+from pulp_rpm.tests.unit.utils.content_factory import build_package
+
+
+def _package(name):
+    return build_package(
+        name,
+        arch="noarch",
+        pkgId=f"fakedigest-{name}",
+        files=[[None, "/usr/bin/", name]],
+        requires=[["glibc", None, None, None, None, False]],
+    )
+
+
+@pytest.mark.django_db
+def test_copy_insert_packages_skips_existing():
+    """New packages are inserted, conflicting ones are left unsaved without leftover rows."""
+    existing = _package(f"foo-{uuid.uuid4()}")
+    existing.save()
+    new = _package(f"bar-{uuid.uuid4()}")
+    duplicate = _package(existing.name)
+
+    assert copy_insert_packages([new, duplicate]) == [new]
+
+    assert not new._state.adding
+    saved = Package.objects.get(pk=new.pk)
+    assert (saved.files, saved.requires) == (new.files, new.requires)
+    assert saved.pulp_type == "rpm.package"
+    assert saved.pulp_created is not None
+    assert duplicate._state.adding and duplicate.pk is None
+    assert not Content.objects.filter(pk=duplicate.pulp_id).exists()
+
+    copy_insert_content_artifacts(
+        [ContentArtifact(content=new, relative_path=new.location_href or "new.rpm")] * 2
+    )
+    assert ContentArtifact.objects.filter(content=new).count() == 1
+
+
+@pytest.mark.django_db
+def test_content_saver_inserts_new_packages():
+    """The saver inserts new packages with their ContentArtifacts and reuses existing ones."""
+    remote = RpmRemote(name="remote", url="https://example.com/repo/")
+    existing = _package(f"foo-{uuid.uuid4()}")
+    existing.save()
+    batch = [
+        DeclarativeContent(
+            content=package,
+            d_artifacts=[
+                DeclarativeArtifact(
+                    artifact=Artifact(),
+                    url=f"https://example.com/repo/{package.name}.rpm",
+                    relative_path=f"{package.name}.rpm",
+                    remote=remote,
+                )
+            ],
+        )
+        for package in [_package(f"bar-{uuid.uuid4()}"), _package(existing.name)]
+    ]
+
+    inserted = RpmContentSaver()._insert_new_packages(batch)
+
+    assert inserted == batch[:1]
+    new, duplicate = (d_content.content for d_content in batch)
+    assert not new._state.adding
+    content_artifact = ContentArtifact.objects.get(content=new)
+    assert (content_artifact.relative_path, content_artifact.artifact) == (f"{new.name}.rpm", None)
+    assert duplicate == existing
+    assert not ContentArtifact.objects.filter(content=existing).exists()
+
+
+@pytest.mark.django_db
+def test_package_resource_import():
+    """Imported packages are created in bulk and reported with their primary keys."""
+    package = _package(f"foo-{uuid.uuid4()}")
+    package.save()
+    dataset = PackageResource().export(queryset=Package.objects.filter(pk=package.pk))
+    dataset = Dataset().load(dataset.json)
+    Package.objects.filter(pk=package.pk).delete()
+
+    result = PackageResource().import_data(dataset, raise_errors=True)
+
+    imported = Package.objects.get(pk=result.rows[0].object_id)
+    assert (imported.name, imported.files) == (package.name, package.files)
+    assert str(imported.upstream_id) == str(package.pk)
+
+
+@pytest.mark.django_db
+def test_copy_insert_packages_failure_keeps_transaction(monkeypatch):
+    """A failing COPY is rolled back on its own, leaving the transaction usable."""
+
+    def failing_copy(cursor, table, fields, instances):
+        cursor.execute("SELECT 1 / 0")
+
+    package = _package(f"foo-{uuid.uuid4()}")
+    with transaction.atomic():
+        monkeypatch.setattr(bulk_insert, "_copy", failing_copy)
+        with pytest.raises(DatabaseError, match="division by zero"):
+            bulk_insert.copy_insert_content_artifacts(
+                [ContentArtifact(content=package, relative_path="foo.rpm")]
+            )
+        monkeypatch.undo()
+
+        assert copy_insert_packages([package]) == [package]
+        assert copy_insert_packages([_package(f"bar-{uuid.uuid4()}")])
+
+
+@pytest.mark.django_db
+def test_bulk_insert_packages_disabled(settings):
+    """Without COPY, imported packages are saved one by one."""
+    settings.RPM_BULK_INSERT_PACKAGES = False
+    package = _package(f"foo-{uuid.uuid4()}")
+    package.save()
+    dataset = PackageResource().export(queryset=Package.objects.filter(pk=package.pk))
+    dataset = Dataset().load(dataset.json)
+    Package.objects.filter(pk=package.pk).delete()
+
+    result = PackageResource().import_data(dataset, raise_errors=True)
+
+    imported = Package.objects.get(pk=result.rows[0].object_id)
+    assert imported.name == package.name
@@ -0,0 +1,44 @@
+import gzip
+import os
+
+import createrepo_c as cr
+
+from pulp_rpm.app.compression import parallel_gzip
+from pulp_rpm.app.tasks.publishing import COMPRESSED_RECORD_TYPES, compress_repodata
+
+
+def test_parallel_gzip(tmp_path):
+    """Blocks are written as consecutive gzip members that decompress as one stream."""
+    data = b"".join(b"<file>/usr/share/doc/pkg-%d/README</file>\n" % i for i in range(10000))
+    src = tmp_path / "filelists.xml"
+    src.write_bytes(data)
+
+    parallel_gzip(src, tmp_path / "filelists.xml.gz", threads=4, block_size=4096)
+
+    assert gzip.decompress((tmp_path / "filelists.xml.gz").read_bytes()) == data
+
+
+def test_compress_repodata(tmp_path):
+    """Records are refilled from the compressed files, matching the uncompressed ones."""
+    with cr.RepositoryWriter(
+        str(tmp_path), compression=cr.NO_COMPRESSION, checksum_type=cr.SHA256
+    ) as writer:
+        writer.set_num_of_pkgs(0)
+    uncompressed = {record.type: record for record in writer.repomd.records}
+
+    repodata_path = str(tmp_path / "repodata")
+    compress_repodata(
+        writer.repomd, repodata_path, COMPRESSED_RECORD_TYPES, cr.GZ, cr.SHA256, threads=2
+    )
+
+    repomd = cr.Repomd(os.path.join(repodata_path, "repomd.xml"))
+    records = {record.type: record for record in repomd.records}
+    assert records.keys() == uncompressed.keys()
+    for record_type, record in records.items():
+        assert record.location_href.endswith(".xml.gz")
+        assert record.checksum_open == uncompressed[record_type].checksum
+        assert record.size_open == uncompressed[record_type].size
+        assert record.size == os.path.getsize(os.path.join(tmp_path, record.location_href))
+    assert sorted(os.listdir(repodata_path)) == sorted(
+        ["repomd.xml"] + [os.path.basename(r.location_href) for r in repomd.records]
+    )
@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+from pulp_rpm.app.content import is_not_modified
+from pulp_rpm.app.metadata_cache import validator_headers
+
+PUBLISHED = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def response():
+    return web.Response(body=b"<repomd/>", headers=validator_headers("abc", PUBLISHED))
+
+
+@pytest.mark.parametrize(
+    "headers,expected",
+    [
+        ({}, False),
+        ({"If-None-Match": '"abc"'}, True),
+        ({"If-None-Match": 'W/"abc"'}, True),
+        ({"If-None-Match": '"zzz", "abc"'}, True),
+        ({"If-None-Match": "*"}, True),
+        ({"If-None-Match": '"zzz"'}, False),
+        ({"If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}, True),
+        ({"If-Modified-Since": "Tue, 02 Jan 2024 00:00:00 GMT"}, True),
+        ({"If-Modified-Since": "Sun, 31 Dec 2023 00:00:00 GMT"}, False),
+        # If-None-Match takes precedence over If-Modified-Since
+        (
+            {"If-None-Match": '"zzz"', "If-Modified-Since": "Tue, 02 Jan 2024 00:00:00 GMT"},
+            False,
+        ),
+    ],
+)
+def test_is_not_modified(response, headers, expected):
+    request = make_mocked_request("GET", "/repodata/repomd.xml", headers=headers)
+    assert is_not_modified(request, response) is expected
+
+
+def test_is_not_modified_only_for_safe_methods(response):
+    request = make_mocked_request("POST", "/repodata/repomd.xml", headers={"If-None-Match": "*"})
+    assert not is_not_modified(request, response)
@@ -218,12 +218,7 @@ class TestCopyContentBase:
         SMALL_COUNT = 20
         SCALE_FACTOR = 10
         LARGE_COUNT = SMALL_COUNT * SCALE_FACTOR
-        IGNORE_PATHS = [
-            IgnoreFromPath(
-                pattern=r"advisory\.py:\d+ in (get_pkglist|get_module_list)",
-                reason="needs further investigation",
-            ),
-        ]
+        IGNORE_PATHS = []
 
         small = self.call_copy_workflow(SMALL_COUNT, profile_name)
         large = self.call_copy_workflow(LARGE_COUNT, profile_name)
@@ -0,0 +1,71 @@
+import json
+import uuid
+
+import pytest
+
+from pulpcore.plugin.models import Content
+
+from pulp_rpm.app.diff import stream_diff
+from pulp_rpm.tests.unit.utils.content_factory import RepoContentFactory, create_package
+
+
+def _package(name, version):
+    return create_package(name, version=version, arch="noarch")
+
+
+@pytest.mark.django_db
+def test_diff_repository_versions():
+    """Package changes are classified by name and arch, advisory changes by id."""
+    prefix = uuid.uuid4()
+    foo_old, foo_new = _package(f"{prefix}-foo", "1.9"), _package(f"{prefix}-foo", "1.10")
+    bar_old, bar_new = _package(f"{prefix}-bar", "2.0"), _package(f"{prefix}-bar", "1.0")
+    removed, added = _package(f"{prefix}-baz", "1.0"), _package(f"{prefix}-qux", "1.0")
+    unchanged = _package(f"{prefix}-quux", "1.0")
+    with RepoContentFactory() as factory:
+        factory._content_pks.extend([foo_old.pk, bar_old.pk, removed.pk, unchanged.pk])
+    old_version = factory.version
+
+    with factory.get_repository().new_version() as new_version:
+        new_version.remove_content(Content.objects.filter(pk__in=[foo_old.pk, bar_old.pk]))
+        new_version.remove_content(Content.objects.filter(pk=removed.pk))
+        new_version.add_content(Content.objects.filter(pk__in=[foo_new.pk, bar_new.pk, added.pk]))
+    with RepoContentFactory(repo_name=factory.get_repository().name) as advisories:
+        advisories._content_pks.extend(new_version.content.values_list("pk", flat=True))
+        advisories.add_advisory(f"RHSA-{prefix}", package_names=[foo_new.name])
+
+    diff = json.loads("".join(stream_diff(old_version, advisories.version)))
+
+    def nevra(package):
+        return f"{package.name}-0:{package.version}-1.noarch"
+
+    assert diff["packages"] == [
+        {
+            "change": "downgraded",
+            "name": bar_old.name,
+            "arch": "noarch",
+            "old": nevra(bar_old),
+            "new": nevra(bar_new),
+        },
+        {
+            "change": "removed",
+            "name": removed.name,
+            "arch": "noarch",
+            "old": nevra(removed),
+            "new": None,
+        },
+        {
+            "change": "upgraded",
+            "name": foo_old.name,
+            "arch": "noarch",
+            "old": nevra(foo_old),
+            "new": nevra(foo_new),
+        },
+        {"change": "added", "name": added.name, "arch": "noarch", "old": None, "new": nevra(added)},
+    ]
+    assert diff["advisories"] == [
+        {"change": "added", "id": f"RHSA-{prefix}", "type": "", "severity": ""}
+    ]
+    assert json.loads("".join(stream_diff(old_version, old_version))) == {
+        "packages": [],
+        "advisories": [],
+    }
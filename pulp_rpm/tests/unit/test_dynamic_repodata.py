@@ -0,0 +1,147 @@
+import os
+import uuid
+from concurrent.futures import Future
+
+import createrepo_c as cr
+import pytest
+from aiohttp.web_fileresponse import FileResponse
+
+from pulp_rpm.app import dynamic_repodata
+from pulp_rpm.app.dynamic_repodata import (
+    cache_key,
+    generate,
+    get_dynamic_repodata,
+    prune_cache,
+    publish_settings,
+)
+from pulp_rpm.app.models import RpmDistribution
+from pulp_rpm.tests.unit.utils.content_factory import RepoContentFactory
+
+
+@pytest.fixture
+def repodata_dir(settings, tmp_path):
+    settings.RPM_DYNAMIC_REPODATA_DIR = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def submitted(monkeypatch):
+    """Generate the repodata in the test, which the data of the test transaction is visible to."""
+    calls = []
+
+    def submit_inline(executor, function, *args, **kwargs):
+        calls.append(args)
+        future = Future()
+        future.set_result(function(*args, **kwargs))
+        return future
+
+    monkeypatch.setattr(dynamic_repodata, "submit_with_connection", submit_inline)
+    return calls
+
+
+@pytest.mark.django_db
+def test_dynamic_repodata(repodata_dir, submitted):
+    """Repodata is generated once per repository version and references the artifacts."""
+    name = f"dynamic-{uuid.uuid4()}"
+    with RepoContentFactory() as factory:
+        package = factory.add_package(name)
+    content_artifact = package.contentartifact_set.get()
+    repository = factory.get_repository()
+    distribution = RpmDistribution.objects.create(
+        name=name, base_path=name, repository=repository, dynamic_repodata=True
+    )
+
+    # the first request starts the generation
+    response = distribution.content_handler("repodata/repomd.xml")
+    assert response.status == 503
+    assert response.headers["Retry-After"] == "5"
+    assert len(submitted) == 1
+
+    repodata = get_dynamic_repodata(factory.version, publish_settings(repository))
+    package_path = f"Packages/d/{name}-1.0-1.noarch.rpm"
+    assert repodata.artifacts == {package_path: str(content_artifact.pk)}
+    assert "repodata/repomd.xml" in repodata.metadata
+    repomd = cr.Repomd(os.path.join(repodata.path, "repodata/repomd.xml"))
+    primary = next(record for record in repomd.records if record.type == "primary")
+    assert primary.location_href in repodata.metadata
+    assert os.path.basename(repodata.path) in os.listdir(repodata_dir)
+
+    # served from the cache directory, without generating the repodata again
+    assert get_dynamic_repodata(factory.version, publish_settings(repository)) == repodata
+    assert len(submitted) == 1
+
+    assert distribution.content_handler(package_path) == content_artifact
+    response = distribution.content_handler("repodata/repomd.xml")
+    assert isinstance(response, FileResponse)
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert distribution.content_handler("repodata/missing.xml") is None
+    assert distribution.get_repository_publication_and_version()[1:] == (factory.version, None)
+
+
+@pytest.mark.django_db
+def test_dynamic_repodata_generated_once(repodata_dir, monkeypatch):
+    """Requests made while the repodata is generated do not start another generation."""
+    pending = []
+    monkeypatch.setattr(dynamic_repodata, "_generating", {})
+    monkeypatch.setattr(
+        dynamic_repodata,
+        "submit_with_connection",
+        lambda executor, function, *args: pending.append(args) or Future(),
+    )
+    with RepoContentFactory() as factory:
+        factory.add_package(f"dynamic-{uuid.uuid4()}")
+    settings = publish_settings(factory.get_repository())
+
+    assert get_dynamic_repodata(factory.version, settings) is None
+    assert get_dynamic_repodata(factory.version, settings) is None
+    assert len(pending) == 1
+
+
+@pytest.mark.django_db
+def test_dynamic_repodata_package_filters(repodata_dir, submitted):
+    """The package filters of the repository apply, and select a repodata of their own."""
+    name = f"dynamic-{uuid.uuid4()}"
+    with RepoContentFactory() as factory:
+        factory.add_package(name)
+        factory.add_package(name, arch="src")
+    repository = factory.get_repository()
+    get_dynamic_repodata(factory.version, publish_settings(repository))
+    repodata = get_dynamic_repodata(factory.version, publish_settings(repository))
+    assert len(repodata.artifacts) == 2
+
+    repository.exclude_source = True
+    repository.save()
+    get_dynamic_repodata(factory.version, publish_settings(repository))
+    filtered = get_dynamic_repodata(factory.version, publish_settings(repository))
+    assert filtered.path != repodata.path
+    assert list(filtered.artifacts) == [f"Packages/d/{name}-1.0-1.noarch.rpm"]
+
+
+@pytest.mark.django_db
+def test_dynamic_repodata_generated_meanwhile(repodata_dir):
+    """Repodata already moved into place by another process is kept."""
+    with RepoContentFactory() as factory:
+        factory.add_package(f"dynamic-{uuid.uuid4()}")
+    settings = publish_settings(factory.get_repository())
+    path = os.path.join(repodata_dir, cache_key(factory.version, settings))
+
+    generate(factory.version, settings, path)
+    generated = sorted(os.listdir(path))
+    generate(factory.version, settings, path)
+    assert sorted(os.listdir(path)) == generated
+    assert os.listdir(repodata_dir) == [os.path.basename(path)]
+
+
+@pytest.mark.django_db
+def test_prune_cache(repodata_dir):
+    """The repodata of deleted versions and stale working directories are removed."""
+    deleted = f"{uuid.uuid4()}-0123456789abcdef"
+    stale, current = repodata_dir / "tmpstale", repodata_dir / "tmpcurrent"
+    for directory in (repodata_dir / deleted, stale, current):
+        directory.mkdir()
+    (repodata_dir / f".{deleted}.lock").touch()
+    os.utime(stale, (0, 0))
+
+    prune_cache(str(repodata_dir))
+
+    assert os.listdir(repodata_dir) == ["tmpcurrent"]
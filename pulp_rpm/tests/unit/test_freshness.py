@@ -0,0 +1,91 @@
+import functools
+import threading
+import uuid
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import createrepo_c as cr
+import pytest
+
+from pulp_rpm.app.models import RpmRemote, RpmRepository
+from pulp_rpm.app.shared_utils import get_sha256
+from pulp_rpm.app.tasks import freshness
+from pulp_rpm.app.tasks.synchronizing import make_sync_details
+
+
+def create_upstream(path, revision):
+    """Create the metadata of an upstream repository, return its repomd.xml checksum."""
+    repomd = cr.Repomd()
+    repomd.revision = revision
+    (path / "repodata").mkdir(parents=True)
+    (path / "repodata" / "repomd.xml").write_text(repomd.xml_dump())
+    return get_sha256(str(path / "repodata" / "repomd.xml"))
+
+
+def create_repository(url, revision, repomd_checksum, remote=None, **kwargs):
+    """Create a repository last synced from `url` when it had the given metadata."""
+    name = str(uuid.uuid4())
+    remote = remote or RpmRemote.objects.create(name=name, url=url, policy="on_demand")
+    repository = RpmRepository.objects.create(name=name, remote=remote, **kwargs)
+    repository.last_sync_details = make_sync_details(
+        remote, repository, 0, "additive", [], revision, repomd_checksum, ""
+    )
+    repository.save()
+    return repository
+
+
+@pytest.fixture
+def http_server(tmp_path):
+    """Serve the temporary directory over HTTP, return its url."""
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=str(tmp_path))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    """Record the dispatched syncs instead of dispatching them."""
+    calls = []
+    monkeypatch.setattr(freshness, "dispatch", lambda *args, **kwargs: calls.append(kwargs))
+    return calls
+
+
+@pytest.mark.django_db
+def test_check_repositories_freshness(running_task, dispatched, tmp_path, settings):
+    """Only the repositories whose upstream metadata changed since their last sync are synced."""
+    settings.ALLOWED_IMPORT_PATHS = [str(tmp_path)]
+    checksum = create_upstream(tmp_path / "upstream", "1")
+    url = f"file://{tmp_path}/upstream/"
+    unchanged = create_repository(url, "1", checksum)
+    changed = create_repository(url, "0", "stale")
+    missing = create_repository(f"file://{tmp_path}/missing/", "1", checksum)
+    not_synced = RpmRepository.objects.create(name=str(uuid.uuid4()))
+    repo_pks = [str(repo.pk) for repo in (unchanged, changed, missing, not_synced)]
+
+    freshness.check_repositories_freshness(repo_pks, dry_run=True)
+    assert dispatched == []
+
+    freshness.check_repositories_freshness(repo_pks)
+    synced = {call["kwargs"]["repository_pk"]: call for call in dispatched}
+    assert set(synced) == {str(changed.pk), str(missing.pk)}
+    assert synced[str(changed.pk)]["kwargs"]["sync_policy"] == "additive"
+    assert synced[str(changed.pk)]["kwargs"]["optimize"]
+    assert synced[str(changed.pk)]["exclusive_resources"] == [changed]
+
+
+@pytest.mark.django_db
+def test_check_repositories_of_one_remote(
+    running_task, dispatched, tmp_path, http_server, settings
+):
+    """Repositories sharing a remote are checked with its connection pool, closed afterwards."""
+    settings.RPM_FRESHNESS_CHECK_CONCURRENCY = 1
+    checksum = create_upstream(tmp_path / "upstream", "1")
+    first = create_repository(f"{http_server}upstream/", "1", checksum)
+    second = create_repository(first.remote.url, "1", checksum, remote=first.remote)
+    third = create_repository(first.remote.url, "0", "stale", remote=first.remote)
+
+    freshness.check_repositories_freshness([str(repo.pk) for repo in (first, second, third)])
+    assert [call["kwargs"]["repository_pk"] for call in dispatched] == [str(third.pk)]
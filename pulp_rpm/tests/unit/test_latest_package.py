@@ -0,0 +1,38 @@
+import uuid
+
+import pytest
+from rest_framework.serializers import ValidationError
+
+from pulpcore.plugin.util import get_prn
+
+from pulp_rpm.app.models import LatestPackage, Package
+from pulp_rpm.app.viewsets.package import PackageFilter
+from pulp_rpm.tests.unit.utils.content_factory import RepoContentFactory
+
+
+@pytest.mark.django_db
+def test_latest_packages_are_indexed_with_new_versions():
+    """The newest package of each name and arch is indexed when a version is finalized."""
+    name = f"foo-{uuid.uuid4()}"
+    with RepoContentFactory() as factory:
+        factory.add_package(name, version="1.0")
+        newest = factory.add_package(name, version="1.10")
+        factory.add_package(name, version="1.9")
+        other_arch = factory.add_package(name, version="0.1", arch="x86_64")
+
+    latest = {newest, other_arch}
+    assert set(LatestPackage.get_packages(factory.version)) == latest
+
+    # versions without an index get the same answer from a window function
+    LatestPackage.objects.filter(repository_version=factory.version).delete()
+    assert set(LatestPackage.get_packages(factory.version)) == latest
+
+    data = {"repository_version": get_prn(factory.version), "latest_only": True}
+    assert set(PackageFilter(data=data, queryset=Package.objects.all()).qs) == latest
+
+
+@pytest.mark.django_db
+def test_latest_only_filter_requires_a_repository_version():
+    filterset = PackageFilter(data={"latest_only": True}, queryset=Package.objects.all())
+    with pytest.raises(ValidationError):
+        filterset.qs
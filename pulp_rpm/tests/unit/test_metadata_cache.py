@@ -0,0 +1,56 @@
+from pulp_rpm.app.metadata_cache import MetadataCache, is_metadata_path, metadata_content_type
+
+
+class TestMetadataCache:
+    """Test the in-memory metadata cache used by RpmDistribution."""
+
+    def test_hit_and_stale_token(self):
+        cache = MetadataCache(max_size=100, max_entry_size=10)
+        cache.set("repomd.xml", "pub-1", b"abc", {"Content-Type": "text/xml"})
+
+        entry = cache.get("repomd.xml", "pub-1")
+        assert entry.body == b"abc"
+        assert entry.headers == {"Content-Type": "text/xml"}
+
+        # a distribution serving another publication must not get the old bytes
+        assert cache.get("repomd.xml", "pub-2") is None
+        # ...and the stale entry is gone for good
+        assert cache.get("repomd.xml", "pub-1") is None
+        assert len(cache) == 0
+
+    def test_large_entries_are_recorded_without_body(self):
+        cache = MetadataCache(max_size=100, max_entry_size=10)
+        cache.set("primary.xml.gz", "pub-1", b"x" * 11)
+
+        entry = cache.get("primary.xml.gz", "pub-1")
+        assert entry is not None
+        assert entry.body is None
+
+    def test_least_recently_used_is_evicted(self):
+        cache = MetadataCache(max_size=10, max_entry_size=10)
+        cache.set("a", 1, b"aaaa")
+        cache.set("b", 1, b"bbbb")
+        cache.get("a", 1)
+        cache.set("c", 1, b"cccc")
+
+        assert cache.get("b", 1) is None
+        assert cache.get("a", 1).body == b"aaaa"
+        assert cache.get("c", 1).body == b"cccc"
+
+    def test_disabled(self):
+        assert not MetadataCache(max_size=0, max_entry_size=10).enabled
+
+
+def test_is_metadata_path():
+    assert is_metadata_path("repodata/repomd.xml")
+    assert is_metadata_path("AppStream/repodata/repomd.xml.asc")
+    assert not is_metadata_path("repodata/")
+    assert not is_metadata_path("config.repo")
+    assert not is_metadata_path("Packages/r/repodata.rpm")
+
+
+def test_metadata_content_type():
+    assert metadata_content_type("repodata/repomd.xml") == "text/xml"
+    assert metadata_content_type("repodata/abc-primary.xml.gz") == "application/gzip"
+    assert metadata_content_type("repodata/abc-primary.xml.zst") == "application/zstd"
+    assert metadata_content_type("repodata/repomd.xml.asc") is None
@@ -1,5 +1,11 @@
+import uuid
+
+import pytest
 from django.test import TestCase
 
+from pulp_rpm.app.models import RpmDistribution, RpmPublication
+from pulp_rpm.tests.unit.utils.content_factory import RepoContentFactory
+
 
 class TestNothing(TestCase):
     """Test Nothing (placeholder)."""
@@ -7,3 +13,45 @@ class TestNothing(TestCase):
     def test_nothing_at_all(self):
         """Test that the tests are running and that's it."""
         self.assertTrue(True)
+
+
+def _publish(version):
+    publication = RpmPublication.objects.create(repository_version=version, checksum_type="sha256")
+    publication.complete = True
+    publication.save()
+    return publication
+
+
+@pytest.mark.django_db
+def test_latest_publication_follows_publications():
+    """RpmRepository.latest_publication points at what distributions of the repo serve."""
+    repo_name = str(uuid.uuid4())
+    with RepoContentFactory(repo_name) as factory:
+        factory.add_packages([f"first-{uuid.uuid4()}"])
+    first_version = factory.version
+    repository = factory.get_repository()
+    assert repository.get_latest_publication() is None
+
+    first_publication = _publish(first_version)
+    repository.refresh_from_db()
+    assert repository.latest_publication_id == first_publication.pk
+
+    with RepoContentFactory(repo_name) as factory:
+        factory.add_packages([f"second-{uuid.uuid4()}"])
+    second_publication = _publish(factory.version)
+    # a newer publication of an older version is not served over the latest version
+    republication = _publish(first_version)
+    repository.refresh_from_db()
+    assert repository.latest_publication_id == second_publication.pk
+
+    distribution = RpmDistribution.objects.create(
+        name=repo_name, base_path=repo_name, repository=repository
+    )
+    _, repo_version, publication = distribution.get_repository_publication_and_version()
+    assert publication == second_publication
+    assert repo_version == factory.version
+
+    second_publication.delete()
+    repository.refresh_from_db()
+    assert repository.latest_publication_id == republication.pk
+    assert distribution.get_repository_and_publication()[1] == republication
@@ -2,7 +2,8 @@ import os
 
 import yaml
 
-from pulp_rpm.app.modulemd import disable_pyyaml_magic_casting, parse_modular
+from pulp_rpm.app.modulemd import parse_modular
+from pulp_rpm.app.modulemd_parser import ModulemdLoader
 
 sample_file_data = """
 ---
@@ -134,42 +135,19 @@ def test_parse_modular_preserves_literal_unquoted_values_3285(tmp_path):
     assert modulemd_obsoletes["obsoleted_by_module_stream"] == "5.40"
 
 
-def test_disabling_pyyaml_magic_casting():
-    text = """
-  floaty: 00.123
-  inty: 00123
-  dicty:
-    floaty: 00.123
-    inty: 00123
-  listy:
-    floaty: 00.123
-    inty: 00123
-  """
-    # In yaml 1.1, 00123 is seen as an octal, which is 83 in decimal. Try:
-    # >>> oct(83)
-    # '0o123'
-    # >>> int(0o123)
-    # 83
-    # This first assertion is to prove that - although surprising - this is
-    # the 'default' parsing behavior.
-    result = yaml.load(text, Loader=yaml.SafeLoader)
-    assert result["inty"] == 83
-
-    with disable_pyyaml_magic_casting():
-        result = yaml.load(text, Loader=yaml.SafeLoader)
-        assert result["floaty"] == "00.123"
-        assert result["dicty"]["floaty"] == "00.123"
-        assert result["listy"]["floaty"] == "00.123"
-
-        assert result["inty"] == "00123"
-        assert result["dicty"]["inty"] == "00123"
-        assert result["listy"]["inty"] == "00123"
-
-    result = yaml.load(text, Loader=yaml.SafeLoader)
-    assert result["floaty"] == 0.123
-    assert result["dicty"]["floaty"] == 0.123
-    assert result["listy"]["floaty"] == 0.123
-
-    assert result["inty"] == 83
-    assert result["dicty"]["inty"] == 83
-    assert result["listy"]["inty"] == 83
+def test_parse_modular_in_worker_processes(tmp_path):
+    os.chdir(tmp_path)
+    file_name = "modulemd.yaml"
+    with open(file_name, "w") as file:
+        file.write(sample_file_data)
+
+    assert parse_modular(file_name, workers=2) == parse_modular(file_name, workers=1)
+
+
+def test_modulemd_loader_keeps_numbers_as_written():
+    result = yaml.load("stream: 1.10\nversion: 00123\nstatic_context: true", Loader=ModulemdLoader)
+    assert result == {"stream": "1.10", "version": "00123", "static_context": True}
+    result = yaml.load("dicty:\n  floaty: 00.123\nlisty:\n  - 00123", Loader=ModulemdLoader)
+    assert result == {"dicty": {"floaty": "00.123"}, "listy": ["00123"]}
+    # the global SafeLoader is left alone
+    assert yaml.load("version: 00123", Loader=yaml.SafeLoader) == {"version": 83}
@@ -0,0 +1,58 @@
+import uuid
+
+import pytest
+from rest_framework.serializers import ValidationError
+
+from pulpcore.plugin.util import get_prn
+
+from pulp_rpm.app.models import Package, PackageCapability
+from pulp_rpm.app.viewsets.package import PackageFilter
+from pulp_rpm.tests.unit.utils.content_factory import RepoContentFactory
+
+
+@pytest.mark.django_db
+def test_capabilities_are_indexed_with_new_versions():
+    """Packages added to a repository version get their capabilities indexed."""
+    library = f"libfoo-{uuid.uuid4()}"
+    with RepoContentFactory() as factory:
+        provider_pk, consumer_pk = factory.add_packages([library, f"app-{uuid.uuid4()}"])
+        Package.objects.filter(pk=provider_pk).update(
+            provides=[[f"{library}.so.1()(64bit)", None, None, None, None, False]]
+        )
+        Package.objects.filter(pk=consumer_pk).update(
+            requires=[
+                [f"{library}.so.1()(64bit)", None, None, None, None, False],
+                [library, "GE", "0", "1.0", None, True],
+            ]
+        )
+
+    capabilities = PackageCapability.objects.filter(package_id=consumer_pk, kind="requires")
+    assert capabilities.count() == 2
+    versioned = capabilities.get(name=library)
+    assert (versioned.flags, versioned.epoch, versioned.version, versioned.pre) == (
+        "GE",
+        "0",
+        "1.0",
+        True,
+    )
+
+    # indexing again is a no-op
+    PackageCapability.index_packages(Package.objects.filter(pk=provider_pk))
+    assert PackageCapability.objects.filter(package_id=provider_pk).count() == 1
+
+    def filter_packages(**filters):
+        data = {"repository_version": get_prn(factory.version), **filters}
+        return list(PackageFilter(data=data, queryset=Package.objects.all()).qs)
+
+    assert filter_packages(whatprovides=f"{library}.so.1()(64bit)") == [
+        Package.objects.get(pk=provider_pk)
+    ]
+    assert filter_packages(whatrequires=library) == [Package.objects.get(pk=consumer_pk)]
+    assert filter_packages(whatconflicts=library) == []
+
+
+@pytest.mark.django_db
+def test_capability_filters_require_a_repository_version():
+    filterset = PackageFilter(data={"whatprovides": "foo"}, queryset=Package.objects.all())
+    with pytest.raises(ValidationError):
+        filterset.qs
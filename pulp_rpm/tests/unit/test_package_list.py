@@ -0,0 +1,83 @@
+import uuid
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from pulp_rpm.app.models import Package
+from pulp_rpm.app.pagination import PackageKeysetPagination
+from pulp_rpm.app.viewsets import PackageViewSet
+from pulp_rpm.tests.unit.utils.content_factory import create_package
+
+
+def _get(params):
+    return Request(APIRequestFactory().get("/pulp/api/v3/content/rpm/packages/", params))
+
+
+@pytest.mark.django_db
+def test_keyset_pagination_walks_packages_by_name_and_evr():
+    prefix = f"foo-{uuid.uuid4()}"
+    for name, version in [("b", "1.10"), ("a", "2"), ("b", "1.9"), ("a", "10"), ("b", "1.9~rc1")]:
+        create_package(f"{prefix}-{name}", version=version, arch="noarch")
+    queryset = Package.objects.filter(name__startswith=prefix)
+
+    walked = []
+    params = {"cursor": "", "limit": 2}
+    while params:
+        paginator = PackageKeysetPagination()
+        page = paginator.paginate_queryset(queryset, _get(params))
+        walked.extend((package.name.removeprefix(prefix), package.version) for package in page)
+        response = paginator.get_paginated_response([])
+        assert response.data["count"] is None
+        next_link = response.data["next"]
+        params = next_link and {k: v[0] for k, v in parse_qs(urlparse(next_link).query).items()}
+
+    assert walked == [("-a", "2"), ("-a", "10"), ("-b", "1.9~rc1"), ("-b", "1.9"), ("-b", "1.10")]
+
+    with pytest.raises(NotFound):
+        PackageKeysetPagination().paginate_queryset(queryset, _get({"cursor": "garbage"}))
+    with pytest.raises(ValidationError):
+        PackageKeysetPagination().paginate_queryset(
+            queryset, _get({"cursor": "", "ordering": "-pulp_created"})
+        )
+    assert PackageKeysetPagination().keyset_columns(Package) == (
+        '"rpm_package"."name", "rpm_package"."evr_v2", "rpm_package"."content_ptr_id"'
+    )
+
+    # without a cursor, it is plain limit/offset pagination
+    paginator = PackageKeysetPagination()
+    assert len(paginator.paginate_queryset(queryset, _get({"limit": 2}))) == 2
+    assert paginator.get_paginated_response([]).data["count"] == 5
+
+
+@pytest.mark.django_db
+def test_package_list_defers_heavy_columns():
+    def deferred_columns(params):
+        request = APIRequestFactory().get("/pulp/api/v3/content/rpm/packages/", params)
+        force_authenticate(
+            request,
+            user=get_user_model().objects.create(username=str(uuid.uuid4()), is_superuser=True),
+        )
+        viewset = PackageViewSet(
+            action="list", action_map={"get": "list"}, request=Request(request)
+        )
+        queryset = viewset.get_queryset()
+        return queryset.query.deferred_loading[0], set(queryset.query.select_related or ())
+
+    deferred, related = deferred_columns({})
+    assert deferred == set()
+    assert related == {"changelog", "filelist"}
+
+    deferred, related = deferred_columns({"fields": "name,version,files"})
+    assert {"changelogs", "changelog", "requires", "provides", "description"} <= deferred
+    assert not {"files", "filelist"} & deferred
+    assert related == {"filelist"}
+
+    deferred, _ = deferred_columns({"exclude_fields": "files"})
+    assert deferred == {"files", "filelist"}
+
+    deferred, _ = deferred_columns({"minimal": "true"})
+    assert {"files", "changelogs", "requires"} <= deferred
@@ -0,0 +1,139 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from pulp_rpm.app.models import Package, PackageChangelog, PackageFileDirectory, PackageFilelist
+from pulp_rpm.app.package_maintenance import (
+    MaintenanceState,
+    compact_shared_filelists,
+    partition_packages,
+    process_packages,
+    trim_shared_changelogs,
+)
+from pulp_rpm.tests.unit.utils import content_factory
+
+CHANGELOGS = [
+    ["Packager <packager@example.com>", 1700000003, "- third"],
+    ["Packager <packager@example.com>", 1700000001, "- first"],
+    ["Packager <packager@example.com>", 1700000004, "- fourth"],
+    ["Packager <packager@example.com>", 1700000002, "- second"],
+    ["Packager <packager@example.com>", 1700000004, "- fourth, again"],
+]
+FILES = [
+    ["", "/usr/bin/", "tool"],
+    ["dir", "/usr/share/tool/", ""],
+    ["", "/usr/bin/", "tool"],
+]
+
+
+def create_package(changelogs=CHANGELOGS, files=FILES, **kwargs):
+    return content_factory.create_package(changelogs=changelogs, files=files, **kwargs)
+
+
+@pytest.mark.django_db
+def test_process_packages():
+    """The newest changelogs are kept in chronological order, duplicated files are removed."""
+    packages = [create_package() for _package in range(3)]
+    short = create_package(changelogs=CHANGELOGS[:1], files=FILES[:2])
+    updated = []
+    process_packages(
+        changelog_limit=2,
+        compact_files=True,
+        chunk_size=2,
+        progress=lambda *counts: updated.append(counts),
+    )
+
+    for package in packages:
+        package.refresh_from_db()
+        assert package.changelogs == [CHANGELOGS[2], CHANGELOGS[4]]
+        assert package.files == FILES[:2]
+    short.refresh_from_db()
+    assert (short.changelogs, short.files) == (CHANGELOGS[:1], FILES[:2])
+    # the rows already within the limits were not updated
+    assert [sum(counts) for counts in zip(*updated)] == [3, 3]
+
+    # nothing is left to update
+    updated.clear()
+    process_packages(
+        changelog_limit=2,
+        compact_files=True,
+        chunk_size=2,
+        progress=lambda *counts: updated.append(counts),
+    )
+    assert [sum(counts) for counts in zip(*updated)] == [0, 0]
+
+
+@pytest.mark.django_db
+def test_resume(tmp_path):
+    """A run is resumed from the partition progress saved by an interrupted run."""
+    packages = sorted([create_package() for _package in range(4)], key=lambda package: package.pk)
+    options = {"changelog_limit": 2, "compact_files": False}
+    state_path = str(tmp_path / "state.json")
+    # the first two packages were processed by the interrupted run
+    state = MaintenanceState(partition_packages(1), options, state_path)
+    state.advance(0, str(packages[1].pk))
+
+    process_packages(changelog_limit=2, state_path=state_path)
+    changelogs = [len(package.changelogs) for package in Package.objects.order_by("pk")]
+    assert changelogs == [5, 5, 2, 2]
+    # the state of a completed run is removed, a new run starts over
+    process_packages(changelog_limit=2, state_path=state_path)
+    changelogs = [len(package.changelogs) for package in Package.objects.order_by("pk")]
+    assert changelogs == [2, 2, 2, 2]
+
+
+@pytest.mark.django_db
+def test_trim_shared_changelogs():
+    """Packages sharing changelogs are pointed to the trimmed shared changelogs."""
+    shared = PackageChangelog.from_changelogs(CHANGELOGS)
+    shared.save()
+    packages = [create_package(changelogs=[], changelog=shared) for _package in range(2)]
+
+    assert trim_shared_changelogs(2) == 1
+    trimmed = PackageChangelog.from_changelogs([CHANGELOGS[2], CHANGELOGS[4]])
+    assert list(PackageChangelog.objects.values_list("digest", flat=True)) == [trimmed.digest]
+    for package in packages:
+        package.refresh_from_db()
+        assert package.get_changelogs() == trimmed.entries
+
+
+@pytest.mark.django_db
+def test_compact_shared_filelists():
+    """Packages sharing files are pointed to the compacted shared filelists."""
+    directory_ids = PackageFileDirectory.get_ids({path for _typ, path, _name in FILES})
+    shared = PackageFilelist.from_files(FILES, directory_ids)
+    shared.save()
+    packages = [create_package(files=[], filelist=shared) for _package in range(2)]
+
+    assert compact_shared_filelists() == 1
+    compacted = PackageFilelist.from_files(FILES[:2], directory_ids)
+    assert list(PackageFilelist.objects.values_list("digest", flat=True)) == [compacted.digest]
+    for package in packages:
+        package.refresh_from_db()
+        assert package.get_files() == FILES[:2]
+
+
+# The workers update the packages with connections of their own
+@pytest.mark.django_db(transaction=True, serialized_rollback=True)
+def test_trim_changelogs_command(tmp_path):
+    """The command trims the changelogs of all packages with parallel workers."""
+    packages = [create_package() for _package in range(5)]
+    state_path = tmp_path / "state.json"
+    output = StringIO()
+    call_command(
+        "rpm-trim-changelogs",
+        "--changelog-limit=3",
+        "--workers=2",
+        "--chunk-size=2",
+        f"--state-file={state_path}",
+        stdout=output,
+    )
+    for package in packages:
+        package.refresh_from_db()
+        assert json.dumps(package.changelogs) == json.dumps(
+            [CHANGELOGS[0], CHANGELOGS[2], CHANGELOGS[4]]
+        )
+        assert package.files == FILES
+    assert not state_path.exists()
@@ -0,0 +1,124 @@
+import uuid
+
+import pytest
+from django.core.management import call_command
+
+from pulpcore.plugin.models import Content
+
+from pulp_rpm.app.models import Package, PackageChangelog, PackageFileDirectory, PackageFilelist
+from pulp_rpm.tests.unit.utils.content_factory import create_package
+
+FILES = [
+    ["dir", "/usr/share/doc/", "foo"],
+    [None, "/usr/share/doc/foo/", "README"],
+    [None, "/usr/bin/", "foo"],
+    ["ghost", "/var/log/", "foo.log"],
+]
+CHANGELOGS = [
+    ["Jane Doe <jdoe@example.com> - 1.0-1", 1700000000, "- Initial package"],
+    ["Jane Doe <jdoe@example.com> - 1.0-2", 1700086400, "- Rebuilt"],
+]
+
+
+def _create_package(name, files, changelogs=()):
+    return create_package(name, arch="noarch", files=files, changelogs=list(changelogs))
+
+
+@pytest.mark.django_db
+def test_deduplicated_files_round_trip(settings):
+    """Packages with the same files share one filelist and keep their files exactly."""
+    settings.RPM_DEDUPLICATE_PACKAGE_METADATA = True
+    first = _create_package(f"foo-{uuid.uuid4()}", FILES)
+    rebuild = _create_package(f"foo-{uuid.uuid4()}", FILES)
+    other = _create_package(f"foo-{uuid.uuid4()}", FILES[:2])
+
+    first = Package.objects.get(pk=first.pk)
+    assert first.files == []
+    assert first.filelist_id == Package.objects.get(pk=rebuild.pk).filelist_id
+    assert first.filelist_id != Package.objects.get(pk=other.pk).filelist_id
+    assert (
+        PackageFileDirectory.objects.filter(
+            path__in=["/usr/share/doc/", "/usr/share/doc/foo/", "/usr/bin/", "/var/log/"]
+        ).count()
+        == 4
+    )
+
+    assert first.get_files() == FILES
+    assert sorted(first.to_createrepo_c().files, key=str) == sorted(map(tuple, FILES), key=str)
+
+
+@pytest.mark.django_db
+def test_directory_paths_cache_overflow(monkeypatch):
+    """Directories already cached are still returned when the cache overflows and is cleared."""
+    ids = PackageFileDirectory.get_ids([f"/opt/{uuid.uuid4()}/" for _path in range(4)])
+    monkeypatch.setattr(PackageFileDirectory, "_paths", {})
+    monkeypatch.setattr(PackageFileDirectory, "CACHE_SIZE", 3)
+    by_id = {id: path for path, id in ids.items()}
+    first, second, *others = by_id
+
+    assert PackageFileDirectory.get_paths([first, second]) == {
+        first: by_id[first],
+        second: by_id[second],
+    }
+    paths = PackageFileDirectory.get_paths(by_id)
+    assert paths == by_id
+    assert paths is not PackageFileDirectory._paths
+
+
+@pytest.mark.django_db
+def test_files_are_inline_by_default():
+    package = _create_package(f"foo-{uuid.uuid4()}", FILES)
+    package = Package.objects.get(pk=package.pk)
+    assert package.filelist is None
+    assert package.files == package.get_files() == FILES
+    assert not PackageFilelist.objects.filter(packages=package).exists()
+
+
+@pytest.mark.django_db
+def test_unused_shared_metadata_is_deleted(settings):
+    """The filelist and changelogs of deleted packages are deleted with the last package."""
+    settings.RPM_DEDUPLICATE_PACKAGE_METADATA = True
+    package = _create_package(f"foo-{uuid.uuid4()}", FILES, CHANGELOGS)
+    rebuild = _create_package(f"foo-{uuid.uuid4()}", FILES, CHANGELOGS)
+    package = Package.objects.get(pk=package.pk)
+
+    Package.objects.filter(pk=package.pk).delete()
+    assert PackageFilelist.objects.filter(pk=package.filelist_id).exists()
+    assert PackageChangelog.objects.filter(pk=package.changelog_id).exists()
+
+    Content.objects.filter(pk=rebuild.pk).delete()
+    assert not PackageFilelist.objects.filter(pk=package.filelist_id).exists()
+    assert not PackageChangelog.objects.filter(pk=package.changelog_id).exists()
+
+    recreated = _create_package(f"foo-{uuid.uuid4()}", FILES)
+    assert Package.objects.get(pk=recreated.pk).get_files() == FILES
+
+
+@pytest.mark.django_db
+def test_signed_twins_share_changelogs(settings):
+    """A package and its rebuilt or re-signed twin reference the same changelog row."""
+    settings.RPM_DEDUPLICATE_PACKAGE_METADATA = True
+    unsigned = _create_package(f"foo-{uuid.uuid4()}", FILES, CHANGELOGS)
+    signed = _create_package(f"foo-{uuid.uuid4()}", FILES, CHANGELOGS)
+
+    unsigned = Package.objects.get(pk=unsigned.pk)
+    assert unsigned.changelogs == []
+    assert unsigned.changelog_id == Package.objects.get(pk=signed.pk).changelog_id
+    assert unsigned.get_changelogs() == CHANGELOGS
+    assert sorted(unsigned.to_createrepo_c().changelogs) == sorted(map(tuple, CHANGELOGS))
+
+
+@pytest.mark.django_db
+def test_deduplicate_package_metadata_command(settings):
+    inline = _create_package(f"foo-{uuid.uuid4()}", FILES, CHANGELOGS)
+    unused = PackageChangelog.objects.create(digest="0" * 64, entries=[])
+    unused_directory = PackageFileDirectory.objects.create(path=f"/opt/{uuid.uuid4()}/")
+
+    call_command("rpm-deduplicate-package-metadata")
+
+    inline = Package.objects.get(pk=inline.pk)
+    assert (inline.files, inline.changelogs) == ([], [])
+    assert (inline.get_files(), inline.get_changelogs()) == (FILES, CHANGELOGS)
+    assert not PackageChangelog.objects.filter(pk=unused.pk).exists()
+    assert not PackageFileDirectory.objects.filter(pk=unused_directory.pk).exists()
+    assert PackageFileDirectory.objects.filter(path="/usr/share/doc/foo/").exists()
@@ -0,0 +1,96 @@
+import cProfile
+import json
+
+import pytest
+
+from pulpcore.plugin.models import Task
+
+from pulp_rpm.app.models import Package
+from pulp_rpm.app.profiling import profile_checkpoint, profiled
+
+
+@profiled
+def count_packages():
+    profile_checkpoint("first")
+    packages = [Package(name=f"package{n}") for n in range(1000)]
+    profile_checkpoint("second")
+    return len(packages) + Package.objects.count()
+
+
+@pytest.mark.django_db
+def test_task_not_profiled(running_task, settings):
+    """Tasks are only profiled on request."""
+    settings.RPM_TASK_PROFILING = []
+    assert count_packages() == 1000
+    assert not running_task.profile_artifacts.exists()
+
+
+@pytest.mark.django_db
+def test_task_profiled(running_task, settings):
+    """The profile and the checkpoints of a task are attached to it."""
+    settings.RPM_TASK_PROFILING = ["count_packages"]
+    settings.RPM_TASK_PROFILING_TRACEMALLOC = True
+    assert count_packages() == 1000
+
+    artifacts = {
+        profile_artifact.name: profile_artifact.artifact
+        for profile_artifact in Task.profile_artifacts.through.objects.filter(task=running_task)
+    }
+    assert set(artifacts) == {
+        "rpm_count_packages_profile",
+        "rpm_count_packages_profile_summary",
+        "rpm_count_packages_checkpoints",
+    }
+    with artifacts["rpm_count_packages_profile_summary"].file.open() as summary:
+        assert b"count_packages" in summary.read()
+    with artifacts["rpm_count_packages_checkpoints"].file.open() as checkpoints_file:
+        checkpoints = json.load(checkpoints_file)["checkpoints"]
+    assert [checkpoint["label"] for checkpoint in checkpoints] == ["first", "second", "end"]
+    # the packages were allocated between the first and the second checkpoint
+    assert checkpoints[1]["traced_memory"] > checkpoints[0]["traced_memory"]
+    assert checkpoints[1]["top_allocations"]
+
+
+@pytest.mark.django_db
+def test_task_profiled_on_request(running_task, settings):
+    """A task dispatched with the rpm-profile diagnostic is profiled if it is enabled."""
+    settings.RPM_TASK_PROFILING = []
+    running_task.profile_options = ["rpm-profile"]
+
+    settings.TASK_DIAGNOSTICS = []
+    count_packages()
+    assert not running_task.profile_artifacts.exists()
+
+    settings.TASK_DIAGNOSTICS = ["rpm-profile"]
+    count_packages()
+    assert running_task.profile_artifacts.count() == 3
+
+
+@pytest.mark.django_db
+def test_task_memory_traced_on_request(running_task, settings):
+    """The rpm-tracemalloc diagnostic traces the memory of a task which is not profiled."""
+    settings.RPM_TASK_PROFILING = []
+    settings.TASK_DIAGNOSTICS = ["rpm-tracemalloc"]
+    running_task.profile_options = ["rpm-tracemalloc"]
+    count_packages()
+
+    profile_artifact = Task.profile_artifacts.through.objects.get(task=running_task)
+    assert profile_artifact.name == "rpm_count_packages_checkpoints"
+    with profile_artifact.artifact.file.open() as checkpoints_file:
+        checkpoints = json.load(checkpoints_file)["checkpoints"]
+    assert checkpoints[1]["traced_memory"] > checkpoints[0]["traced_memory"]
+
+
+@pytest.mark.django_db
+def test_task_profiled_otherwise(running_task, settings, monkeypatch):
+    """Tasks are not profiled when another profiler is already active."""
+
+    def enable(profiler):
+        raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(cProfile.Profile, "enable", enable)
+    settings.RPM_TASK_PROFILING = ["count_packages"]
+    assert count_packages() == 1000
+
+    profile_artifact = Task.profile_artifacts.through.objects.get(task=running_task)
+    assert profile_artifact.name == "rpm_count_packages_checkpoints"
@@ -0,0 +1,77 @@
+import uuid
+
+import createrepo_c as cr
+import pytest
+
+from pulp_rpm.app.models import Package, RpmPublication, RpmRepository
+from pulp_rpm.app.tasks.publishing import publish
+from pulp_rpm.tests.unit.utils.content_factory import create_package
+
+PACKAGES = [
+    ("tool", "x86_64"),
+    ("tool", "aarch64"),
+    ("tool", "i686"),
+    ("tool-data", "noarch"),
+    ("tool-debuginfo", "x86_64"),
+    ("tool-debugsource", "x86_64"),
+    ("kernel-debuginfo-common-x86_64", "x86_64"),
+    ("tool", "src"),
+]
+
+
+@pytest.fixture
+def version():
+    packages = [create_package(name, arch=arch) for name, arch in PACKAGES]
+    repository = RpmRepository.objects.create(name=str(uuid.uuid4()))
+    with repository.new_version() as version:
+        version.add_content(Package.objects.filter(pk__in=[package.pk for package in packages]))
+    return version
+
+
+def published_packages(version, **filters):
+    """Publish the version, return the (name, arch) of the published and listed packages."""
+    publish(repository_version_pk=str(version.pk), repo_config={}, **filters)
+    publication = RpmPublication.objects.filter(repository_version=version).latest("pulp_created")
+    published_artifacts = {
+        published_artifact.relative_path: published_artifact.content_artifact.artifact
+        for published_artifact in publication.published_artifact.select_related("content_artifact")
+    }
+    packages = {
+        (package.name, package.arch)
+        for package in Package.objects.filter(
+            contentartifact__published_artifact__publication=publication
+        )
+    }
+
+    repomd_path = publication.published_artifact.get(relative_path="repodata/repomd.xml")
+    repomd = cr.Repomd(repomd_path.content_artifact.artifact.file.path)
+    primary = next(record for record in repomd.records if record.type == "primary")
+    listed = set()
+    cr.xml_parse_primary(
+        published_artifacts[primary.location_href].file.path,
+        pkgcb=lambda package: listed.add((package.name, package.arch)),
+        do_files=False,
+    )
+    assert listed == packages
+    return packages
+
+
+@pytest.mark.django_db
+def test_publication_filters(running_task, version):
+    """Only the packages matching the filters of a publication are published and listed."""
+    assert published_packages(version) == set(PACKAGES)
+    assert published_packages(version, arches=["x86_64"]) == {
+        ("tool", "x86_64"),
+        ("tool-data", "noarch"),
+        ("tool-debuginfo", "x86_64"),
+        ("tool-debugsource", "x86_64"),
+        ("kernel-debuginfo-common-x86_64", "x86_64"),
+    }
+    assert published_packages(version, exclude_debuginfo=True, exclude_source=True) == {
+        ("tool", "x86_64"),
+        ("tool", "aarch64"),
+        ("tool", "i686"),
+        ("tool-data", "noarch"),
+    }
+    publication = RpmPublication.objects.filter(repository_version=version).latest("pulp_created")
+    assert (publication.exclude_debuginfo, publication.exclude_source) == (True, True)
@@ -0,0 +1,76 @@
+import uuid
+
+import pytest
+
+from pulpcore.plugin.models import Artifact, ContentArtifact, PublishedMetadata
+
+from pulp_rpm.app.constants import CHECKSUM_TYPES, COMPRESSION_TYPES
+from pulp_rpm.app.models import Package, RpmPublication, RpmRepository
+from pulp_rpm.app.tasks.publishing import content_fingerprint, publish
+from pulp_rpm.tests.unit.utils.content_factory import create_package
+
+
+def create_version(packages):
+    repository = RpmRepository.objects.create(name=str(uuid.uuid4()))
+    with repository.new_version() as version:
+        version.add_content(Package.objects.filter(pk__in=[package.pk for package in packages]))
+    return version
+
+
+def publish_version(version, **kwargs):
+    publish(
+        repository_version_pk=str(version.pk),
+        checksum_type=CHECKSUM_TYPES.SHA256,
+        repo_config={},
+        **kwargs,
+    )
+    return RpmPublication.objects.get(repository_version=version, **kwargs)
+
+
+def published_metadata(publication):
+    return {
+        content_artifact.relative_path: content_artifact.artifact_id
+        for content_artifact in ContentArtifact.objects.filter(
+            content__in=PublishedMetadata.objects.filter(publication=publication)
+        )
+    }
+
+
+def published_paths(publication):
+    return set(publication.published_artifact.values_list("relative_path", flat=True))
+
+
+@pytest.mark.django_db
+def test_content_fingerprint():
+    """Versions of different repositories with the same content have the same fingerprint."""
+    packages = [create_package() for _package in range(3)]
+    version = create_version(packages)
+    assert content_fingerprint(create_version(reversed(packages))) == content_fingerprint(version)
+    assert content_fingerprint(create_version(packages[:2])) != content_fingerprint(version)
+    assert content_fingerprint(create_version([])) is not None
+
+
+@pytest.mark.django_db
+def test_reuse_publication(running_task, settings):
+    """The metadata of a publication of the same content with the same settings is reused."""
+    settings.RPM_PUBLISH_REUSE_METADATA = True
+    packages = [create_package() for _package in range(3)]
+    first = publish_version(create_version(packages))
+    artifacts = Artifact.objects.count()
+
+    reused = publish_version(create_version(packages))
+    assert reused.complete
+    assert reused.content_fingerprint == first.content_fingerprint
+    assert published_metadata(reused) == published_metadata(first)
+    assert published_paths(reused) == published_paths(first)
+    assert Artifact.objects.count() == artifacts
+
+    # the metadata of publications with other settings or content is generated
+    other_compression = publish_version(
+        create_version(packages), compression_type=COMPRESSION_TYPES.ZSTD
+    )
+    other_content = publish_version(create_version(packages[:2]))
+    for publication in (other_compression, other_content):
+        assert not set(published_metadata(publication).values()) & set(
+            published_metadata(first).values()
+        )
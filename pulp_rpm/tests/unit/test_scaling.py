@@ -0,0 +1,328 @@
+"""
+Query count and memory budgets of the hot paths, measured on fixture repositories of two sizes.
+
+Each operation is run on content of SMALL_COUNT and SMALL_COUNT * SCALE_FACTOR units. The same
+queries must be issued for both sizes (a query issued once per unit is an N+1 regression) and
+the peak memory allocated by Python must grow sub-linearly and stay within a budget.
+"""
+
+import asyncio
+import json
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from pulpcore.plugin.models import Artifact, Content, ContentArtifact
+from pulpcore.plugin.stages import DeclarativeArtifact, DeclarativeContent
+
+from pulp_rpm.app.bulk_insert import copy_insert_packages
+from pulp_rpm.app.constants import CHECKSUM_TYPES
+from pulp_rpm.app.models import (
+    Package,
+    RpmPublication,
+    RpmRemote,
+    RpmRepository,
+    UpdateCollection,
+    UpdateCollectionPackage,
+    UpdateRecord,
+    UpdateReference,
+)
+from pulp_rpm.app.tasks.copy import copy_content
+from pulp_rpm.app.tasks.publishing import publish
+from pulp_rpm.app.tasks.synchronizing import RpmContentSaver
+from pulp_rpm.tests.unit.utils.content_factory import build_package
+from pulp_rpm.tests.unit.utils.query_recorder import QueryRecorder, detect_n1
+
+SMALL_COUNT = 20
+SCALE_FACTOR = 10
+LARGE_COUNT = SMALL_COUNT * SCALE_FACTOR
+# Peak memory allocated by Python for LARGE_COUNT units
+MEMORY_BUDGET = 32 * 1024 * 1024
+
+
+@dataclass
+class Measurement:
+    recorder: QueryRecorder
+    peak_memory: int
+
+
+def measure(operation, *args, **kwargs):
+    """Run the operation, recording its queries and the peak memory allocated by Python."""
+    recorder = QueryRecorder()
+    tracemalloc.start()
+    try:
+        with recorder:
+            operation(*args, **kwargs)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return Measurement(recorder=recorder, peak_memory=peak_memory)
+
+
+def assert_scales(name, small, large, save_artifact):
+    """The operation issued the same queries for both sizes and stayed within the budget."""
+    save_artifact(small.recorder.summary_text(include_sql=True), suffix="small")
+    offenders = detect_n1(small.recorder.get_queries(), large.recorder.get_queries())
+    passed = not offenders  # keeps error msg clean
+    assert passed, (
+        json.dumps(offenders, indent=4)
+        + f"\n\n[{name}] {len(offenders)} quer(ies) fired a different number of times between "
+        f"runs:\n"
+    )
+    assert large.peak_memory < small.peak_memory * SCALE_FACTOR, (
+        f"[{name}] peak memory grew from {small.peak_memory} to {large.peak_memory} bytes"
+    )
+    assert large.peak_memory < MEMORY_BUDGET, (
+        f"[{name}] peak memory of {large.peak_memory} bytes exceeds the budget"
+    )
+
+
+def _package(name, version="1.0"):
+    return build_package(
+        name,
+        version=version,
+        summary=f"Package {name}",
+        description=f"Package {name}, version {version}.",
+        location_href=f"Packages/{name}-{version}-1.x86_64.rpm",
+        rpm_sourcerpm=f"{name}-{version}-1.src.rpm",
+        requires=[[f"{name}-libs", None, None, None, None, False]],
+        provides=[[name, "EQ", "0", version, "1", False]],
+        files=[[None, f"/usr/share/{name}/", f"file{n}"] for n in range(10)],
+        changelogs=[
+            ["Packager <packager@example.com>", 1700000000 + n, "- change"] for n in range(3)
+        ],
+    )
+
+
+def _advisory(advisory_id):
+    return UpdateRecord(
+        id=advisory_id,
+        updated_date="2024-01-01 00:00:00",
+        issued_date="2024-01-01 00:00:00",
+        description="",
+        fromstr="",
+        status="final",
+        title=advisory_id,
+        summary="",
+        version="1",
+        type="bugfix",
+        severity="",
+        solution="",
+        release="1",
+        rights="",
+        pushcount="",
+        digest=uuid.uuid4().hex,
+    )
+
+
+def _advisory_relations(package_names):
+    collection = UpdateCollection(name="collection", shortname="collection")
+    packages = [
+        UpdateCollectionPackage(
+            name=name,
+            epoch="0",
+            version="1.0",
+            release="1",
+            arch="x86_64",
+            filename=f"{name}-1.0-1.x86_64.rpm",
+            src="",
+            sum="",
+        )
+        for name in package_names
+    ]
+    references = [UpdateReference(href=f"https://example.com/{name}") for name in package_names]
+    return {"collections": {collection: packages}, "references": references}
+
+
+def create_repository(count):
+    """A repository version of `count` packages and `count / 10` advisories referencing them."""
+    prefix = uuid.uuid4().hex[:8]
+    packages = copy_insert_packages([_package(f"{prefix}-pkg{n}") for n in range(count)])
+    ContentArtifact.objects.bulk_create(
+        [
+            ContentArtifact(content=package, relative_path=package.location_href)
+            for package in packages
+        ]
+    )
+    advisory_pks = []
+    for n in range(max(count // 10, 1)):
+        advisory = _advisory(f"{prefix}-ADV-{n}")
+        advisory.save()
+        for collection, collection_packages in _advisory_relations(
+            [package.name for package in packages[n * 10 : (n + 1) * 10]]
+        )["collections"].items():
+            collection.update_record = advisory
+            collection.save()
+            for collection_package in collection_packages:
+                collection_package.update_collection = collection
+            UpdateCollectionPackage.objects.bulk_create(collection_packages)
+        advisory_pks.append(advisory.pk)
+    repository = RpmRepository.objects.create(name=prefix)
+    with repository.new_version() as version:
+        version.add_content(Content.objects.filter(pk__in=[p.pk for p in packages] + advisory_pks))
+    return version
+
+
+def run_stage(stage, batch):
+    """Run a stage on the units of the batch, return the units it passed on."""
+    in_q, out_q = asyncio.Queue(), asyncio.Queue()
+    stage._connect(in_q, out_q)
+
+    async def run():
+        for d_content in batch:
+            in_q.put_nowait(d_content)
+        in_q.put_nowait(None)
+        await stage()
+
+    # the queries of the stage are run in this thread, in the transaction of the test
+    async_to_sync(run)()
+    return list(iter(out_q.get_nowait, None))
+
+
+@pytest.mark.django_db
+def test_content_saver(save_artifact, tmp_path):
+    """Saving synced packages and advisories takes the same queries for any batch size."""
+    remote = RpmRemote.objects.create(name=str(uuid.uuid4()), url="https://example.com/")
+
+    def save_batch(count):
+        prefix = uuid.uuid4().hex[:8]
+        packages = []
+        advisories = []
+        for n in range(count):
+            package = _package(f"{prefix}-pkg{n}")
+            # immediately downloaded
+            path = tmp_path / f"{prefix}-{n}"
+            path.write_bytes(uuid.uuid4().bytes)
+            artifact = Artifact.init_and_validate(str(path))
+            artifact.save()
+            d_artifact = DeclarativeArtifact(
+                artifact=artifact,
+                url=f"https://example.com/{package.location_href}",
+                relative_path=package.location_href,
+                remote=remote,
+            )
+            packages.append(DeclarativeContent(content=package, d_artifacts=[d_artifact]))
+            advisory = _advisory(f"{prefix}-ADV-{n}")
+            advisory_content = DeclarativeContent(content=advisory)
+            advisory_content.extra_data = _advisory_relations([package.name])
+            advisories.append(advisory_content)
+
+        packages_saved = measure(run_stage, RpmContentSaver(), packages)
+        assert (
+            ContentArtifact.objects.filter(
+                content__in=[d_content.content for d_content in packages], artifact__isnull=False
+            ).count()
+            == count
+        )
+        # the inserted packages are not looked up again as content saved before
+        assert not [
+            query
+            for query in packages_saved.recorder.get_queries()
+            if query.statement_type == "SELECT" and '"core_contentartifact"' in query.sql
+        ]
+        # pulpcore saves the other content one by one
+        for d_content in advisories:
+            d_content.content.save()
+        post_save = measure(RpmContentSaver()._post_save, advisories)
+        return packages_saved, post_save
+
+    small_packages, small_post_save = save_batch(SMALL_COUNT)
+    large_packages, large_post_save = save_batch(LARGE_COUNT)
+    assert_scales("packages", small_packages, large_packages, save_artifact)
+    assert_scales("post_save", small_post_save, large_post_save, save_artifact)
+
+
+@pytest.mark.django_db
+def test_publish(running_task, save_artifact):
+    """Publishing takes the same queries for any number of packages and advisories."""
+
+    def run_publish(count):
+        version = create_repository(count)
+        measurement = measure(
+            publish,
+            repository_version_pk=str(version.pk),
+            checksum_type=CHECKSUM_TYPES.SHA256,
+            repo_config={},
+        )
+        assert RpmPublication.objects.get(repository_version=version).complete
+        return measurement
+
+    assert_scales("publish", run_publish(SMALL_COUNT), run_publish(LARGE_COUNT), save_artifact)
+
+
+@pytest.mark.django_db
+def test_copy_with_dependencies(save_artifact):
+    """Copying advisories with their packages takes the same queries for any size."""
+
+    def run_copy(count):
+        version = create_repository(count)
+        destination = RpmRepository.objects.create(name=str(uuid.uuid4()))
+        advisories = version.get_content(UpdateRecord.objects).values_list("pk", flat=True)
+        config = [
+            {
+                "source_repo_version": version.pk,
+                "dest_repo": destination.pk,
+                "content": [str(pk) for pk in advisories],
+            }
+        ]
+        measurement = measure(copy_content, config, dependency_solving=False)
+        assert destination.latest_version().content.count() == version.content.count()
+        return measurement
+
+    assert_scales("copy", run_copy(SMALL_COUNT), run_copy(LARGE_COUNT), save_artifact)
+
+
+@pytest.mark.django_db
+def test_finalize_new_version(save_artifact):
+    """
+    Finalizing a version updating packages and advisories takes the same queries for any size.
+
+    The new version replaces every advisory by one with the same id and a different digest,
+    which resolve_advisories() has to merge with the one already in the repository.
+    """
+
+    def run_finalize(count):
+        version = create_repository(count)
+        packages = copy_insert_packages(
+            [
+                _package(package.name, version="2.0")
+                for package in version.get_content(Package.objects)
+            ]
+        )
+        updated_advisories = []
+        for advisory in version.get_content(UpdateRecord.objects):
+            updated = _advisory(advisory.id)
+            updated.updated_date = "2024-02-01 00:00:00"
+            updated.save()
+            collection = UpdateCollection.objects.create(
+                update_record=updated, name="collection", shortname="collection"
+            )
+            UpdateCollectionPackage.objects.bulk_create(
+                [
+                    UpdateCollectionPackage(
+                        update_collection=collection,
+                        name=package.name,
+                        epoch="0",
+                        version="2.0",
+                        release="1",
+                        arch="x86_64",
+                        filename=f"{package.name}-2.0-1.x86_64.rpm",
+                        src="",
+                        sum="",
+                    )
+                    for package in advisory.collections.get().packages.all()
+                ]
+            )
+            updated_advisories.append(updated.pk)
+        new_content = Content.objects.filter(pk__in=[p.pk for p in packages] + updated_advisories)
+
+        def add_content():
+            with version.repository.new_version() as new_version:
+                new_version.add_content(new_content)
+
+        return measure(add_content)
+
+    assert_scales("finalize", run_finalize(SMALL_COUNT), run_finalize(LARGE_COUNT), save_artifact)
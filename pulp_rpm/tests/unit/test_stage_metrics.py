@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from asgiref.sync import sync_to_async
+
+from pulpcore.plugin.stages import DeclarativeContent, EndStage, Stage, create_pipeline
+
+from pulp_rpm.app.models import Package
+from pulp_rpm.app.stage_metrics import PipelineMetrics, phase
+
+
+class Producer(Stage):
+    async def run(self):
+        for n in range(10):
+            await self.put(DeclarativeContent(content=Package(name=f"package{n}")))
+
+
+class Counter(Stage):
+    async def run(self):
+        async for batch in self.batches(minsize=5):
+            with phase("count"):
+                await sync_to_async(Package.objects.count)()
+            for item in batch:
+                await self.put(item)
+
+
+class Forwarder(Stage):
+    """Passes the even units on while receiving them, like RpmContentSaver."""
+
+    async def batches(self, minsize=500, flush_event=None):
+        async for batch in super().batches(minsize=minsize, flush_event=flush_event):
+            with phase("forward"):
+                await sync_to_async(Package.objects.exists)()
+            for item in batch[::2]:
+                await self.put(item)
+            yield batch[1::2]
+
+    async def run(self):
+        async for batch in self.batches(minsize=5):
+            for item in batch:
+                await self.put(item)
+
+
+class Consumer(Stage):
+    async def run(self):
+        async for item in self.items():
+            await sync_to_async(Package.objects.exists)()
+            await self.put(item)
+
+
+# The queries of the stages are run in a thread, outside the transaction of a test
+@pytest.mark.django_db(transaction=True, serialized_rollback=True)
+def test_pipeline_metrics():
+    """Units, batches, queries and phases are measured for every instrumented stage."""
+    metrics = PipelineMetrics("test")
+    stages = metrics.instrument([Producer(), Counter()]) + [Consumer(), EndStage()]
+    with metrics.collect():
+        asyncio.run(create_pipeline(stages))
+
+    report = metrics.as_dict()
+    producer, counter = report["stages"]
+    assert (producer["stage"], producer["items_in"], producer["items_out"]) == ("Producer", 0, 10)
+    assert producer["queries"] == 0
+    assert (counter["stage"], counter["items_in"], counter["items_out"]) == ("Counter", 10, 10)
+    assert counter["queries"] == counter["batches"] > 0
+    assert set(counter["phases"]) == {"count"}
+    # the queries of stages which are not instrumented are counted for the pipeline
+    assert report["other_queries"] == 10
+    assert report["wall_time"] >= counter["wall_time"] >= counter["busy_time"]
+
+    # phases outside of instrumented stages are not measured
+    with phase("nothing"):
+        Package.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True, serialized_rollback=True)
+def test_pipeline_metrics_forwarded_units():
+    """Units passed on while receiving a batch are counted, the time as busy."""
+    metrics = PipelineMetrics("test")
+    stages = metrics.instrument([Producer(), Forwarder()]) + [EndStage()]
+    with metrics.collect():
+        asyncio.run(create_pipeline(stages))
+
+    forwarder = metrics.as_dict()["stages"][1]
+    assert (forwarder["items_in"], forwarder["items_out"]) == (10, 10)
+    assert forwarder["busy_time"] >= forwarder["phases"]["forward"] > 0
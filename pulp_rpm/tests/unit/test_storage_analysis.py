@@ -0,0 +1,98 @@
+import json
+import os
+import uuid
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from pulpcore.plugin.models import Artifact, RemoteArtifact
+
+from pulp_rpm.app.models import Package, RpmRemote, RpmRepository
+from pulp_rpm.app.storage_analysis import repository_sizes
+from pulp_rpm.tests.unit.utils.content_factory import create_package
+
+
+def create_stored_package(tmp_path, size=None):
+    """A package, with a downloaded artifact of `size` bytes or an on-demand one."""
+    if size is not None:
+        path = tmp_path / uuid.uuid4().hex
+        path.write_bytes(os.urandom(size))
+        artifact = Artifact.init_and_validate(str(path))
+        artifact.save()
+        return create_package(artifact=artifact)
+    package = create_package()
+    content_artifact = package.contentartifact_set.get()
+    # several remotes provide the artifact, it is counted once
+    for remote_name in (f"{package.name}-1", f"{package.name}-2"):
+        remote = RpmRemote.objects.create(name=remote_name, url="https://example.com/")
+        RemoteArtifact.objects.create(
+            content_artifact=content_artifact,
+            remote=remote,
+            url=f"https://example.com/{package.location_href}",
+            size=50,
+        )
+    return package
+
+
+def create_repository(*packages):
+    repository = RpmRepository.objects.create(name=str(uuid.uuid4()))
+    with repository.new_version() as version:
+        version.add_content(Package.objects.filter(pk__in=[package.pk for package in packages]))
+    return repository
+
+
+@pytest.fixture
+def repositories(tmp_path):
+    unique, shared, on_demand = (
+        create_stored_package(tmp_path, 100),
+        create_stored_package(tmp_path, 200),
+        create_stored_package(tmp_path),
+    )
+    first = create_repository(unique, shared)
+    second = create_repository(shared, on_demand)
+    # a repository removing content still accounts for it
+    with second.new_version() as version:
+        version.remove_content(Package.objects.filter(pk=shared.pk))
+    return first, second
+
+
+@pytest.mark.django_db
+def test_repository_sizes(repositories):
+    """Artifacts referenced by other repositories are reported as shared."""
+    first, second = repositories
+    empty = RpmRepository.objects.create(name=str(uuid.uuid4()))
+    sizes = repository_sizes(
+        [first.pk, second.pk, empty.pk], include_on_demand=True, include_published_metadata=True
+    )
+    assert sizes[str(first.pk)] == {
+        "disk-size": 300,
+        "unique-disk-size": 100,
+        "shared-disk-size": 200,
+        "on-demand-size": 0,
+        "published-metadata-size": 0,
+    }
+    assert sizes[str(second.pk)] == {
+        "disk-size": 200,
+        "unique-disk-size": 0,
+        "shared-disk-size": 200,
+        "on-demand-size": 50,
+        "published-metadata-size": 0,
+    }
+    assert sizes[str(empty.pk)]["disk-size"] == 0
+
+
+# The workers query the database with connections of their own
+@pytest.mark.django_db(transaction=True, serialized_rollback=True)
+def test_storage_analysis_command(repositories):
+    """The command reports the sizes of the selected repositories, in parallel."""
+    first, second = repositories
+    output = StringIO()
+    call_command(
+        "rpm-repository-storage-analysis", "--workers", "2", "--batch-size", "1", stdout=output
+    )
+    report = {entry["name"]: entry for entry in json.loads(output.getvalue())["repositories"]}
+    assert report[first.name]["disk-size"] == 300
+    assert report[first.name]["unique-disk-size"] == 100
+    assert report[second.name]["shared-disk-size"] == 200
+    assert "on-demand-size" not in report[second.name]
@@ -0,0 +1,101 @@
+import uuid
+
+import pytest
+
+from pulpcore.plugin.models import RemoteArtifact
+
+from pulp_rpm.app.models import Package, RpmRemote, RpmRepository
+from pulp_rpm.app.tasks.synchronizing import find_synced_version, reuse_synced_version
+from pulp_rpm.tests.unit.utils.content_factory import create_package
+
+UPSTREAM_URL = "https://example.com/upstream/"
+
+
+def sync_details(**details):
+    return {
+        "url": UPSTREAM_URL,
+        "download_policy": "on_demand",
+        "sync_policy": "mirror_content_only",
+        "most_recent_version": 1,
+        "revision": "1",
+        "repomd_checksum": "abc",
+        "treeinfo_checksum": "",
+        "retain_package_versions": 0,
+        "skip_types": [],
+        **details,
+    }
+
+
+def create_remote_package(remote):
+    package = create_package()
+    RemoteArtifact.objects.create(
+        content_artifact=package.contentartifact_set.get(),
+        remote=remote,
+        url=f"{UPSTREAM_URL}Packages/{package.location_href}",
+        sha256=package.pkgId,
+        size=1024,
+    )
+    return package
+
+
+@pytest.fixture
+def synced_version():
+    """A version synced from the upstream by another repository."""
+    remote = RpmRemote.objects.create(name=str(uuid.uuid4()), url=UPSTREAM_URL)
+    repository = RpmRepository.objects.create(name=str(uuid.uuid4()))
+    packages = [create_remote_package(remote) for _package in range(3)]
+    with repository.new_version() as version:
+        version.add_content(Package.objects.filter(pk__in=[package.pk for package in packages]))
+    repository.last_sync_details = sync_details(most_recent_version=version.number)
+    repository.save()
+    return version
+
+
+@pytest.mark.django_db
+def test_find_synced_version(synced_version):
+    """Only versions mirrored from the same metadata with the same options are reused."""
+    repository = RpmRepository.objects.create(name=str(uuid.uuid4()))
+    assert find_synced_version(repository, sync_details()) == synced_version
+    assert find_synced_version(repository, sync_details(sync_policy="additive")) == synced_version
+
+    assert find_synced_version(repository, sync_details(repomd_checksum="def")) is None
+    assert find_synced_version(repository, sync_details(skip_types=["srpm"])) is None
+    assert find_synced_version(repository, sync_details(retain_package_versions=1)) is None
+    # the content was not downloaded by the other sync
+    assert find_synced_version(repository, sync_details(download_policy="immediate")) is None
+    # a repository does not reuse its own version
+    assert find_synced_version(synced_version.repository.cast(), sync_details()) is None
+
+    RpmRepository.objects.filter(pk=synced_version.repository.pk).update(
+        last_sync_details=sync_details(sync_policy="additive")
+    )
+    assert find_synced_version(repository, sync_details()) is None
+
+
+@pytest.mark.django_db
+def test_reuse_synced_version(synced_version):
+    """The content is reused, and can be downloaded through the remote of the repository."""
+    remote = RpmRemote.objects.create(name=str(uuid.uuid4()), url="https://mirror.example.com/")
+    repository = RpmRepository.objects.create(name=str(uuid.uuid4()))
+    existing = [create_remote_package(remote) for _package in range(2)]
+    with repository.new_version() as version:
+        version.add_content(Package.objects.filter(pk__in=[package.pk for package in existing]))
+
+    additive = reuse_synced_version(
+        repository, remote, "https://mirror.example.com/", synced_version, mirror=False
+    )
+    assert additive.content.count() == 5
+    mirrored = reuse_synced_version(
+        repository, remote, "https://mirror.example.com/", synced_version, mirror=True
+    )
+    assert set(mirrored.content.values_list("pk", flat=True)) == set(
+        synced_version.content.values_list("pk", flat=True)
+    )
+
+    remote_artifacts = RemoteArtifact.objects.filter(
+        remote=remote, content_artifact__content__in=synced_version.content
+    )
+    assert remote_artifacts.count() == 3
+    for remote_artifact in remote_artifacts:
+        assert remote_artifact.url.startswith("https://mirror.example.com/Packages/")
+        assert remote_artifact.size == 1024
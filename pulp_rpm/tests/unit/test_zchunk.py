@@ -0,0 +1,124 @@
+import uuid
+
+import createrepo_c as cr
+import pytest
+
+from pulp_rpm.app.exceptions import ZchunkUnsupportedError
+from pulp_rpm.app.models import Package, RpmPublication, RpmRepository
+from pulp_rpm.app.tasks.publishing import publish
+from pulp_rpm.tests.unit.utils.content_factory import create_package
+
+# the size of the checksums of zchunk files by checksum type: sha1, sha256, sha512, sha512/128
+ZCK_CHECKSUM_SIZES = {0: 20, 1: 32, 2: 64, 3: 16}
+
+
+def read_compint(data, offset):
+    """Read a zchunk variable length integer, its last byte has the high bit set."""
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value += (byte & 0x7F) << shift
+        shift += 7
+        if byte & 0x80:
+            return value, offset
+
+
+def zck_chunk_count(path):
+    """Return the number of chunks listed in the index of a zchunk file, see zchunk_format.txt."""
+    with open(path, "rb") as zck_file:
+        data = zck_file.read(1024 * 1024)
+    assert data[:5] == b"\0ZCK1"
+    checksum_type, offset = read_compint(data, 5)
+    _header_size, offset = read_compint(data, offset)
+    # header checksum and data checksum
+    offset += 2 * ZCK_CHECKSUM_SIZES[checksum_type]
+    flags, offset = read_compint(data, offset)
+    _compression_type, offset = read_compint(data, offset)
+    if flags & 2:
+        optional_elements, offset = read_compint(data, offset)
+        for _element in range(optional_elements):
+            _element_type, offset = read_compint(data, offset)
+            element_size, offset = read_compint(data, offset)
+            offset += element_size
+    _index_size, offset = read_compint(data, offset)
+    _chunk_checksum_type, offset = read_compint(data, offset)
+    chunk_count, offset = read_compint(data, offset)
+    return chunk_count
+
+
+@pytest.fixture
+def version():
+    prefix = uuid.uuid4().hex[:8]
+    packages = [
+        create_package(f"{prefix}-a", rpm_sourcerpm=f"{prefix}-z-1.0-1.src.rpm"),
+        create_package(f"{prefix}-b", rpm_sourcerpm=f"{prefix}-y-1.0-1.src.rpm"),
+        create_package(f"{prefix}-c", rpm_sourcerpm=f"{prefix}-z-1.0-1.src.rpm"),
+    ]
+    repository = RpmRepository.objects.create(name=prefix)
+    with repository.new_version() as version:
+        version.add_content(Package.objects.filter(pk__in=[package.pk for package in packages]))
+    return version
+
+
+def published_file(publication, relative_path):
+    published_artifact = publication.published_artifact.get(relative_path=relative_path)
+    return published_artifact.content_artifact.artifact.file.path
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(not cr.HAS_ZCK, reason="createrepo_c was built without zchunk support")
+def test_publish_zchunk_metadata(running_task, version):
+    """zchunk variants are published next to the metadata, the packages by source package."""
+    publish(repository_version_pk=str(version.pk), repo_config={}, zchunk_metadata=True)
+    publication = RpmPublication.objects.get(repository_version=version)
+    assert publication.zchunk_metadata
+    repomd = cr.Repomd(published_file(publication, "repodata/repomd.xml"))
+
+    records = {record.type: record for record in repomd.records}
+    for record_type in ("primary", "filelists", "other"):
+        zck_record = records[f"{record_type}_zck"]
+        assert zck_record.location_href.endswith(f"-{record_type}.xml.zck")
+        assert zck_record.checksum_header
+        published_file(publication, zck_record.location_href)
+
+    packages = cr.PackageIterator(
+        primary_path=published_file(publication, records["primary"].location_href),
+        filelists_path=published_file(publication, records["filelists"].location_href),
+        other_path=published_file(publication, records["other"].location_href),
+    )
+    assert [package.name.rsplit("-", 1)[1] for package in packages] == ["b", "a", "c"]
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(not cr.HAS_ZCK, reason="createrepo_c was built without zchunk support")
+def test_publish_zchunk_metadata_chunks(running_task):
+    """The zchunk metadata of many packages is split into many chunks."""
+    prefix = uuid.uuid4().hex[:8]
+    packages = [
+        create_package(
+            f"{prefix}-{i}",
+            rpm_sourcerpm=f"{prefix}-{i}-1.0-1.src.rpm",
+            description=uuid.uuid4().hex * 64,
+        )
+        for i in range(200)
+    ]
+    repository = RpmRepository.objects.create(name=prefix)
+    with repository.new_version() as version:
+        version.add_content(Package.objects.filter(pk__in=[package.pk for package in packages]))
+    publish(repository_version_pk=str(version.pk), repo_config={}, zchunk_metadata=True)
+    publication = RpmPublication.objects.get(repository_version=version)
+    repomd = cr.Repomd(published_file(publication, "repodata/repomd.xml"))
+
+    records = {record.type: record for record in repomd.records}
+    # the dictionary chunk aside
+    assert zck_chunk_count(published_file(publication, records["primary_zck"].location_href)) > 2
+
+
+@pytest.mark.django_db
+def test_publish_zchunk_unsupported(running_task, version, monkeypatch):
+    """Publishing zchunk metadata fails if createrepo_c has no zchunk support."""
+    monkeypatch.setattr(cr, "HAS_ZCK", 0)
+    with pytest.raises(ZchunkUnsupportedError):
+        publish(repository_version_pk=str(version.pk), repo_config={}, zchunk_metadata=True)
+    assert not RpmPublication.objects.filter(repository_version=version).exists()
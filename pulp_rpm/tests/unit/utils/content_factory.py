@@ -1,6 +1,6 @@
 import uuid
 
-from pulpcore.plugin.models import Content
+from pulpcore.plugin.models import Content, ContentArtifact
 
 from pulp_rpm.app.models import (
     Modulemd,
@@ -15,6 +15,41 @@ from pulp_rpm.app.models import (
 )
 
 
+def build_package(name=None, **fields):
+    """An unsaved Package with all the fields a publication needs; `fields` override them."""
+    package = Package(
+        name=name or uuid.uuid4().hex,
+        epoch="0",
+        version="1.0",
+        release="1",
+        arch="x86_64",
+        pkgId=uuid.uuid4().hex,
+        checksum_type="sha256",
+        rpm_header_start=4504,
+        rpm_header_end=8192,
+        size_archive=1024,
+        size_installed=1024,
+        size_package=2048,
+        time_build=1700000000,
+        time_file=1700000000,
+    )
+    for field, value in fields.items():
+        setattr(package, field, value)
+    if not package.location_href:
+        package.location_href = package.filename
+    return package
+
+
+def create_package(name=None, *, artifact=None, **fields):
+    """Save a `build_package()` along with its ContentArtifact, downloaded if `artifact` is given."""
+    package = build_package(name, **fields)
+    package.save()
+    ContentArtifact.objects.create(
+        content=package, artifact=artifact, relative_path=package.location_href
+    )
+    return package
+
+
 class RepoContentFactory:
     """Accumulates content added inside a `with` block into one RepositoryVersion on exit.
 
@@ -42,22 +77,17 @@ class RepoContentFactory:
     def get_repository(self):
         return self._repo
 
-    def add_packages(self, names: list[str]) -> list:
+    def add_package(self, name, **fields):
+        """Create a Package with `create_package()`, noarch unless `fields` say otherwise."""
+        package = create_package(
+            name, **{"arch": "noarch", "pkgId": f"fakedigest-{name}", **fields}
+        )
+        self._content_pks.append(package.pk)
+        return package
+
+    def add_packages(self, names: list[str], **fields) -> list:
         """Create one Package per name. Returns their pks, in the same order as `names`."""
-        pks = []
-        for name in names:
-            pk = Package.objects.create(
-                name=name,
-                epoch="0",
-                version="1.0",
-                release="1",
-                arch="noarch",
-                pkgId=f"fakedigest-{name}",
-                checksum_type="sha256",
-            ).pk
-            pks.append(pk)
-        self._content_pks.extend(pks)
-        return pks
+        return [self.add_package(name, **fields).pk for name in names]
 
     def add_package_group(self, name, *, packages=()):
         group, _ = PackageGroup.objects.get_or_create(